@@ -1,23 +1,32 @@
 from django.http import HttpResponse
 from django.template import Template, Context
 from django.shortcuts import render
+import threading
+import rw_reg
 from rw_reg import *
 
+# the address table is parsed once per server process instead of on every request
+tableLock = threading.Lock()
+
+def loadTable():
+  with tableLock:
+    if rw_reg.tableVersion == 0:
+      parseXML()
+
 def hello(request):
   return HttpResponse('Hello World')
 
 def read_fw(request):
-  parseXML()
+  loadTable()
   reg=getNode("GEM_AMC.GEM_SYSTEM.BOARD_ID")
   print reg
   return HttpResponse('Board ID %s'%(readReg(reg)))
 
 def read_gem_system_module(request):
-  parseXML()
+  loadTable()
   reglist = getRegsContaining("GEM_AMC.GEM_SYSTEM")
-  valuelist = []
-  for reg in reglist:
-    try: valuelist.append(readReg(reg))
-    except: print reg
+  # the whole module in one transaction, register by register only to report which one fails
+  try: valuelist = ['{0:#010x}'.format(value) for value in readRegs(reglist)]
+  except RegError: valuelist = [readReg(reg) for reg in reglist]
   ziplist = zip(list(reg.name for reg in reglist),valuelist)
   return render(request,'module.html',{'ziplist':ziplist})
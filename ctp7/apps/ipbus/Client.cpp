@@ -45,8 +45,8 @@ std::string vec2str(const std::deque<uint32_t> vec)
 bool Client::run_io()
 {
 	// Raw Network Read
-	char buf[128];
-	ssize_t readcount = recv(this->fd, buf, 128, MSG_DONTWAIT);
+	char buf[4096];
+	ssize_t readcount = recv(this->fd, buf, sizeof(buf), MSG_DONTWAIT);
 	if (readcount < 0 && errno != EAGAIN)
 		return false; // Error or disconnect.
 	if (readcount)
@@ -57,20 +57,22 @@ bool Client::run_io()
 	 * IPbus TCP appears to use a uint32 length-prefixed message format to wrap
 	 * the equivalent of IPbus UDP packets.
 	 */
-	if (this->ibuf.size()) {
+	while (this->ibuf.size() >= 4) {
 		const char *ibuf_data = this->ibuf.data();
 		uint32_t frame_size = ntohl(*reinterpret_cast<const uint32_t*>(ibuf_data));
-		if (frame_size >= this->ibuf.size()-4) {
-			// There is a protocol frame available.  Dispatch it for processing.
-			std::string framedata = this->ibuf.substr(4,frame_size);
-			this->ibuf = this->ibuf.erase(0,4+frame_size);
-
-			std::deque<uint32_t> req = str2vec(framedata);
-			std::deque<uint32_t> rsp;
-			this->process_frame(req, rsp);
-			frame_size = htonl(rsp.size()*4);
-			this->obuf += std::string(reinterpret_cast<const char *>(&frame_size), 4) + vec2str(rsp);
-		}
+		if (this->ibuf.size()-4 < frame_size)
+			break; // Wait for the rest of the frame.
+
+		// There is a protocol frame available.  Dispatch it for processing.
+		// Clients may send several frames before reading the replies, handle all complete ones.
+		std::string framedata = this->ibuf.substr(4,frame_size);
+		this->ibuf = this->ibuf.erase(0,4+frame_size);
+
+		std::deque<uint32_t> req = str2vec(framedata);
+		std::deque<uint32_t> rsp;
+		this->process_frame(req, rsp);
+		frame_size = htonl(rsp.size()*4);
+		this->obuf += std::string(reinterpret_cast<const char *>(&frame_size), 4) + vec2str(rsp);
 	}
 
 	if (this->obuf.size()) {
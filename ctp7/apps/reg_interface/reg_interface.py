@@ -51,7 +51,7 @@ class Prompt(Cmd):
         return completeReg(text)
 
 
-    def do_readGroup(self, args): #INEFFICIENT
+    def do_readGroup(self, args):
         """Read all registers below node in register tree. USAGE: readGroup <register/node name> """
         node = getNode(args)
         if node is not None: 
@@ -59,8 +59,7 @@ class Prompt(Cmd):
             kids = []
             getAllChildren(node, kids)
             print len(kids),'CHILDREN'
-            for reg in kids: 
-                if 'r' in str(reg.permission): print displayReg(reg)
+            for line in displayRegs([reg for reg in kids if 'r' in str(reg.permission)]): print line
         else: print args,'not found!'
 
     def complete_readGroup(self, text, line, begidx, endidx):
@@ -74,8 +73,9 @@ class Prompt(Cmd):
 
     def do_readKW(self, args):
         """Read all registers containing KeyWord. USAGE: readKW <KeyWord>"""
-        if getNodesContaining(args) is not None and args!='':
-            for reg in getNodesContaining(args):
+        nodelist = getNodesContaining(args) if args!='' else None
+        if nodelist is not None:
+            for reg in nodelist:
                 address = reg.real_address
                 if 'r' in str(reg.permission):
                     print hex(address).rstrip('L'),reg.permission,'\t',tabPad(reg.name,7),readReg(reg)
@@ -87,8 +87,7 @@ class Prompt(Cmd):
 
     def do_readAll(self, args):
         """Read all registers with read-permission"""
-        for reg in getNodesContaining(''):
-            if 'r' in str(reg.permission): print displayReg(reg) 
+        for line in displayRegs([reg for reg in getNodesContaining('') if 'r' in str(reg.permission)]): print line
             
     def do_exit(self, args):
         """Exit program"""
@@ -130,6 +129,7 @@ class Prompt(Cmd):
 if __name__ == '__main__':
     try:
         parseXML()
+        nodes.expandAll() # searches and completion need the whole table, expand it at once (from the cache if possible)
         prompt = Prompt()
         prompt.prompt = 'CTP7 > '
         prompt.cmdloop('Starting CTP7 Register Command Line Interface.')
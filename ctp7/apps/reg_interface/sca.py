@@ -36,10 +36,12 @@ class Virtex6Instructions:
 VIRTEX6_FIRMWARE_SIZE = 5464972
 VIRTEX6_FPGA_ID = 0x6424a093
 
-ADDR_JTAG_LENGTH = None
-ADDR_JTAG_TMS = None
-ADDR_JTAG_TDO = None
-ADDR_JTAG_TDI = None
+# JTAG registers written for every shifted word, bound to their address on first use
+# (NUM_BITS is the only register of its word, no need to read the word back before writing it)
+JTAG_LENGTH = RegHandle('GEM_AMC.SLOW_CONTROL.SCA.JTAG.NUM_BITS', plainWrite=True)
+JTAG_TMS = RegHandle('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS')
+JTAG_TDO = RegHandle('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO')
+JTAG_TDI = RegHandle('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDI')
 
 def main():
 
@@ -57,7 +59,6 @@ def main():
         instructions = sys.argv[1]
 
     parseXML()
-    initJtagRegAddrs()
 
     heading("Hola, I'm SCA controller tester :)")
 
@@ -190,13 +191,13 @@ def main():
         jtagCommand(False, Virtex6Instructions.SHUTDN, 10, None, 0, False)
 
         # send 400 empty clocks
-        wReg(ADDR_JTAG_LENGTH, 0x00)
+        JTAG_LENGTH.write(0x00)
         for i in range(0, 4):
-            wReg(ADDR_JTAG_TMS, 0x00000000)
+            JTAG_TMS.write(0x00000000)
         for i in range(0, 12):
-            wReg(ADDR_JTAG_TDO, 0x00000000)
-        wReg(ADDR_JTAG_LENGTH, 0x10)
-        wReg(ADDR_JTAG_TDO, 0x00000000)
+            JTAG_TDO.write(0x00000000)
+        JTAG_LENGTH.write(0x10)
+        JTAG_TDO.write(0x00000000)
 
         sleep(0.01)
 
@@ -206,10 +207,10 @@ def main():
         jtagCommand(False, Virtex6Instructions.ISC_ENABLE, 10, 0x00, 5, False)
 
         # 128 empty clocks
-        wReg(ADDR_JTAG_LENGTH, 0x00)
+        JTAG_LENGTH.write(0x00)
         for i in range(0, 4):
-            wReg(ADDR_JTAG_TMS, 0x00000000)
-            wReg(ADDR_JTAG_TDO, 0x00000000)
+            JTAG_TMS.write(0x00000000)
+            JTAG_TDO.write(0x00000000)
 
         sleep(0.0005)
 
@@ -227,19 +228,19 @@ def main():
 
         tms = 0b001
         tdo = 0b000
-        wReg(ADDR_JTAG_LENGTH, 3)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
-        wReg(ADDR_JTAG_TDO, tdo & 0xffffffff)
+        JTAG_LENGTH.write(3)
+        JTAG_TMS.write(tms & 0xffffffff)
+        JTAG_TDO.write(tdo & 0xffffffff)
 
         tms = 0b001011 << 31
-        wReg(ADDR_JTAG_LENGTH, 37)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_LENGTH.write(37)
+        JTAG_TMS.write(tms & 0xffffffff)
         tms = tms >> 32
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_TMS.write(tms & 0xffffffff)
 
         # send the first byte so that the LENGTH is updated
-        wReg(ADDR_JTAG_TDO, words[0])
-        wReg(ADDR_JTAG_TDO, 0x0)
+        JTAG_TDO.write(words[0])
+        JTAG_TDO.write(0x0)
 
         # enter optimized mode that executes JTAG_GO on every TDO shift and doesn't update the LENGTH with every JTAG_GO
         sleep(0.001)
@@ -249,8 +250,8 @@ def main():
 
         cnt = 0
         for i in range(1, numWords - 1):
-            wReg(ADDR_JTAG_TDO, words[i])
-            #wReg(ADDR_JTAG_TDO, 0x0) # not needed when EXEC_ON_EVERY_TDO is set to 0x1
+            JTAG_TDO.write(words[i])
+            #JTAG_TDO.write(0x0) # not needed when EXEC_ON_EVERY_TDO is set to 0x1
             #jtagCommand(False, None, 0, (bytes[i*4 + 2] << 24) + (bytes[i*4 + 3] << 16) + (bytes[i*4] << 8) + (bytes[i*4 + 1]), 32, False)
             cnt += 1
             if cnt >= 10000:
@@ -263,22 +264,22 @@ def main():
         writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.EXPERT.NO_SCA_LENGTH_UPDATE'), 0x0)
         writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.EXPERT.SHIFT_TDO_ASYNC'), 0x0)
         tms = 0b011 << 31 #go back to idle and don't enter DR shift again
-        wReg(ADDR_JTAG_LENGTH, 34)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_LENGTH.write(34)
+        JTAG_TMS.write(tms & 0xffffffff)
         tms = tms >> 32
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
-        wReg(ADDR_JTAG_TDO, words[i]) #send the last word
-        wReg(ADDR_JTAG_TDO, 0x0)
+        JTAG_TMS.write(tms & 0xffffffff)
+        JTAG_TDO.write(words[i]) #send the last word
+        JTAG_TDO.write(0x0)
 
 
         print("DONE sending data")
 
         jtagCommand(False, Virtex6Instructions.ISC_DISABLE, 10, None, 0, False)
         # 128 empty clocks
-        wReg(ADDR_JTAG_LENGTH, 0x00)
+        JTAG_LENGTH.write(0x00)
         for i in range(0, 4):
-            wReg(ADDR_JTAG_TMS, 0x00000000)
-            wReg(ADDR_JTAG_TDO, 0x00000000)
+            JTAG_TMS.write(0x00000000)
+            JTAG_TDO.write(0x00000000)
 
         sleep(0.0001)
 
@@ -286,10 +287,10 @@ def main():
         jtagCommand(False, Virtex6Instructions.JSTART, 10, None, 0, False)
 
         # 128 empty clocks
-        wReg(ADDR_JTAG_LENGTH, 0x00)
+        JTAG_LENGTH.write(0x00)
         for i in range(0, 4):
-            wReg(ADDR_JTAG_TMS, 0x00000000)
-            wReg(ADDR_JTAG_TDO, 0x00000000)
+            JTAG_TMS.write(0x00000000)
+            JTAG_TDO.write(0x00000000)
 
         sleep(0.0005)
 
@@ -313,7 +314,7 @@ def main():
             #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.MANUAL_CONTROL.SCA_CMD_DATA'), 0x0)                                                                                           
             
             #readReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDI'))
-            wReg(ADDR_JTAG_TMS, 0x00000000)
+            JTAG_TMS.write(0x00000000)
 
             #sleep(0.01)
             #print('execute')
@@ -390,16 +391,6 @@ def main():
         print("Num errors: " + str(errors))
 
 
-def initJtagRegAddrs():
-    global ADDR_JTAG_LENGTH
-    global ADDR_JTAG_TMS
-    global ADDR_JTAG_TDO
-    global ADDR_JTAG_TDI
-    ADDR_JTAG_LENGTH = getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.NUM_BITS').real_address
-    ADDR_JTAG_TMS = getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS').real_address
-    ADDR_JTAG_TDO = getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO').real_address
-    ADDR_JTAG_TDI = getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDI').real_address
-
 # freqDiv -- JTAG frequency expressed as a divider of 20MHz, so e.g. a value of 2 would give 10MHz, value of 10 would give 2MHz
 def enableJtag(freqDiv=None):
     subheading('Disabling SCA ADC monitoring')                                                                                          
@@ -478,7 +469,7 @@ def jtagCommand(restoreIdle, ir, irLen, dr, drLen, drRead):
     debugCyan('Setting command length = ' + str(len))
     fw_len = len if len < 128 else 0 # in firmware 0 means 128 bits
     #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.NUM_BITS'), fw_len)
-    wReg(ADDR_JTAG_LENGTH, fw_len)
+    JTAG_LENGTH.write(fw_len)
 
     # ================= SENDING LENGTH COMMAND JUST FOR TEST!! ===================
     #debugCyan('Setting config registers: bit number = ' + hex(fw_len))                                               
@@ -489,46 +480,46 @@ def jtagCommand(restoreIdle, ir, irLen, dr, drLen, drRead):
 
     debugCyan('Setting TMS 0 = ' + binary(tms & 0xffffffff, 32))
     #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS'), tms0)
-    wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+    JTAG_TMS.write(tms & 0xffffffff)
 
     debugCyan('Setting TDO 0 = ' + binary(tdo & 0xffffffff, 32))
     #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO'), tdo0)
-    wReg(ADDR_JTAG_TDO, tdo & 0xffffffff)
+    JTAG_TDO.write(tdo & 0xffffffff)
 
     if len > 32:
         tms = tms >> 32
         debugCyan('Setting TMS 1 = ' + binary(tms & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS'), tms1)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_TMS.write(tms & 0xffffffff)
 
         #raw_input("press any key to send the last TDO")
 
         tdo = tdo >> 32
         debugCyan('Setting TDO 1 = ' + binary(tdo & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO'), tdo1)
-        wReg(ADDR_JTAG_TDO, tdo & 0xffffffff)
+        JTAG_TDO.write(tdo & 0xffffffff)
 
     if len > 64:                                                               
         tms = tms >> 32                                                                                                                 
         debugCyan('Setting TMS 2 = ' + binary(tms & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS'), tms2)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_TMS.write(tms & 0xffffffff)
 
         tdo = tdo >> 32                                                                                           
         debugCyan('Setting TDO 2 = ' + binary(tdo & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO'), tdo2)
-        wReg(ADDR_JTAG_TDO, tdo & 0xffffffff)
+        JTAG_TDO.write(tdo & 0xffffffff)
 
     if len > 96:                                                                                                                                                          
         tms = tms >> 32                                                                                                                                                   
         debugCyan('Setting TMS 3 = ' + binary(tms & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS'), tms3)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_TMS.write(tms & 0xffffffff)
                                                                                                                                                                           
         tdo = tdo >> 32                                                                                                                                                   
         debugCyan('Setting TDO 3 = ' + binary(tdo & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO'), tdo3)
-        wReg(ADDR_JTAG_TDO, tdo & 0xffffffff)
+        JTAG_TDO.write(tdo & 0xffffffff)
 
     # ================= SENDING JTAG GO COMMAND JUST FOR TEST!! ===================                                
     #debugCyan('JTAG GO!')                                                                                                         
@@ -540,7 +531,7 @@ def jtagCommand(restoreIdle, ir, irLen, dr, drLen, drRead):
     if drRead:
         debugCyan('Read TDI 0')                                                                                  
         tdi = parseInt(readReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDI')))
-        #tdi0_fast = parseInt(rReg(parseInt(ADDR_JTAG_TDI)))
+        #tdi0_fast = JTAG_TDI.read()
         #print('normal tdi read = ' + hex(tdi0) + ', fast C tdi read = ' + hex(tdi0_fast) + ', parsed = ' + '{0:#010x}'.format(tdi0_fast))
         debug('tdi = ' + hex(tdi))
 
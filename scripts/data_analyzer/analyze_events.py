@@ -2,202 +2,256 @@
 
 from utils import *
 import math
-from text_histogram import histogram
+from collections import Counter
+from text_histogram import histogram_counts
+
+# The analyses are accumulators: add(event) is called once per event, as the events are decoded, merge(other) adds the
+# results of another accumulator of the same analysis (e.g. from another process, see unpack.decodeChunks) and
+# printResults() prints them at the end. Only counters and histograms of values are kept, not the events.
+# The events can be AMC13 events or GEM AMC events, the analyses work on the GEM AMC events.
+
+def amcEvents(event):
+    return event.amcs if hasattr(event, 'amcs') else [event]
+
+# the OH BC and EC are not in the chamber data anymore, the OH parts of the analyses only count the chambers that have them
+def ohBc(chamber):
+    return getattr(chamber, 'ohBc', None)
+
+def ohEc(chamber):
+    return getattr(chamber, 'ohEc', None)
+
+def mergeCounters(counters, otherCounters):
+    for counter, other in zip(counters, otherCounters):
+        counter.update(other)
+
+def printHistogram(counts, minimum=None, maximum=None, buckets=None):
+    if len(counts) == 0:
+        print "# NumSamples = 0"
+        return
+    histogram_counts(counts, minimum, maximum, buckets)
+
+class BxDiffAnalysis(object):
+
+    def __init__(self):
+        self.ohAmcBxOffsets = Counter()
+        self.vfatOhBxOffsets = Counter()
+        self.vfatAmcBxOffsets = Counter()
+
+    def add(self, event):
+        for amc in amcEvents(event):
+            for chamber in amc.chambers:
+                if ohBc(chamber) is not None:
+                    self.ohAmcBxOffsets[chamber.ohBc - amc.bxId] += 1
+                for vfat in chamber.vfats:
+                    if ohBc(chamber) is not None:
+                        self.vfatOhBxOffsets[vfat.bc - chamber.ohBc] += 1
+                    self.vfatAmcBxOffsets[vfat.bc - amc.bxId] += 1
+
+    def merge(self, other):
+        mergeCounters((self.ohAmcBxOffsets, self.vfatOhBxOffsets, self.vfatAmcBxOffsets),
+                      (other.ohAmcBxOffsets, other.vfatOhBxOffsets, other.vfatAmcBxOffsets))
+
+    def printResults(self):
+        # print "===================================================="
+        # print "OH BC - AMC BC histogram:"
+        # print ""
+        # printHistogram(self.ohAmcBxOffsets, -3564, 3564, 100)
+        #
+        # print ""
+        # print "===================================================="
+        # print "VFAT BC - OH BC histogram:"
+        # print ""
+        # printHistogram(self.vfatOhBxOffsets, -3564, 3564, 100)
+
+        print ""
+        print "===================================================="
+        print "VFAT BC - AMC BC histogram:"
+        print ""
+        # printHistogram(self.vfatAmcBxOffsets, -3564, 3564, 100)
+        printHistogram(self.vfatAmcBxOffsets, -3564, 3564, 7130)
+
+class BxAnalysis(object):
+
+    def __init__(self):
+        self.amcBxs = Counter()
+        self.ohBxs = Counter()
+        self.vfatBxs = Counter()
+
+    def add(self, event):
+        for amc in amcEvents(event):
+            self.amcBxs[amc.bxId] += 1
+            for chamber in amc.chambers:
+                if ohBc(chamber) is not None:
+                    self.ohBxs[chamber.ohBc] += 1
+                for vfat in chamber.vfats:
+                    self.vfatBxs[vfat.bc] += 1
+
+    def merge(self, other):
+        mergeCounters((self.amcBxs, self.ohBxs, self.vfatBxs), (other.amcBxs, other.ohBxs, other.vfatBxs))
+
+    def printBxs(self, name, bxs):
+        print ""
+        print "===================================================="
+        print "%s BC histogram:" % name
+        print ""
+        printHistogram(bxs, 0, 4095, 4096)
+
+        bxMin = min(bxs) if len(bxs) > 0 else 5000
+        bxMax = max(bxs) if len(bxs) > 0 else -1
+        numBxOvf = sum(count for bx, count in bxs.items() if bx > 3564)
+        print "%s BX Min: %d, %s BX Max: %d, %s BX > 3564: %d" % (name, bxMin, name, bxMax, name, numBxOvf)
+
+    def printResults(self):
+        self.printBxs("AMC", self.amcBxs)
+        self.printBxs("OH", self.ohBxs)
+        self.printBxs("VFAT", self.vfatBxs)
+
+class VfatBxMatchingAnalysis(object):
+
+    def __init__(self):
+        self.numMatchingInEvent = 0
+        self.numMatchingInChamber = 0
+        self.numMismatchInEvent = 0
+        self.numMismatchInChamber = 0
+
+    def add(self, event):
+        for amc in amcEvents(event):
+            bxs = set()
+            numVfats = 0
+            for chamber in amc.chambers:
+                chamberBxs = set(vfat.bc for vfat in chamber.vfats)
+                bxs.update(chamberBxs)
+                numVfats += len(chamber.vfats)
+
+                if len(chamberBxs) > 1:
+                    self.numMismatchInChamber += 1
+                elif len(chamber.vfats) > 1:
+                    self.numMatchingInChamber += 1
+
+            if len(bxs) > 1:
+                self.numMismatchInEvent += 1
+            elif numVfats > 1:
+                self.numMatchingInEvent += 1
+
+    def merge(self, other):
+        self.numMatchingInEvent += other.numMatchingInEvent
+        self.numMatchingInChamber += other.numMatchingInChamber
+        self.numMismatchInEvent += other.numMismatchInEvent
+        self.numMismatchInChamber += other.numMismatchInChamber
+
+    def printResults(self):
+        print ""
+        print "===================================================="
+        print "Number of events with matching VFAT BXs: %d" % self.numMatchingInEvent
+        print "Number of chamber events with matching VFAT BXs: %d" % self.numMatchingInChamber
+        print "Number of events with mismatching VFAT BXs: %d" % self.numMismatchInEvent
+        print "Number of chamber events with mismatching VFAT BXs: %d" % self.numMismatchInChamber
+
+class OhBxMatchingAnalysis(object):
+
+    def __init__(self):
+        self.numMatchingBx = 0
+        self.numMatchingEc = 0
+        self.numMismatchingBx = 0
+        self.numMismatchingEc = 0
+
+    def add(self, event):
+        for amc in amcEvents(event):
+            chambers = [chamber for chamber in amc.chambers if ohBc(chamber) is not None]
+            bxs = set(ohBc(chamber) for chamber in chambers)
+            ecs = set(ohEc(chamber) for chamber in chambers)
+            numOhs = len(chambers)
+
+            if len(bxs) > 1:
+                self.numMismatchingBx += 1
+            elif numOhs > 1:
+                self.numMatchingBx += 1
+
+            if len(ecs) > 1:
+                self.numMismatchingEc += 1
+            elif numOhs > 1:
+                self.numMatchingEc += 1
+
+    def merge(self, other):
+        self.numMatchingBx += other.numMatchingBx
+        self.numMatchingEc += other.numMatchingEc
+        self.numMismatchingBx += other.numMismatchingBx
+        self.numMismatchingEc += other.numMismatchingEc
+
+    def printResults(self):
+        print ""
+        print "===================================================="
+        print "Number of events with matching OH BXs: %d" % self.numMatchingBx
+        print "Number of events with matching OH ECs: %d" % self.numMatchingEc
+        print "Number of events with mismatching OH BXs: %d" % self.numMismatchingBx
+        print "Number of events with mismatching OH ECs: %d" % self.numMismatchingEc
+
+class NumVfatsAnalysis(object):
+
+    def __init__(self):
+        self.numVfats = Counter()
+
+    def add(self, event):
+        for amc in amcEvents(event):
+            self.numVfats[sum(len(chamber.vfats) for chamber in amc.chambers)] += 1
+
+    def merge(self, other):
+        self.numVfats.update(other.numVfats)
+
+    def printResults(self):
+        print "===================================================="
+        print "Number of VFATs per AMC event histogram:"
+        print ""
+        printHistogram(self.numVfats)
+
+class NumChambersAnalysis(object):
+
+    def __init__(self):
+        self.numChambers = Counter()
+
+    def add(self, event):
+        for amc in amcEvents(event):
+            self.numChambers[len(amc.chambers)] += 1
+
+    def merge(self, other):
+        self.numChambers.update(other.numChambers)
+
+    def printResults(self):
+        print "===================================================="
+        print "Number of chambers per AMC event histogram:"
+        print ""
+        printHistogram(self.numChambers, 0, 8, 8)
+
+# unpack.py command line flag of each analysis
+ANALYSES = [
+    ("analyze_bx_diff", BxDiffAnalysis),
+    ("analyze_bx", BxAnalysis),
+    ("analyze_num_chambers", NumChambersAnalysis),
+    ("analyze_num_vfats", NumVfatsAnalysis),
+    ("analyze_vfat_bx_matching", VfatBxMatchingAnalysis),
+    ("analyze_oh_bx_matching", OhBxMatchingAnalysis),
+]
+
+# one analysis over an iterable (or generator) of events
+def analyze(analysis, events):
+    for event in events:
+        analysis.add(event)
+    analysis.printResults()
 
 def analyzeBxDiff(events):
-    ohAmcBxOffsets = []
-    vfatOhBxOffsets = []
-    vfatAmcBxOffsets = []
-
-    for event in events:
-        for chamber in event.chambers:
-            ohAmcBxOffsets.append(chamber.ohBc - event.bxId)
-            for vfat in chamber.vfats:
-                vfatOhBxOffsets.append(vfat.bc - chamber.ohBc)
-                vfatAmcBxOffsets.append(vfat.bc - event.bxId)
-
-    # print "===================================================="
-    # print "OH BC - AMC BC histogram:"
-    # print ""
-    # histogram(ohAmcBxOffsets, -3564, 3564, 100)
-    #
-    # print ""
-    # print "===================================================="
-    # print "VFAT BC - OH BC histogram:"
-    # print ""
-    # histogram(vfatOhBxOffsets, -3564, 3564, 100)
-
-    print ""
-    print "===================================================="
-    print "VFAT BC - AMC BC histogram:"
-    print ""
-    # histogram(vfatAmcBxOffsets, -3564, 3564, 100)
-    histogram(vfatAmcBxOffsets, -3564, 3564, 7130)
+    analyze(BxDiffAnalysis(), events)
 
 def analyzeBx(events):
-    amcBxs = []
-    ohBxs = []
-    vfatBxs = []
-
-    amcBxMin = 5000
-    amcBxMax = -1
-    numAmcBxOvf = 0
-
-    ohBxMin = 5000
-    ohBxMax = -1
-    numOhBxOvf = 0
-
-    vfatBxMin = 5000
-    vfatBxMax = -1
-    numVfatBxOvf = 0
-
-    for event in events:
-        amcBxs.append(event.bxId)
-        if event.bxId < amcBxMin:
-            amcBxMin = event.bxId
-        if event.bxId > amcBxMax:
-            amcBxMax = event.bxId
-        if event.bxId > 3564:
-            numAmcBxOvf += 1
-
-        for chamber in event.chambers:
-            ohBxs.append(chamber.ohBc)
-            if chamber.ohBc < ohBxMin:
-                ohBxMin = chamber.ohBc
-            if chamber.ohBc > ohBxMax:
-                ohBxMax = chamber.ohBc
-            if chamber.ohBc > 3564:
-                numOhBxOvf += 1
-
-            for vfat in chamber.vfats:
-                vfatBxs.append(vfat.bc)
-                if vfat.bc < vfatBxMin:
-                    vfatBxMin = vfat.bc
-                if vfat.bc > vfatBxMax:
-                    vfatBxMax = vfat.bc
-                if vfat.bc > 3564:
-                    numVfatBxOvf += 1
-
-    print ""
-    print "===================================================="
-    print "AMC BC histogram:"
-    print ""
-    histogram(amcBxs, 0, 4095, 4096)
-
-    print "AMC BX Min: %d, AMC BX Max: %d, AMC BX > 3564: %d" % (amcBxMin, amcBxMax, numAmcBxOvf)
-
-    print ""
-    print "===================================================="
-    print "OH BC histogram:"
-    print ""
-    histogram(ohBxs, 0, 4095, 4096)
-
-    print "OH BX Min: %d, OH BX Max: %d, OH BX > 3564: %d" % (ohBxMin, ohBxMax, numOhBxOvf)
-
-    print ""
-    print "===================================================="
-    print "VFAT BC histogram:"
-    print ""
-    histogram(vfatBxs, 0, 4095, 4096)
-
-    print "VFAT BX Min: %d, VFAT BX Max: %d, VFAT BX > 3564: %d" % (vfatBxMin, vfatBxMax, numVfatBxOvf)
+    analyze(BxAnalysis(), events)
 
 def analyzeVfatBxMatching(events):
-
-    numMatchingInEvent = 0
-    numMatchingInChamber = 0
-    numMismatchInEvent = 0
-    numMismatchInChamber = 0
-
-    for event in events:
-        bxs = []
-        numVfats = 0
-        for chamber in event.chambers:
-            chamberBxs = []
-            numChamberVfats = 0
-            for vfat in chamber.vfats:
-                if vfat.bc not in bxs:
-                    bxs.append(vfat.bc)
-                if vfat.bc not in chamberBxs:
-                    chamberBxs.append(vfat.bc)
-                numChamberVfats += 1
-                numVfats += 1
-
-            if len(chamberBxs) > 1:
-                numMismatchInChamber += 1
-            elif numChamberVfats > 1:
-                numMatchingInChamber += 1
-
-        if len(bxs) > 1:
-            numMismatchInEvent += 1
-        elif numVfats > 1:
-            numMatchingInEvent += 1
-
-    print ""
-    print "===================================================="
-    print "Number of events with matching VFAT BXs: %d" % numMatchingInEvent
-    print "Number of chamber events with matching VFAT BXs: %d" % numMatchingInChamber
-    print "Number of events with mismatching VFAT BXs: %d" % numMismatchInEvent
-    print "Number of chamber events with mismatching VFAT BXs: %d" % numMismatchInChamber
+    analyze(VfatBxMatchingAnalysis(), events)
 
 def analyzeOhBxMatching(events):
-
-    numMatchingBx = 0
-    numMatchingEc = 0
-    numMismatchingBx = 0
-    numMismatchingEc = 0
-
-    for event in events:
-        bxs = []
-        ecs = []
-        numOhs = 0
-        for chamber in event.chambers:
-            if chamber.ohBc not in bxs:
-                bxs.append(chamber.ohBc)
-            if chamber.ohEc not in ecs:
-                ecs.append(chamber.ohEc)
-            numOhs += 1
-
-        if len(bxs) > 1:
-            numMismatchingBx += 1
-        elif numOhs > 1:
-            numMatchingBx += 1
-
-        if len(ecs) > 1:
-            numMismatchingEc += 1
-        elif numOhs > 1:
-            numMatchingEc += 1
-
-    print ""
-    print "===================================================="
-    print "Number of events with matching OH BXs: %d" % numMatchingBx
-    print "Number of events with matching OH ECs: %d" % numMatchingEc
-    print "Number of events with mismatching OH BXs: %d" % numMismatchingBx
-    print "Number of events with mismatching OH ECs: %d" % numMismatchingEc
-
+    analyze(OhBxMatchingAnalysis(), events)
 
 def analyzeNumVfats(events):
-    numVfats = []
-    for event in events:
-        vfats = 0
-        for chamber in event.chambers:
-            vfats += len(chamber.vfats)
-            numVfats.append(vfats)
-
-
-    print "===================================================="
-    print "Number of VFATs per event histogram:"
-    print ""
-    histogram(numVfats)
-
+    analyze(NumVfatsAnalysis(), events)
 
 def analyzeNumChambers(events):
-    numChambers = []
-
-    for event in events:
-        numChambers.append(len(event.chambers))
-
-    print "===================================================="
-    print "Number of chambers per event histogram:"
-    print ""
-    histogram(numChambers, 0, 8, 8)
+    analyze(NumChambersAnalysis(), events)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Unit tests of the additions to text_histogram:
+#   python -m unittest test_text_histogram (or pytest) from this directory
+
+import sys
+import unittest
+from collections import Counter
+from StringIO import StringIO
+from text_histogram import median, weighted_median, histogram, histogram_counts
+
+def printed(function, *args, **kwargs):
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        function(*args, **kwargs)
+        return sys.stdout.getvalue()
+    finally:
+        sys.stdout = stdout
+
+class WeightedMedianTest(unittest.TestCase):
+
+    def testOdd(self):
+        self.assertEqual(weighted_median({8: 1, 7: 1, 9: 1, 1: 1, 2: 1, 6: 1, 3: 1}), 6)
+
+    def testEven(self):
+        self.assertEqual(weighted_median({4: 1, 5: 1, 2: 1, 1: 1, 9: 1, 10: 1}), 4)
+        self.assertEqual("%.2f" % weighted_median({4.0: 1, 5: 1, 2: 1, 1: 1, 9: 1, 10: 1}), "4.50")
+
+    def testCounts(self):
+        self.assertEqual(weighted_median({1: 2, 2: 2, 9: 1}), 2)
+        values = [3, 3, 3, 7, 7, 12, 0, 0]
+        self.assertEqual(weighted_median(Counter(values)), median(values))
+
+class HistogramCountsTest(unittest.TestCase):
+
+    values = [0, 1, 1, 2, 3, 3, 3, 5, 8, 8, 13, 21, 24, 24, 24, -4]
+
+    # the output of histogram before it was built on histogram_counts
+    expected = [
+        ((), {}, [
+            "# NumSamples = 16; Min = -4.00; Max = 24.00",
+            "# Mean = 8.500000; Variance = 86.500000; SD = 9.300538; Median 4.000000",
+            "# each ∎ represents a count of 1",
+            "   -4.0000 -    -2.0000 [     1]: ∎",
+            "   -2.0000 -     0.0000 [     1]: ∎",
+            "    0.0000 -     2.0000 [     3]: ∎∎∎",
+            "    2.0000 -     4.0000 [     3]: ∎∎∎",
+            "    4.0000 -     6.0000 [     1]: ∎",
+            "    6.0000 -     8.0000 [     2]: ∎∎",
+            "    8.0000 -    10.0000 [     0]: ",
+            "   10.0000 -    12.0000 [     0]: ",
+            "   12.0000 -    14.0000 [     1]: ∎",
+            "   14.0000 -    16.0000 [     0]: "]),
+        ((1, 30, 7), {}, [
+            "# NumSamples = 16; Min = 1.00; Max = 30.00",
+            "# 2 values outside of min/max",
+            "# Mean = 8.500000; Variance = 86.500000; SD = 9.300538; Median 4.000000",
+            "# each ∎ represents a count of 1",
+            "    1.0000 -     5.1429 [     7]: ∎∎∎∎∎∎∎",
+            "    5.1429 -     9.2857 [     2]: ∎∎",
+            "    9.2857 -    13.4286 [     1]: ∎",
+            "   13.4286 -    17.5714 [     0]: ",
+            "   17.5714 -    21.7143 [     1]: ∎",
+            "   21.7143 -    25.8571 [     3]: ∎∎∎",
+            "   25.8571 -    30.0000 [     0]: "]),
+        ((), {'custbuckets': '1,5,10,20'}, [
+            "# NumSamples = 16; Min = -4.00; Max = 24.00",
+            "# Mean = 8.500000; Variance = 86.500000; SD = 9.300538; Median 4.000000",
+            "# each ∎ represents a count of 1",
+            "   -4.0000 -     1.0000 [     4]: ∎∎∎∎",
+            "    1.0000 -     5.0000 [     5]: ∎∎∎∎∎",
+            "    5.0000 -    10.0000 [     2]: ∎∎",
+            "   10.0000 -    24.0000 [     5]: ∎∎∎∎∎"]),
+        ((), {'calc_msvd': False}, [
+            "# NumSamples = 16; Min = -4.00; Max = 24.00",
+            "# each ∎ represents a count of 1",
+            "   -4.0000 -    -2.0000 [     1]: ∎",
+            "   -2.0000 -     0.0000 [     1]: ∎",
+            "    0.0000 -     2.0000 [     3]: ∎∎∎",
+            "    2.0000 -     4.0000 [     3]: ∎∎∎",
+            "    4.0000 -     6.0000 [     1]: ∎",
+            "    6.0000 -     8.0000 [     2]: ∎∎",
+            "    8.0000 -    10.0000 [     0]: ",
+            "   10.0000 -    12.0000 [     0]: ",
+            "   12.0000 -    14.0000 [     1]: ∎",
+            "   14.0000 -    16.0000 [     0]: "]),
+    ]
+
+    def testCounts(self):
+        for args, kwargs, lines in self.expected:
+            self.assertEqual(printed(histogram_counts, Counter(self.values), *args, **kwargs), '\n'.join(lines) + '\n')
+
+    def testStream(self):
+        for args, kwargs, lines in self.expected:
+            self.assertEqual(printed(histogram, iter(self.values), *args, **kwargs), '\n'.join(lines) + '\n')
+
+    # the running mean of the old histogram printed -0.000000 here
+    def testZeroMean(self):
+        self.assertIn("# Mean = 0.000000;", printed(histogram_counts, Counter([-1, -2, -1, 5, -3, -5, 5, -2, -1, 5]), 0, 8, 8))
+
+    def testSkipped(self):
+        self.assertIn("# 7 values outside of min/max", printed(histogram_counts, Counter(self.values), 1, 8, 7))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# Unit tests of the columnar decoder, compared with the event objects of unpack:
+#   python -m unittest test_unpack_columnar (or pytest) from this directory
+
+import random
+import struct
+import unittest
+import numpy as np
+import unpack
+from unpack import AMC13_EVT_PREFIX_SIZE
+from unpack_columnar import decodeAmc13Events
+
+# a small synthetic raw file: events with 0 to 2 chambers of 24 VFAT3 blocks, some with errors (a missing VFAT, a
+# BC mismatch and the chamber error flag), and some with a FED block that does not end on a 64bit word
+def vfatBlock(rand, vfat, l1a, bc):
+    chanData = rand.getrandbits(128) if rand.random() < 0.5 else 0
+    return [(vfat << 56) | (0x1e << 40) | ((l1a & 0xff) << 32) | (bc << 16) | (chanData >> 112),
+            (chanData >> 48) & 0xffffffffffffffff,
+            ((chanData & 0xffffffffffff) << 16) | rand.getrandbits(16)]
+
+def amc13Event(rand, l1a, bx, numChambers, bad=False, odd=False):
+    amcWords = [(1 << 56) | (l1a << 32) | (bx << 20),
+                (3 << 60) | (0x1234 << 16) | 0xbeef,
+                (0x3 << 40) | (numChambers << 11) | (4 if bad else 8)]
+    for chamber in range(numChambers):
+        numVfats = 23 if bad and chamber == 0 else 24
+        amcWords.append((chamber << 35) | ((numVfats * 3) << 23) | ((1 << 22) if bad else 0))
+        for vfat in range(numVfats):
+            amcWords += vfatBlock(rand, vfat, l1a, bx + 5 if bad and vfat == 3 else bx + 1)
+        amcWords.append((numVfats * 3) << 36)
+    amcWords.append(0x78)
+    amcWords.append(((l1a & 0xff) << 24) | (len(amcWords) + 1))
+    words = [(5 << 60) | (1 << 56) | (l1a << 32) | (bx << 20) | (0x123 << 8), (1 << 52) | (7 << 4), (len(amcWords) << 32) | (1 << 16)]
+    words += amcWords
+    words += [0, (0xa << 60) | ((len(words) + 2) << 32) | (8 << 4)]
+    fedData = struct.pack('<%dQ' % len(words), *words)
+    if odd:
+        fedData = fedData[:-3]
+    return struct.pack('<16sH6s', '\0' * 16, len(fedData), '\0' * 6) + fedData
+
+def rawFile(numEvts, odd=False):
+    rand = random.Random(1)
+    return ''.join(amc13Event(rand, i, rand.randint(0, 3500), rand.choice([0, 0, 1, 2]), bad=(i % 7 == 3), odd=odd and i % 5 == 2)
+                   for i in range(numEvts))
+
+# the events decoded one by one with unpack
+def unpackEvents(data):
+    events = []
+    fedBlockSizes = []
+    pos = 0
+    while pos < len(data):
+        fedBlockSize = struct.unpack_from('<H', data, pos + 16)[0]
+        fedBlockSizes.append(fedBlockSize)
+        events.append(unpack.unpackAmc13Evt(buffer(data, pos + AMC13_EVT_PREFIX_SIZE, fedBlockSize), pos))
+        pos += AMC13_EVT_PREFIX_SIZE + fedBlockSize
+    return events, fedBlockSizes
+
+class DecodeTest(unittest.TestCase):
+
+    # useFedBlockSizes: give the decoder the FED block sizes, as read from an event index
+    def checkSame(self, data, useFedBlockSizes=False):
+        events, sizes = unpackEvents(data)
+        fedBlockSizes = np.array(sizes, dtype=np.uint16).tostring() if useFedBlockSizes else None
+        evts, amcs, chambers, vfats = decodeAmc13Events(np.frombuffer(data, dtype=np.uint8), fedBlockSizes)
+
+        self.assertEqual(len(evts['l1aId']), len(events))
+        chamberIdx = 0
+        vfatIdx = 0
+        for i, event in enumerate(events):
+            for name in ['l1aId', 'bxId', 'fedId', 'numberAmcs', 'orbitId', 'trailerMarker', 'eventLength', 'ttsState']:
+                self.assertEqual(evts[name][i], getattr(event, name), (i, name))
+            self.assertEqual(evts['hasError'][i], bool(event.hasError(False)), i)
+            for amc in event.amcs:
+                for chamber in amc.chambers:
+                    for name in ['vfatWordCnt', 'inputId', 'evtFifoFull', 'vfatWordCntTrail']:
+                        self.assertEqual(chambers[name][chamberIdx], getattr(chamber, name), (i, name))
+                    chamberIdx += 1
+                    for vfat in chamber.vfats:
+                        self.assertEqual((vfats['bc'][vfatIdx], vfats['crc'][vfatIdx], vfats['numHits'][vfatIdx]),
+                                         (vfat.bc, vfat.crc, vfat.numHits), i)
+                        self.assertEqual((int(vfats['chanDataHigh'][vfatIdx]) << 64) | int(vfats['chanDataLow'][vfatIdx]), vfat.chanData, i)
+                        self.assertEqual(vfats['hasError'][vfatIdx], bool(vfat.hasError(False)), i)
+                        vfatIdx += 1
+        self.assertEqual(chamberIdx, len(chambers['inputId']))
+        self.assertEqual(vfatIdx, len(vfats['bc']))
+        # the test data has to exercise the error paths
+        self.assertTrue(evts['hasError'].any() and not evts['hasError'].all())
+
+    def testAligned(self):
+        self.checkSame(rawFile(40))
+
+    def testUnaligned(self):
+        self.checkSame(rawFile(40, odd=True))
+
+    def testFedBlockSizes(self):
+        self.checkSame(rawFile(40, odd=True), useFedBlockSizes=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,6 +24,7 @@ http://www.pandamatak.com/people/anand/xfer/histo
 http://github.com/bitly/data_hacks
 """
 from decimal import Decimal
+import bisect
 import math
 import sys
 
@@ -98,21 +99,45 @@ def histogram(stream, minimum=None, maximum=None, buckets=None, custbuckets=None
     custbuckets: Comma seperated list of bucket edges for the histogram
     calc_msvd: Calculate and display Mean, Variance and SD.
     """
-    if not minimum or not maximum:
-        # glob the iterator here so we can do min/max on it
-        data = list(stream)
+    counts = {}
+    for value in stream:
+        counts[value] = counts.get(value, 0) + 1
+    histogram_counts(counts, minimum, maximum, buckets, custbuckets, calc_msvd)
+
+
+def weighted_median(counts):
+    """ median of the values of a dict of value -> number of occurrences, same as median() on the expanded values"""
+    length = sum(counts.values())
+    if length%2:
+        median_indeces = [length/2]
     else:
-        data = stream
+        median_indeces = [length/2-1, length/2]
+
+    median_values = []
+    index = 0
+    for value in sorted(counts):
+        index += counts[value]
+        while median_indeces and median_indeces[0] < index:
+            median_values.append(value)
+            median_indeces.pop(0)
+    return sum(median_values) / len(median_values)
+
+
+def histogram_counts(counts, minimum=None, maximum=None, buckets=None, custbuckets=None, calc_msvd=True):
+    """
+    Same as histogram, but from a dict of value -> number of occurrences instead of a stream of values,
+    so that the data does not need to be kept in memory (the dict only grows with the number of distinct values)
+    """
     bucket_scale = 1
 
     if minimum:
         min_v = Decimal(minimum)
     else:
-        min_v = min(data)
+        min_v = min(counts)
     if maximum:
         max_v = Decimal(maximum)
     else:
-        max_v = max(data)
+        max_v = max(counts)
 
     if not max_v > min_v:
         raise ValueError('max must be > min. max:%s min:%s' % (max_v, min_v))
@@ -151,21 +176,16 @@ def histogram(stream, minimum=None, maximum=None, buckets=None, custbuckets=None
 
     skipped = 0
     samples = 0
-    mvsd = MVSD()
-    accepted_data = []
-    for value in data:
-        samples +=1
-        if calc_msvd:
-            mvsd.add(value)
-            accepted_data.append(value)
-        # find the bucket this goes in
+    for value in sorted(counts):
+        count = counts[value]
+        samples += count
         if value < min_v or value > max_v:
-            skipped +=1
+            skipped += count
             continue
-        for bucket_postion, boundary in enumerate(boundaries):
-            if value <= boundary:
-                bucket_counts[bucket_postion] +=1
-                break
+        # the first boundary >= value
+        bucket_position = bisect.bisect_left(boundaries, value)
+        if bucket_position < buckets:
+            bucket_counts[bucket_position] += count
 
     # auto-pick the hash scale
     if max(bucket_counts) > 75:
@@ -175,7 +195,11 @@ def histogram(stream, minimum=None, maximum=None, buckets=None, custbuckets=None
     if skipped:
         print "# %d value%s outside of min/max" % (skipped, skipped > 1 and 's' or '')
     if calc_msvd:
-        print "# Mean = %f; Variance = %f; SD = %f; Median %f" % (mvsd.mean(), mvsd.var(), mvsd.sd(), median(accepted_data))
+        # MVSD.add only handles a weight of 1, compute them directly. The sums are exact, so a mean of zero prints as
+        # 0.000000 where the running mean of MVSD could leave a tiny negative residue and print -0.000000
+        mean = sum(Decimal(value) * count for value, count in counts.items()) / samples
+        var = sum(count * (Decimal(value) - mean) * (Decimal(value) - mean) for value, count in counts.items()) / samples
+        print "# Mean = %f; Variance = %f; SD = %f; Median %f" % (mean, var, math.sqrt(var), weighted_median(counts))
     print "# each ∎ represents a count of %d" % bucket_scale
     bucket_min = min_v
     bucket_max = min_v
@@ -7,7 +7,12 @@ import os
 import fnmatch
 import struct
 import zlib
+import mmap
 import math
+import copy
+import itertools
+import multiprocessing
+from array import array
 import analyze_events
 from enum import Enum
 
@@ -15,6 +20,18 @@ IS_MINIDAQ_FORMAT = False
 VERBOSE = False
 DEBUG = False
 
+AMC13_EVT_PREFIX_SIZE = 24 # bytes in front of each FED block, the FED block size is at byte 16
+
+# event index files (see EvtIndex)
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = 'GEMIDX01'
+EVT_HAS_VFATS = 0x1
+EVT_HAS_ERROR = 0x2
+
+# parallel decoding (see decodeChunks)
+CHUNK_EVTS = 10000 # events per work unit
+POOL_TIMEOUT = 24 * 3600 # waiting on the pool with a timeout keeps python 2 responsive to ctrl-c
+
 class Error(Enum):
     AMC_BUF_STATUS = 1
     AMC_TTS_STATE = 2
@@ -72,13 +89,7 @@ class Amc13(object):
         self.amcIds = []
 
     def unpackAmc13Block(self, str, verbose=False):
-        # pad with zeros if necessary to align to 64bit boundary
-        while len(str) % 8 != 0:
-            if verbose:
-                print "adding a zero at the end of the string to align to 64bit boundary"
-            str += '\0'
-
-        words = struct.unpack("%dQ" % int(len(str) / 8), str)
+        words = unpackWords(str, verbose)
 
         idx = self.unpackAmc13Header(words, 0, verbose)
 
@@ -162,6 +173,13 @@ class Amc13(object):
         self.printAmc13Trailer()
 
 
+    def getNumVfatBlocks(self):
+        numVfats = 0
+        for amc in self.amcs:
+            numVfats += amc.getNumVfatBlocks()
+
+        return numVfats
+
     def hasError(self, verbose):
         for amc in self.amcs:
             if amc.hasError(verbose):
@@ -207,13 +225,7 @@ class GemAmc(object):
         pass
 
     def unpackGemAmcBlockStr(self, str, verbose=False):
-        # pad with zeros if necessary to align to 64bit boundary
-        while len(str) % 8 != 0:
-            if verbose:
-                print "adding a zero at the end of the string to align to 64bit boundary"
-            str += '\0'
-
-        words = struct.unpack("%dQ" % int(len(str) / 8), str)
+        words = unpackWords(str, verbose)
 
     def unpackGemAmcBlock(self, words, idx, verbose=False):
         idx = self.unpackGemAmcHeader(words, idx, verbose)
@@ -635,6 +647,255 @@ class GemVfat3(object):
 
             return True
 
+class EvtIndex(object):
+    """Index of the events of an AMC13 format raw file: FED block size, L1A ID, BX ID and flags (EVT_HAS_VFATS,
+    EVT_HAS_ERROR) of each event, which is enough to find the byte offset of any event and seek to it directly.
+    It is built in one pass over the file and saved next to it (<raw file>.idx), it is rebuilt when the raw file changes"""
+
+    filename = None
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.fedBlockSizes = array('H')
+        self.l1aIds = array('I')
+        self.bxIds = array('H')
+        self.flags = array('B')
+
+    def __len__(self):
+        return len(self.flags)
+
+    def offset(self, evtNum):
+        """Byte offset of the start of the event in the file"""
+        return evtNum * AMC13_EVT_PREFIX_SIZE + sum(self.fedBlockSizes[:evtNum])
+
+    def offsets(self, evtNums):
+        """Generator over (evtNum, byte offset) for the given increasing event numbers"""
+        evtNum = 0
+        offset = 0
+        for wanted in evtNums:
+            while evtNum < wanted:
+                offset += AMC13_EVT_PREFIX_SIZE + self.fedBlockSizes[evtNum]
+                evtNum += 1
+            yield evtNum, offset
+
+    def find(self, flag):
+        """Generator over the numbers of the events having the given flag set"""
+        for evtNum, flags in enumerate(self.flags):
+            if flags & flag:
+                yield evtNum
+
+    def rawFileStat(self):
+        stat = os.stat(self.filename)
+        return stat.st_size, stat.st_mtime
+
+    def add(self, event):
+        flags = 0
+        if event.getNumVfatBlocks() > 0:
+            flags |= EVT_HAS_VFATS
+        if event.hasError(False):
+            flags |= EVT_HAS_ERROR
+        self.l1aIds.append(event.l1aId)
+        self.bxIds.append(event.bxId)
+        self.flags.append(flags)
+
+    def merge(self, other):
+        self.l1aIds.extend(other.l1aIds)
+        self.bxIds.extend(other.bxIds)
+        self.flags.extend(other.flags)
+
+    def build(self, jobs=1):
+        """Finds the events from their FED block sizes, then decodes them over jobs processes to fill the other columns"""
+        self.__init__(self.filename)
+        fedBlockSizes = scanFedBlockSizes(self.filename)
+        decodeChunks(splitEvts(self.filename, fedBlockSizes), [self], jobs)
+        self.fedBlockSizes = fedBlockSizes
+
+    def save(self):
+        f = open(self.filename + INDEX_SUFFIX, 'wb')
+        try:
+            fileSize, mtime = self.rawFileStat()
+            f.write(struct.pack("<8sQdQ", INDEX_MAGIC, fileSize, mtime, len(self)))
+            for column in (self.fedBlockSizes, self.l1aIds, self.bxIds, self.flags):
+                column.tofile(f)
+        finally:
+            f.close()
+
+    def load(self):
+        """Loads the index file, returns False if there is none or if it is out of date"""
+        indexFilename = self.filename + INDEX_SUFFIX
+        if not os.path.exists(indexFilename):
+            return False
+        f = open(indexFilename, 'rb')
+        try:
+            header = f.read(struct.calcsize("<8sQdQ"))
+            if len(header) != struct.calcsize("<8sQdQ"):
+                return False
+            magic, fileSize, mtime, numEvts = struct.unpack("<8sQdQ", header)
+            if magic != INDEX_MAGIC or (fileSize, mtime) != self.rawFileStat():
+                return False
+            try:
+                for column in (self.fedBlockSizes, self.l1aIds, self.bxIds, self.flags):
+                    column.fromfile(f, numEvts)
+            except EOFError:
+                self.__init__(self.filename)
+                return False
+        finally:
+            f.close()
+        return True
+
+def getEvtIndex(filename, rebuild=False, jobs=1):
+    """Returns the event index of a raw file, building it (and saving it next to the file if possible) when needed"""
+    index = EvtIndex(filename)
+    if not rebuild and index.load():
+        return index
+    print "Indexing file %s" % filename
+    index.build(jobs)
+    try:
+        index.save()
+        print "%d events, index saved to %s" % (len(index), filename + INDEX_SUFFIX)
+    except IOError as e:
+        printRed("Could not save the event index of %s: %s" % (filename, e))
+    return index
+
+class EvtCounts(object):
+    """Numbers of events, AMC blocks, chambers and VFAT blocks, and of events with VFAT blocks and with errors"""
+
+    def __init__(self):
+        self.numEvts = 0
+        self.numAmcs = 0
+        self.numChambers = 0
+        self.numVfats = 0
+        self.numNonZeroEvts = 0
+        self.numErrorEvts = 0
+
+    def add(self, event):
+        amcs = event.amcs if isinstance(event, Amc13) else [event]
+        numVfats = 0
+        for amc in amcs:
+            self.numChambers += len(amc.chambers)
+            numVfats += amc.getNumVfatBlocks()
+        self.numEvts += 1
+        self.numAmcs += len(amcs)
+        self.numVfats += numVfats
+        if numVfats > 0:
+            self.numNonZeroEvts += 1
+        if event.hasError(False):
+            self.numErrorEvts += 1
+
+    def merge(self, other):
+        self.numEvts += other.numEvts
+        self.numAmcs += other.numAmcs
+        self.numChambers += other.numChambers
+        self.numVfats += other.numVfats
+        self.numNonZeroEvts += other.numNonZeroEvts
+        self.numErrorEvts += other.numErrorEvts
+
+    def printResults(self):
+        print ""
+        print "===================================================="
+        print "Events: %d" % self.numEvts
+        print "AMC blocks: %d" % self.numAmcs
+        print "Chambers: %d" % self.numChambers
+        print "VFAT blocks: %d" % self.numVfats
+        print "Events with VFAT blocks: %d" % self.numNonZeroEvts
+        printGreenRed("Events with errors: %d" % self.numErrorEvts, self.numErrorEvts, 0)
+
+def scanFedBlockSizes(filename):
+    """Returns the FED block sizes of the events of an AMC13 format raw file, only the event headers are read"""
+    fedBlockSizes = array('H')
+    f = open(filename, 'rb')
+    try:
+        for startIdx, fedData in iterAmc13Evts(f):
+            fedBlockSizes.append(len(fedData))
+    finally:
+        f.close()
+    return fedBlockSizes
+
+def getFedBlockSizes(filename):
+    """FED block sizes from the event index of the file if it is up to date, otherwise from the event headers"""
+    index = EvtIndex(filename)
+    if index.load():
+        return index.fedBlockSizes
+    return scanFedBlockSizes(filename)
+
+def splitEvts(filename, fedBlockSizes, chunkEvts=CHUNK_EVTS):
+    """Splits the events of a raw file in work units of chunkEvts events: (filename, start byte offset, number of events)"""
+    chunks = []
+    startIdx = 0
+    for firstEvt in range(0, len(fedBlockSizes), chunkEvts):
+        numEvts = min(chunkEvts, len(fedBlockSizes) - firstEvt)
+        chunks.append((filename, startIdx, numEvts))
+        startIdx += numEvts * AMC13_EVT_PREFIX_SIZE + sum(fedBlockSizes[firstEvt:firstEvt + numEvts])
+    return chunks
+
+def decodeChunk(work):
+    """Decodes the events of a work unit and feeds them to the accumulators, returns the accumulators"""
+    (filename, startIdx, numEvts), accumulators = work
+    f = open(filename, 'rb')
+    evts = iterAmc13Evts(f, startIdx)
+    try:
+        for startIdx, fedData in itertools.islice(evts, numEvts):
+            event = unpackAmc13Evt(fedData, startIdx)
+            for accumulator in accumulators:
+                accumulator.add(event)
+    finally:
+        # only part of the file is read, closing the generator unmaps the file
+        evts.close()
+        f.close()
+    return accumulators
+
+def initWorker():
+    # ctrl-c is handled by the main process, which terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def decodeChunks(chunks, accumulators, jobs=1):
+    """Decodes the events of the work units (see splitEvts) over jobs processes (one per core if 0).
+    The accumulators are objects with add(event) and merge(other) methods: each work unit is fed to a copy of them,
+    which is then merged back into them in the order of the work units"""
+    # the copies are made from the accumulators as they are before any merge
+    empty = copy.deepcopy(accumulators)
+    if jobs == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            for accumulator, result in zip(accumulators, decodeChunk((chunk, copy.deepcopy(empty)))):
+                accumulator.merge(result)
+        return
+
+    pool = multiprocessing.Pool(jobs or None, initWorker)
+    try:
+        results = pool.imap(decodeChunk, [(chunk, empty) for chunk in chunks])
+        for i in range(len(chunks)):
+            for accumulator, result in zip(accumulators, results.next(POOL_TIMEOUT)):
+                accumulator.merge(result)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+def runAccumulators(files, accumulators, jobs=1):
+    """Feeds all the events of the files to the accumulators, the AMC13 format files are decoded over jobs processes"""
+    if IS_MINIDAQ_FORMAT:
+        for file in files:
+            f = open(file, 'rb')
+            for event, endIdx in readEvts(f):
+                for accumulator in accumulators:
+                    accumulator.add(event)
+            f.close()
+        return
+
+    chunks = []
+    for file in files:
+        chunks += splitEvts(file, getFedBlockSizes(file))
+    decodeChunks(chunks, accumulators, jobs)
+
+def readAmc13EvtAt(mappedFile, startIdx, verbose=False, debug=False, evtNum=-1):
+    """Reads the AMC13 event starting at the given byte offset of a mapped file (see mapFile), returns the event and
+    the byte offset of its end"""
+    for startIdx, fedData in mappedAmc13Evts(mappedFile, startIdx):
+        return unpackAmc13Evt(fedData, startIdx, verbose, debug, evtNum), startIdx + AMC13_EVT_PREFIX_SIZE + len(fedData)
+    return None, startIdx
+
 def main():
 
     rawFilename = ''
@@ -643,14 +904,25 @@ def main():
     countNonZero = False
     printError = False
 
+    jobs = 1
+    if "-j" in sys.argv:
+        idx = sys.argv.index("-j")
+        jobs = int(sys.argv[idx + 1])
+        del sys.argv[idx:idx + 2]
+
     if len(sys.argv) < 3:
-        print('Usage: unpack.py <gem_raw_file> <command> [command_params]')
+        print('Usage: unpack.py <gem_raw_file> <command> [command_params] [-j <num_processes>]')
         print('The filename can contain some regexp features to match multiple files. Supported expressions are: * -- wildcard, ? -- match any single character, [seq] -- matches any char in seq, [!seq] -- matches any char not in seq')
         print('When using regexp filename, make sure to enclose that in double quotes')
         print('Commands:')
         print('    print <evt_number> -- prints the requested event')
         print('    print_non_zero_event <non_zero_evt_number> -- prints the requested event while only counting events that contain at least one vfat block')
-        print('    print_error -- prints the first even with error')
+        print('    print_error <evt_number> -- prints the events with errors after the given event number')
+        print('    index -- (re)builds the event index files (<gem_raw_file>%s) that the print commands use to go directly to the requested events, they are otherwise built when first needed' % INDEX_SUFFIX)
+        print('    summary -- prints the numbers of events, AMC blocks, chambers, VFAT blocks, events with VFAT blocks and events with errors')
+        print('    %s -- analyses of all the events, several of them can be given (in place of the command or after it), they run in one pass over the events' % ', '.join(flag for flag, analysis in analyze_events.ANALYSES))
+        print('Options:')
+        print('    -j <num_processes> -- decodes the events with this many processes (one per core if 0) when building the event indexes, for the summary and for the analyses, default: 1')
         return
     else:
         rawFilename = sys.argv[1]
@@ -686,7 +958,30 @@ def main():
         if evtNumToPrint >= 0:
             print "Will start printing errors only after event #%d" % evtNumToPrint
 
-    events = []
+    if command == "index":
+        for file in files:
+            getEvtIndex(file, True, jobs)
+        return
+
+    # the print commands read the events they need directly, using the event index of each file
+    if "print" in command and not IS_MINIDAQ_FORMAT:
+        printIndexedEvts(files, evtNumToPrint, countNonZero, printError, jobs)
+        return
+
+    # the commands going through all the events, decoded in parallel
+    accumulators = []
+    if command == "summary":
+        accumulators.append(EvtCounts())
+    for flag, analysis in analyze_events.ANALYSES:
+        if flag in sys.argv:
+            accumulators.append(analysis())
+
+    if len(accumulators) > 0:
+        runAccumulators(files, accumulators, jobs)
+        for accumulator in accumulators:
+            accumulator.printResults()
+        return
+
     i = 0
     nonZeroI = 0
 
@@ -695,75 +990,107 @@ def main():
         f = open(file, 'rb')
         fileSize = os.fstat(f.fileno()).st_size
 
-        if IS_MINIDAQ_FORMAT:
-            evtHeaderSize = readInitRecord(f, VERBOSE)
-
         print "File size = %d bytes" % fileSize
 
-        while True:
-            if f.tell() >= fileSize - 1:
-                printCyan("End of file reached")
-                f.close()
-                break
-
-            event = None
-            if IS_MINIDAQ_FORMAT:
-                event = readEvtRecord(f, fileSize, evtHeaderSize, VERBOSE, DEBUG, i)
-            else:
-                event = readAmc13Evt(f, fileSize, VERBOSE, DEBUG, i)
-
-            if event is not None:
-                #events.append(event)
-
-                if printError:
-                    if i > evtNumToPrint and event.hasError(True):
-                        #event.printEvent()
-                        printRed("Event #%d (ending at byte %d in file %s)" % (i, f.tell(), file))
-                        print("Print the whole event? (y/n)")
-                        yn = raw_input()
-                        if (yn == "y"):
-                            print ""
-                            print ""
-                            print "======================================================================================"
-                            print ""
-                            event.printEvent()
-
-                        print("Do you want to continue? (y/n)")
-                        yn = raw_input()
-                        if (yn != "y"):
-                            return
-                elif not countNonZero and (i == evtNumToPrint):
+        for event, endIdx in readEvts(f, i):
+            if printError:
+                if i > evtNumToPrint and event.hasError(True):
+                    if not promptErrorEvt(event, i, endIdx, file):
+                        return
+            elif not countNonZero and (i == evtNumToPrint):
+                event.printEvent()
+                printRed("Event #%d (ending at byte %d in file %s)" % (i, endIdx, file))
+                return
+            elif countNonZero and (event.getNumVfatBlocks() > 0):
+                if nonZeroI == evtNumToPrint:
                     event.printEvent()
-                    printRed("Event #%d (ending at byte %d in file %s)" % (i, f.tell(), file))
+                    printRed("Event #%d (ending at byte %d in file %s)" % (i, endIdx, file))
                     return
-                elif countNonZero and (event.getNumVfatBlocks() > 0):
-                    if nonZeroI == evtNumToPrint:
-                        event.printEvent()
-                        printRed("Event #%d (ending at byte %d in file %s)" % (i, f.tell(), file))
-                        return
-                    nonZeroI += 1
+                nonZeroI += 1
 
-                i += 1
+            i += 1
 
-            #print "Read event #%d ending at byte %d" % (i, f.tell())
+            #print "Read event #%d ending at byte %d" % (i, endIdx)
 
+        printCyan("End of file reached")
         f.close()
 
-    # some quick and dirty analysis runs
-    if "analyze_bx_diff" in sys.argv:
-        analyze_events.analyzeBxDiff(events)
+def readEvts(f, evtNum=0):
+    """Generator over the events of a raw file, yields (event, endIdx), endIdx being the byte offset of the end of the event in the file.
+    The AMC13 format files are read through a memory map (see iterAmc13Evts)"""
+    fileSize = os.fstat(f.fileno()).st_size
+    if IS_MINIDAQ_FORMAT:
+        evtHeaderSize = readInitRecord(f, VERBOSE)
+        while f.tell() < fileSize - 1:
+            event = readEvtRecord(f, fileSize, evtHeaderSize, VERBOSE, DEBUG, evtNum)
+            if event is not None:
+                yield event, f.tell()
+                evtNum += 1
+    else:
+        for startIdx, fedData in iterAmc13Evts(f):
+            yield unpackAmc13Evt(fedData, startIdx, VERBOSE, DEBUG, evtNum), startIdx + AMC13_EVT_PREFIX_SIZE + len(fedData)
+            evtNum += 1
+
+def promptErrorEvt(event, evtNum, endIdx, file):
+    """Asks whether to print the whole event with errors, returns False if the user does not want to continue"""
+    #event.printEvent()
+    printRed("Event #%d (ending at byte %d in file %s)" % (evtNum, endIdx, file))
+    print("Print the whole event? (y/n)")
+    yn = raw_input()
+    if (yn == "y"):
+        print ""
+        print ""
+        print "======================================================================================"
+        print ""
+        event.printEvent()
 
-    if "analyze_bx" in sys.argv:
-        analyze_events.analyzeBx(events)
+    print("Do you want to continue? (y/n)")
+    yn = raw_input()
+    return yn == "y"
 
-    if "analyze_num_chambers" in sys.argv:
-        analyze_events.analyzeNumChambers(events)
+def printIndexedEvts(files, evtNumToPrint, countNonZero, printError, jobs=1):
+    """The print, print_non_zero_event and print_error commands using the event indexes: only the events to print are read"""
+    i = 0 # number of the first event of the current file
+    nonZeroI = 0
+    for file in files:
+        index = getEvtIndex(file, jobs=jobs)
+        evtNums = []
+        if printError:
+            evtNums = [evtNum for evtNum in index.find(EVT_HAS_ERROR) if i + evtNum > evtNumToPrint]
+        elif countNonZero:
+            for evtNum in index.find(EVT_HAS_VFATS):
+                if nonZeroI == evtNumToPrint:
+                    evtNums.append(evtNum)
+                    break
+                nonZeroI += 1
+        elif 0 <= evtNumToPrint - i < len(index):
+            evtNums.append(evtNumToPrint - i)
+
+        if len(evtNums) > 0:
+            print("Opening file: %s" % file)
+            with open(file, 'rb') as f:
+                # the file is mapped once for all its events to print
+                mappedFile = mapFile(f)
+                try:
+                    for evtNum, offset in index.offsets(evtNums):
+                        event, endIdx = readAmc13EvtAt(mappedFile, offset, VERBOSE, DEBUG, i + evtNum)
+                        if printError:
+                            event.hasError(True)
+                            if not promptErrorEvt(event, i + evtNum, endIdx, file):
+                                return
+                        else:
+                            event.printEvent()
+                            printRed("Event #%d (ending at byte %d in file %s)" % (i + evtNum, endIdx, file))
+                            return
+                finally:
+                    mappedFile[0].close()
 
-    if "analyze_num_vfats" in sys.argv:
-        analyze_events.analyzeNumVfats(events)
+        i += len(index)
 
-    if "analyze_vfat_bx_matching" in sys.argv:
-        analyze_events.analyzeVfatBxMatching(events)
+    if printError:
+        printCyan("No more events with errors")
+    else:
+        printRed("Event #%d not found, %d events in total" % (evtNumToPrint, i))
 
 def readInitRecord(f, verbose=False):
     code = readNumber(f, 1)
@@ -852,6 +1179,11 @@ def readAmc13Evt(f, fileSize, verbose=False, debug=False, evtNum=-1):
         printRed("Unexpected end of file, startIdx = %d, fedBlockSize = %d, filesize = %d" % (startIdx, fedBlockSize, fileSize))
     fedData = f.read(fedBlockSize)
 
+    return unpackAmc13Evt(fedData, startIdx, verbose, debug, evtNum)
+
+def unpackAmc13Evt(fedData, startIdx, verbose=False, debug=False, evtNum=-1):
+    fedBlockSize = len(fedData)
+
     if verbose:
         print ""
         print "====================================================="
@@ -876,6 +1208,57 @@ def readAmc13Evt(f, fileSize, verbose=False, debug=False, evtNum=-1):
 
     return event
 
+def mapFile(f):
+    """Maps the whole file read only, returns the map and a function giving zero-copy views (offset, size) into it.
+    The views must not be used once the map is closed"""
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        view = memoryview(data)
+        return data, lambda offset, size: view[offset:offset + size]
+    except TypeError:
+        # python 2 mmap objects only have the old buffer interface, buffer() slices are zero-copy as well
+        return data, lambda offset, size: buffer(data, offset, size)
+
+def iterAmc13Evts(f, startIdx=0):
+    """Generator over the AMC13 events of a raw file, from the byte offset startIdx: yields (startIdx, fedData) for each
+    event, fedData being a zero-copy view of the FED block in a read only mmap of the file (no read() and no copy per event).
+    Pass fedData to unpackAmc13Evt to decode the event. The file is unmapped when the generator ends or is closed, so
+    fedData is only valid until the next event is requested"""
+    if os.fstat(f.fileno()).st_size == 0:
+        return
+    mappedFile = mapFile(f)
+    try:
+        for evt in mappedAmc13Evts(mappedFile, startIdx):
+            yield evt
+    finally:
+        mappedFile[0].close()
+
+def mappedAmc13Evts(mappedFile, startIdx=0):
+    """iterAmc13Evts over a file already mapped with mapFile"""
+    data, view = mappedFile
+    fileSize = len(data)
+    while startIdx < fileSize - 1:
+        if (startIdx + AMC13_EVT_PREFIX_SIZE >= fileSize):
+            printRed("Unexpected end of file, startIdx = %d, filesize = %d" % (startIdx, fileSize))
+            return
+        fedBlockSize = struct.unpack_from("<H", data, startIdx + 16)[0]
+        if (startIdx + AMC13_EVT_PREFIX_SIZE + fedBlockSize > fileSize):
+            printRed("Unexpected end of file, startIdx = %d, fedBlockSize = %d, filesize = %d" % (startIdx, fedBlockSize, fileSize))
+            return
+        yield startIdx, view(startIdx + AMC13_EVT_PREFIX_SIZE, fedBlockSize)
+        startIdx += AMC13_EVT_PREFIX_SIZE + fedBlockSize
+
+def unpackWords(data, verbose=False):
+    """Unpacks a block of data (string, buffer or memoryview) into 64bit words, the last word is padded with zeros if the
+    block does not end on a 64bit boundary (only those last bytes are copied)"""
+    numWords = len(data) // 8
+    words = struct.unpack_from("%dQ" % numWords, data)
+    if len(data) % 8 != 0:
+        if verbose:
+            print "adding %d zeros at the end of the data to align to 64bit boundary" % (8 - len(data) % 8)
+        words += struct.unpack("Q", (bytes(data[numWords * 8:]) + '\0' * 8)[:8])
+    return words
+
 def readNumber(f, numBytes):
     formatStr = "<"
     if numBytes == 1:
@@ -894,7 +1277,7 @@ def readNumber(f, numBytes):
     return word
 
 def printHexBlock64BigEndian(str, length):
-    fedBytes = struct.unpack("%dB" % length, str)
+    fedBytes = struct.unpack_from("%dB" % length, str)
     # print "length: %d, str length: %d, num of 8 byte words: %d" % (len(fedBytes), len(str), int(math.ceil(length / 8.0)))
     for i in range(0, int(math.ceil(length / 8.0))):
         idx = i * 8
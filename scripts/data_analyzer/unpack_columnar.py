@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+
+# Columnar decoder for the AMC13 raw files read by unpack.py.
+# Instead of decoding one 64bit word at a time into an Amc13 / GemAmc / GemChamber / GemVfat3 object tree, the file is
+# viewed as a numpy uint64 array and each field is extracted for all the events at once with vectorised shifts and masks.
+# The result is four dicts of arrays (events, amcs, chambers and vfats) with the same field names as the attributes of
+# the unpack.py classes, one entry per event / AMC / chamber / VFAT block, and index arrays (event, amc, chamber)
+# pointing to the parent entries.
+#
+# Usage: unpack_columnar.py <gem_raw_file> [output.npz]
+
+from utils import *
+import sys
+import os
+import struct
+import time
+import numpy as np
+import unpack
+from unpack import AMC13_EVT_PREFIX_SIZE
+
+def field(words, shift, mask):
+    """Extracts (words >> shift) & mask, in the smallest unsigned type that holds the mask"""
+    values = (words >> np.uint64(shift)) & np.uint64(mask)
+    if mask <= 0xff:
+        return values.astype(np.uint8)
+    elif mask <= 0xffff:
+        return values.astype(np.uint16)
+    elif mask <= 0xffffffff:
+        return values.astype(np.uint32)
+    return values
+
+def flag(words, bit):
+    return ((words >> np.uint64(bit)) & np.uint64(1)).astype(np.bool_)
+
+def groupStarts(counts):
+    """Index of the first child of each parent, given the number of children of each parent"""
+    return np.cumsum(counts) - counts
+
+def childIndices(counts):
+    """Parent index and index within the parent of every child, given the number of children of each parent"""
+    counts = counts.astype(np.int64)
+    parents = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+    return parents, np.arange(len(parents), dtype=np.int64) - np.repeat(groupStarts(counts), counts)
+
+def findAmc13Events(data, fedBlockSizes=None):
+    """Returns the byte offsets and sizes of the FED blocks in the raw file data (a uint8 array).
+    Each event header gives the size of the event, i.e. where the next one starts, so the events can only be found by
+    reading one header after the other. When the FED block sizes are known (e.g. from the event index of the file, see
+    unpack.getFedBlockSizes) the offsets are computed from them with a cumulative sum instead"""
+    if fedBlockSizes is not None:
+        sizes = np.frombuffer(fedBlockSizes, dtype=np.uint16).astype(np.int64)
+        return groupStarts(sizes + AMC13_EVT_PREFIX_SIZE) + AMC13_EVT_PREFIX_SIZE, sizes
+    offsets = []
+    sizes = []
+    pos = 0
+    end = len(data)
+    while pos + AMC13_EVT_PREFIX_SIZE < end:
+        size = struct.unpack_from("<H", data, pos + 16)[0]
+        if pos + AMC13_EVT_PREFIX_SIZE + size > end:
+            printRed("Unexpected end of file, startIdx = %d, fedBlockSize = %d, filesize = %d" % (pos, size, end))
+            break
+        offsets.append(pos + AMC13_EVT_PREFIX_SIZE)
+        sizes.append(size)
+        pos += AMC13_EVT_PREFIX_SIZE + size
+    return np.array(offsets, dtype=np.int64), np.array(sizes, dtype=np.int64)
+
+def toWords(data, offsets, sizes):
+    """Returns the FED blocks as one uint64 array and the first word and number of words of each block.
+    The blocks are used in place when they are all 64bit aligned, otherwise they are copied back to back, each one
+    padded with zeros to a 64bit boundary"""
+    numWords = (sizes + 7) // 8
+    if np.all(offsets % 8 == 0) and np.all(sizes % 8 == 0):
+        words = data[:len(data) // 8 * 8].view('<u8')
+        return words, offsets // 8, numWords
+    starts = groupStarts(numWords)
+    packed = np.zeros(int(numWords.sum()), dtype='<u8')
+    # the file is viewed as 64bit words from each of the 8 byte alignments (no copy), the words of the blocks starting
+    # at a given alignment are copied from the matching view
+    for shift in range(8):
+        blocks = np.nonzero(offsets % 8 == shift)[0]
+        if len(blocks) == 0:
+            continue
+        view = data[shift:shift + (len(data) - shift) // 8 * 8].view('<u8')
+        counts = numWords[blocks]
+        wordIdx = np.arange(int(counts.sum()), dtype=np.int64)
+        firstWord = np.repeat(groupStarts(counts), counts)
+        dest = wordIdx + np.repeat(starts[blocks], counts) - firstWord
+        src = wordIdx + np.repeat((offsets[blocks] - shift) // 8, counts) - firstWord
+        del wordIdx, firstWord
+        inView = src < len(view)
+        packed[dest[inView]] = view[src[inView]]
+        if not np.all(inView):
+            # the last word of a block ending in the last bytes of the file, past the end of the view
+            tail = np.zeros(8, dtype=np.uint8)
+            tailBytes = data[shift + len(view) * 8:]
+            tail[:len(tailBytes)] = tailBytes
+            packed[dest[~inView]] = tail.view('<u8')[0]
+    # the last word of a block that is not a multiple of 8 bytes long also got the first bytes of what follows it
+    partial = np.nonzero(sizes % 8 != 0)[0]
+    lastWords = starts[partial] + numWords[partial] - 1
+    packed[lastWords] &= (np.uint64(1) << (8 * (sizes[partial] % 8)).astype(np.uint64)) - np.uint64(1)
+    return packed, starts, numWords
+
+def decodeAmc13Events(data, fedBlockSizes=None):
+    """Decodes all the AMC13 events in the raw file data (a uint8 array, e.g. a numpy.memmap of the file).
+    Returns the events, amcs, chambers and vfats dicts of field arrays"""
+    offsets, sizes = findAmc13Events(data, fedBlockSizes)
+    words, evtStart, evtWords = toWords(data, offsets, sizes)
+    evtEnd = evtStart + evtWords
+    # every read goes through wordsAt, reading past the last event (corrupted data) gives the last word of the file
+    def wordsAt(idx):
+        return words[np.minimum(idx, len(words) - 1)]
+
+    # AMC13 header
+    events = {'offset': offsets - AMC13_EVT_PREFIX_SIZE, 'fedBlockSize': sizes}
+    w = wordsAt(evtStart)
+    events['headerMarker1'] = field(w, 60, 0xf)
+    events['eventType'] = field(w, 56, 0xf)
+    events['l1aId'] = field(w, 32, 0xffffff)
+    events['bxId'] = field(w, 20, 0xfff)
+    events['fedId'] = field(w, 8, 0xfff)
+    w = wordsAt(evtStart + 1)
+    events['numberAmcs'] = field(w, 52, 0xf)
+    events['orbitId'] = field(w, 4, 0xffffffff)
+    events['headerMarker2'] = field(w, 0, 0xf)
+    numberAmcs = events['numberAmcs'].astype(np.int64)
+
+    # AMC block sizes: the AMC blocks follow each other after the size words
+    amcs = {}
+    amcEvent, amcIdx = childIndices(numberAmcs)
+    w = wordsAt(evtStart[amcEvent] + 2 + amcIdx)
+    amcs['event'] = amcEvent
+    amcs['amcBlockSize'] = field(w, 32, 0xffffff)
+    amcs['amcId'] = field(w, 16, 0xf)
+    blockSizes = amcs['amcBlockSize'].astype(np.int64)
+    priorSizes = np.cumsum(blockSizes) - blockSizes
+    priorSizes -= priorSizes[groupStarts(numberAmcs)[amcEvent]]
+    amcStart = evtStart[amcEvent] + 2 + numberAmcs[amcEvent] + priorSizes
+
+    # AMC13 trailer, one word after the last AMC block like in Amc13.unpackAmc13Trailer
+    amcWords = np.zeros(len(evtStart), dtype=np.int64)
+    np.add.at(amcWords, amcEvent, blockSizes)
+    w = wordsAt(evtStart + 2 + numberAmcs + amcWords + 1)
+    events['trailerMarker'] = field(w, 60, 0xf)
+    events['eventLength'] = field(w, 32, 0xffffff)
+    events['eventStatus'] = field(w, 8, 0xf)
+    events['ttsState'] = field(w, 4, 0xf)
+
+    # GEM AMC header and event header
+    w = wordsAt(amcStart)
+    amcs['amcNum'] = field(w, 56, 0xf)
+    amcs['l1aId'] = field(w, 32, 0xffffff)
+    amcs['bxId'] = field(w, 20, 0xfff)
+    w = wordsAt(amcStart + 1)
+    amcs['formatVersion'] = field(w, 60, 0xf)
+    amcs['runType'] = field(w, 56, 0xf)
+    amcs['runParams'] = field(w, 32, 0xffffff)
+    amcs['orbitId'] = field(w, 16, 0xffff)
+    amcs['boardId'] = field(w, 0, 0xffff)
+    w = wordsAt(amcStart + 2)
+    amcs['davList'] = field(w, 40, 0xffffff)
+    amcs['bufStatus'] = field(w, 16, 0xffffff)
+    amcs['davCount'] = field(w, 11, 0x1f)
+    amcs['ttsState'] = field(w, 0, 0xf)
+
+    # chambers: their sizes are only known from their headers, so walk them one chamber index at a time for all AMCs
+    davCount = amcs['davCount'].astype(np.int64)
+    amcPremature = np.zeros(len(amcStart), dtype=np.bool_)
+    ptr = amcStart + 3
+    chamberSteps = []
+    for chamberIdx in range(int(davCount.max()) if len(davCount) > 0 else 0):
+        active = np.nonzero((davCount > chamberIdx) & ~amcPremature)[0]
+        idx = ptr[active]
+        w = wordsAt(idx)
+        vfatWordCnt = field(w, 23, 0xfff).astype(np.int64)
+        # like GemChamber.unpackGemChamberBlock, a chamber block running past the end of the event stops the AMC decoding
+        # (a VFAT word count that doesn't divide by 3 makes unpack.py exit, here it is also treated as a premature end of event)
+        premature = (idx + 1 + vfatWordCnt > evtEnd[amcEvent[active]]) | (vfatWordCnt % 3 != 0)
+        amcPremature[active[premature]] = True
+        chamberSteps.append((active, np.full(len(active), chamberIdx, dtype=np.int64), idx, w, premature))
+        ptr[active] = idx + 2 + vfatWordCnt
+
+    chambers = {}
+    if chamberSteps:
+        chamberAmc, chamberIdx, chamberStart, w, premature = [np.concatenate(column) for column in zip(*chamberSteps)]
+    else:
+        chamberAmc, chamberIdx, chamberStart = [np.zeros(0, dtype=np.int64) for i in range(3)]
+        w, premature = np.zeros(0, dtype=words.dtype), np.zeros(0, dtype=np.bool_)
+    order = np.lexsort((chamberIdx, chamberAmc))
+    chamberAmc, chamberIdx, chamberStart, w, premature = chamberAmc[order], chamberIdx[order], chamberStart[order], w[order], premature[order]
+    chambers['event'] = amcEvent[chamberAmc]
+    chambers['amc'] = chamberAmc
+    chambers['chamberIdx'] = chamberIdx
+    chambers['zsWordCnt'] = field(w, 40, 0xfff)
+    chambers['inputId'] = field(w, 35, 0x1f)
+    chambers['vfatWordCnt'] = field(w, 23, 0xfff)
+    chambers['evtFifoFull'] = flag(w, 22)
+    chambers['inFifoFull'] = flag(w, 21)
+    chambers['l1aFifoFull'] = flag(w, 20)
+    chambers['evtSizeOvf'] = flag(w, 19)
+    chambers['evtFifoNearFull'] = flag(w, 18)
+    chambers['inFifoNearFull'] = flag(w, 17)
+    chambers['l1aFifoNearFull'] = flag(w, 16)
+    chambers['evtSizeMoreThan24'] = flag(w, 15)
+    chambers['noVfatMarker'] = flag(w, 14)
+    chambers['prematureEoeReached'] = premature
+    numVfats = np.where(premature, 0, chambers['vfatWordCnt'] // 3).astype(np.int64)
+    chambers['numVfats'] = numVfats
+
+    # chamber trailers (none for the premature ones)
+    w = wordsAt(np.where(premature, 0, chamberStart + 1 + 3 * numVfats))
+    chambers['vfatWordCntTrail'] = np.where(premature, 0, field(w, 36, 0xfff))
+    chambers['evtFifoUnf'] = flag(w, 35) & ~premature
+    chambers['inFifoUnf'] = flag(w, 33) & ~premature
+
+    # GEM event trailer and AMC trailer, after the last chamber (none for the premature AMCs)
+    amcs['prematureEoeReached'] = amcPremature
+    w = wordsAt(np.where(amcPremature, 0, ptr))
+    amcs['davTimeoutFlags'] = np.where(amcPremature, 0, field(w, 40, 0xffffff))
+    amcs['daqAlmostFull'] = flag(w, 7) & ~amcPremature
+    amcs['mmcmLocked'] = flag(w, 6) & ~amcPremature
+    amcs['daqClkLocked'] = flag(w, 5) & ~amcPremature
+    amcs['daqReady'] = flag(w, 4) & ~amcPremature
+    amcs['bc0Locked'] = flag(w, 3) & ~amcPremature
+    w = wordsAt(np.where(amcPremature, 0, ptr + 1))
+    amcs['l1aIdTrail'] = np.where(amcPremature, 0, field(w, 24, 0xff))
+    amcs['wordCnt'] = np.where(amcPremature, 0, field(w, 0, 0xfffff))
+
+    # VFAT3 blocks, 3 words each
+    vfats = {}
+    vfatChamber, vfatIdx = childIndices(numVfats)
+    idx = chamberStart[vfatChamber] + 1 + 3 * vfatIdx
+    w0 = wordsAt(idx)
+    w1 = wordsAt(idx + 1)
+    w2 = wordsAt(idx + 2)
+    vfats['event'] = chambers['event'][vfatChamber]
+    vfats['amc'] = chamberAmc[vfatChamber]
+    vfats['chamber'] = vfatChamber
+    vfats['vfatIdx'] = vfatIdx
+    vfats['position'] = field(w0, 56, 0xff)
+    vfats['crcError'] = flag(w0, 48)
+    vfats['header'] = field(w0, 40, 0xff)
+    vfats['warning'] = (vfats['header'] == 0x5e) | (vfats['header'] == 0x56)
+    vfats['ec'] = field(w0, 32, 0xff)
+    vfats['bc'] = field(w0, 16, 0xffff)
+    # the 128 channel bits are split in two 64bit words: chanData = chanDataHigh << 64 | chanDataLow
+    vfats['chanDataHigh'] = ((w0 & np.uint64(0xffff)) << np.uint64(48)) | (w1 >> np.uint64(16))
+    vfats['chanDataLow'] = ((w1 & np.uint64(0xffff)) << np.uint64(48)) | field(w2, 16, 0xffffffffffff)
+    vfats['crc'] = field(w2, 0, 0xffff)
+    chanBytes = np.concatenate((vfats['chanDataHigh'].view(np.uint8).reshape(-1, 8), vfats['chanDataLow'].view(np.uint8).reshape(-1, 8)), axis=1)
+    vfats['numHits'] = np.unpackbits(chanBytes, axis=1).sum(axis=1).astype(np.uint8)
+
+    # the same checks as the hasError methods of the unpack.py classes
+    vfats['hasError'] = (vfats['bc'] != amcs['bxId'][vfats['amc']].astype(np.int64) + 1) | (vfats['header'] != 0x1e) | vfats['warning'] | vfats['crcError']
+    chambers['hasError'] = chambers['evtFifoFull'] | chambers['inFifoFull'] | chambers['l1aFifoFull'] | chambers['evtSizeOvf'] | \
+                           chambers['evtFifoNearFull'] | chambers['inFifoNearFull'] | chambers['l1aFifoNearFull'] | \
+                           chambers['evtSizeMoreThan24'] | chambers['noVfatMarker'] | chambers['evtFifoUnf'] | \
+                           chambers['inFifoUnf'] | (numVfats != 24) | premature
+    amcs['hasError'] = (amcs['bufStatus'] != 0) | (amcs['ttsState'] != 8) | (amcs['davTimeoutFlags'] != 0) | amcs['daqAlmostFull'] | \
+                       ~amcs['mmcmLocked'] | ~amcs['daqClkLocked'] | ~amcs['daqReady'] | ~amcs['bc0Locked'] | amcPremature
+    np.logical_or.at(amcs['hasError'], chamberAmc, chambers['hasError'])
+    np.logical_or.at(amcs['hasError'], vfats['amc'], vfats['hasError'])
+    events['hasError'] = np.zeros(len(evtStart), dtype=np.bool_)
+    np.logical_or.at(events['hasError'], amcEvent, amcs['hasError'])
+    events['numVfats'] = np.bincount(vfats['event'], minlength=len(evtStart))
+
+    return events, amcs, chambers, vfats
+
+def decodeAmc13File(filename):
+    """decodeAmc13Events over a memory map of the file, with the FED block sizes of its event index if it has one"""
+    return decodeAmc13Events(np.memmap(filename, dtype=np.uint8, mode='r'), unpack.getFedBlockSizes(filename))
+
+def main():
+    if len(sys.argv) < 2:
+        print('Usage: unpack_columnar.py <gem_raw_file> [output.npz]')
+        print('Decodes all the events of the file at once and prints a summary, optionally saving all the field arrays to a numpy .npz file (keys are <events|amcs|chambers|vfats>_<field>)')
+        return
+
+    rawFilename = sys.argv[1]
+    if not os.path.exists(rawFilename):
+        printRed("Input file %s does not exist." % rawFilename)
+        return
+
+    start = time.time()
+    events, amcs, chambers, vfats = decodeAmc13File(rawFilename)
+    elapsed = time.time() - start
+
+    print "File size = %d bytes, decoded in %.3f s" % (os.path.getsize(rawFilename), elapsed)
+    print "Events: %d" % len(events['l1aId'])
+    print "AMCs: %d" % len(amcs['amcNum'])
+    print "Chambers: %d" % len(chambers['inputId'])
+    print "VFAT blocks: %d" % len(vfats['bc'])
+    print "Events with VFAT blocks: %d" % np.count_nonzero(events['numVfats'])
+    printGreenRed("Events with errors: %d" % np.count_nonzero(events['hasError']), np.count_nonzero(events['hasError']), 0)
+
+    if len(sys.argv) > 2:
+        arrays = {}
+        for name, columns in (('events', events), ('amcs', amcs), ('chambers', chambers), ('vfats', vfats)):
+            for key in columns:
+                arrays[name + '_' + key] = columns[key]
+        np.savez(sys.argv[2], **arrays)
+        print "Field arrays saved to %s" % sys.argv[2]
+
+if __name__ == '__main__':
+    main()
@@ -57,17 +57,20 @@ def main():
         heading("Fiber mapping test on OH #%d" % oh)
         parseXML()
         # check GBT ready
+        gbtReady = readOhRegs([oh], ["GEM_AMC.OH_LINKS.OH%%d.GBT%d_READY" % gbt for gbt in range(0, 3)])[oh]
         for gbt in range(0, 3):
-            gbtReady = readReg(getNode("GEM_AMC.OH_LINKS.OH%d.GBT%d_READY" % (oh, gbt)))
-            if parseInt(gbtReady) != 1:
+            if gbtReady[gbt] != 1:
                 printRed("GBT #%d is not locked! Abort.." % gbt)
                 return
 
         writeReg(getNode("GEM_AMC.GEM_SYSTEM.CTRL.LINK_RESET"), 1)
         sleep(0.1)
 
-        for vfat, id in VFAT_CHIP_IDS.iteritems():
-            idEnc = parseInt(readReg(getNode("GEM_AMC.OH.OH%d.GEB.VFAT%d.HW_CHIP_ID" % (oh, vfat))))
+        # the chip IDs of all the VFATs in one transaction
+        vfats = VFAT_CHIP_IDS.keys()
+        idsEnc = readOhRegs([oh], ["GEM_AMC.OH.OH%%d.GEB.VFAT%d.HW_CHIP_ID" % vfat for vfat in vfats])[oh]
+        for vfat, idEnc in zip(vfats, idsEnc):
+            id = VFAT_CHIP_IDS[vfat]
             if idEnc == 0xdeaddead:
                 printRed("Unable to read the chip ID of VFAT #%d. Abort.." % vfat)
                 return
@@ -17,12 +17,14 @@ class Colors:
     RED     = '\033[91m' 
     ENDC    = '\033[0m'  
 
-ADDR_IC_ADDR = None
-ADDR_IC_WRITE_DATA = None
-ADDR_IC_EXEC_WRITE = None
-ADDR_IC_EXEC_READ = None
+# IC registers written for every GBTX register, bound to their address on first use
+# (ADDRESS is the only register of its word, no need to read the word back before writing it)
+IC_ADDR = RegHandle('GEM_AMC.SLOW_CONTROL.IC.ADDRESS', plainWrite=True)
+IC_WRITE_DATA = RegHandle('GEM_AMC.SLOW_CONTROL.IC.WRITE_DATA')
+IC_EXEC_WRITE = RegHandle('GEM_AMC.SLOW_CONTROL.IC.EXECUTE_WRITE')
+IC_EXEC_READ = RegHandle('GEM_AMC.SLOW_CONTROL.IC.EXECUTE_READ')
 
-ADDR_LINK_RESET = None
+LINK_RESET = RegHandle('GEM_AMC.GEM_SYSTEM.CTRL.LINK_RESET')
 
 ADDRESS_TABLE_SLOW_CTRL_ONLY = '/mnt/persistent/texas/gem_amc_top_SLOW_CTRL_ONLY.xml'
 
@@ -61,8 +63,6 @@ def main():
     else:
         parseXML()
 
-    initGbtRegAddrs()
-
     heading("Hello, I'm your GBT controller :)")
 
     if (checkGbtReady(ohSelect, gbtSelect) == 1):
@@ -93,7 +93,6 @@ def main():
         print('time took = ' + str(totalTime) + 's')
 
         if (command == 'v3b-phase-scan'):
-            initVfatRegAddrs()
             for elink, vfat in V3B_GBT_ELINK_TO_VFAT[gbtSelect].items():
                 subheading('Scanning elink %d phase, corresponding to VFAT%d' % (elink, vfat))
                 for phase in range(0, 16):
@@ -101,23 +100,24 @@ def main():
                     for subReg in range(0, 3):
                         addr = GBT_ELINK_SAMPLE_PHASE_REGS[elink][subReg]
                         value = (regs[addr] & 0xf0) + phase
-                        wReg(ADDR_IC_ADDR, addr)
-                        wReg(ADDR_IC_WRITE_DATA, value)
-                        wReg(ADDR_IC_EXEC_WRITE, 1)
+                        IC_ADDR.write(addr)
+                        IC_WRITE_DATA.write(value)
+                        IC_EXEC_WRITE.write(1)
                     # reset the link, give some time to lock and accumulate any sync errors and then check VFAT comms
                     sleep(0.1)
                     writeReg(getNode('GEM_AMC.GEM_SYSTEM.CTRL.LINK_RESET'), 1)
-                    # wReg(ADDR_LINK_RESET, 1)
+                    # LINK_RESET.write(1)
                     sleep(0.3)
-                    linkGood = parseInt(readReg(getNode('GEM_AMC.OH_LINKS.OH%d.VFAT%d.LINK_GOOD' % (ohSelect, vfat))))
-                    syncErrCnt = parseInt(readReg(getNode('GEM_AMC.OH_LINKS.OH%d.VFAT%d.SYNC_ERR_CNT' % (ohSelect, vfat))))
-                    cfgRun = readReg(getNode('GEM_AMC.OH.OH%d.GEB.VFAT%d.CFG_RUN' % (ohSelect, vfat)))
+                    # the link status and a VFAT register read back in one transaction
+                    linkGood, syncErrCnt, cfgRun = readOhRegs([ohSelect], ['GEM_AMC.OH_LINKS.OH%%d.VFAT%d.LINK_GOOD' % vfat,
+                                                                           'GEM_AMC.OH_LINKS.OH%%d.VFAT%d.SYNC_ERR_CNT' % vfat,
+                                                                           'GEM_AMC.OH.OH%%d.GEB.VFAT%d.CFG_RUN' % vfat])[ohSelect]
                     color = Colors.GREEN
                     prefix = 'GOOD: '
-                    if (linkGood == 0) or (syncErrCnt > 0) or (cfgRun != '0x00000000' and cfgRun != '0x00000001'):
+                    if (linkGood == 0) or (syncErrCnt > 0) or (cfgRun != 0 and cfgRun != 1):
                         color = Colors.RED
                         prefix = '>>>>>>>> BAD <<<<<<<< '
-                    print color, prefix, 'Phase = %d, VFAT%d LINK_GOOD=%d, SYNC_ERR_CNT=%d, CFG_RUN=%s' % (phase, vfat, linkGood, syncErrCnt, cfgRun), Colors.ENDC
+                    print color, prefix, 'Phase = %d, VFAT%d LINK_GOOD=%d, SYNC_ERR_CNT=%d, CFG_RUN=0x%08x' % (phase, vfat, linkGood, syncErrCnt, cfgRun), Colors.ENDC
 
     elif command == 'destroy':
         subheading('Destroying configuration of OH%d GBT%d' % (ohSelect, gbtSelect))
@@ -142,9 +142,9 @@ def downloadConfig(ohIdx, gbtIdx, filename):
     addr = 0
     for line in f:
         value = int(line, 16)
-        wReg(ADDR_IC_ADDR, addr)
-        wReg(ADDR_IC_WRITE_DATA, value)
-        wReg(ADDR_IC_EXEC_WRITE, 1)
+        IC_ADDR.write(addr)
+        IC_WRITE_DATA.write(value)
+        IC_EXEC_WRITE.write(1)
         addr += 1
         lines += 1
         ret.append(value)
@@ -159,23 +159,9 @@ def downloadConfig(ohIdx, gbtIdx, filename):
 
 def destroyConfig():
     for i in range(0, 369):
-        wReg(ADDR_IC_ADDR, i)
-        wReg(ADDR_IC_WRITE_DATA, 0)
-        wReg(ADDR_IC_EXEC_WRITE, 1)
-
-def initGbtRegAddrs():
-    global ADDR_IC_ADDR
-    global ADDR_IC_WRITE_DATA
-    global ADDR_IC_EXEC_WRITE
-    global ADDR_IC_EXEC_READ
-    ADDR_IC_ADDR = getNode('GEM_AMC.SLOW_CONTROL.IC.ADDRESS').real_address
-    ADDR_IC_WRITE_DATA = getNode('GEM_AMC.SLOW_CONTROL.IC.WRITE_DATA').real_address
-    ADDR_IC_EXEC_WRITE = getNode('GEM_AMC.SLOW_CONTROL.IC.EXECUTE_WRITE').real_address
-    ADDR_IC_EXEC_READ = getNode('GEM_AMC.SLOW_CONTROL.IC.EXECUTE_READ').real_address
-
-def initVfatRegAddrs():
-    global ADDR_LINK_RESET
-    ADDR_LINK_RESET = getNode('GEM_AMC.GEM_SYSTEM.CTRL.LINK_RESET').real_address
+        IC_ADDR.write(i)
+        IC_WRITE_DATA.write(0)
+        IC_EXEC_WRITE.write(1)
 
 def selectGbt(ohIdx, gbtIdx):
     linkIdx = ohIdx * 3 + gbtIdx
@@ -1,28 +1,123 @@
-import xml.etree.ElementTree as xml
+try: import xml.etree.cElementTree as xml
+except ImportError: import xml.etree.ElementTree as xml
 import sys, os, subprocess
+import mmap, ctypes, platform
+import marshal, hashlib, tempfile
+import collections, contextlib, bisect, itertools
+import socket, struct, threading
+import time, atexit, signal
+from array import array
+from multiprocessing.pool import ThreadPool
 
 DEBUG = True
 ADDRESS_TABLE_TOP = '/mnt/persistent/texas/gem_amc_top.xml'
-nodes = []
+AXI_IPB_BASE_ADDRESS = 0x64000000
+AXI_IPB_WINDOW_SIZE = 0x4000000 # GEM_AMC registers occupy 0x64000000-0x67ffffff in the Zynq address space
+# register access backend: 'mmap' (in-process /dev/mem access), 'mpeek' (mpeek/mpoke subprocess per access),
+# an IPbus URI (ipbustcp-2.0://host:port or ipbusudp-2.0://host:port) to access a card remotely
+# or a path to a regular file that is mapped instead of /dev/mem (for testing off-board).
+# When not set, mmap is used on the card (ARM with /dev/mem access) and mpeek everywhere else
+BACKEND = os.environ.get('RW_REG_BACKEND')
+backend = None
+# fully expanded address tables (see RegTable.expandAll) are cached in the user cache directory, $XDG_CACHE_HOME/rw_reg
+# or ~/.cache/rw_reg (or in the temp dir if it is not writable)
+USE_CACHE = os.environ.get('RW_REG_NO_CACHE') is None
+CACHE_VERSION = 4
+# register access statistics (see enableStats), turned on at import by setting RW_REG_STATS to a file name the summary
+# is appended to at exit, or to 1 to print it. kill -USR1 <pid> prints it at any time
+STATS = os.environ.get('RW_REG_STATS')
+stats = None
+# masked writes accumulated per address while write combining is on (see writeCombining), None when it's off
+pendingWrites = None
+# last known value of each software-owned (rw) register word, used instead of reading the hardware back for
+# read-modify-writes. None when the shadow is disabled (the default), see enableShadow
+shadowRegs = None
+# number of worker threads of the asynchronous API, i.e. how many requests can be in flight at the same time
+ASYNC_MAX_IN_FLIGHT = 8
+asyncPool = None
+# number of OHs of a CTP7, i.e. of bits of an OH mask (see readOhRegs)
+MAX_OH = 12
+# incremented by every parseXML, tells RegHandles to look their register up again
+tableVersion = 0
+# all node names joined into one string for fast substring searches, built on the first search (see findNodes)
+nameIndex = None
 
-class Node:
-    name = ''
+# node flags in the register table
+PERM_R = 0x1
+PERM_W = 0x2
+IS_MODULE = 0x4
+HAS_MASK = 0x8
+PERMISSIONS = (None, 'r', 'w', 'rw') # indexed by flags & (PERM_R | PERM_W)
+
+class Node(object):
+    """Lightweight view of one node of the register table (see RegTable), created on demand by getNode and friends.
+    The fields used by every register access are copied into the view, everything else is looked up in the table"""
+
+    __slots__ = ('table', 'idx', 'address', 'real_address', 'permission', 'mask', 'shift', 'isModule')
     vhdlname = ''
-    address = 0x0
-    real_address = 0x0
-    permission = ''  
-    mask = 0x0
-    isModule = False
-    parent = None
-    level = 0
-    mode = None
-    size = None
 
-    def __init__(self):
-        self.children = []
+    def __init__(self, table, idx):
+        self.table = table
+        self.idx = idx
+        self.address = table.address[idx]
+        self.real_address = (self.address<<2)+AXI_IPB_BASE_ADDRESS
+        flags = table.flags[idx]
+        self.permission = PERMISSIONS[flags & (PERM_R | PERM_W)]
+        self.mask = int(table.mask[idx]) if flags & HAS_MASK else None
+        self.shift = table.shift[idx]
+        self.isModule = bool(flags & IS_MODULE)
+
+    # several views of the same node compare equal
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.idx == other.idx and self.table is other.table
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return self.idx
+
+    @property
+    def name(self):
+        return self.table.getName(self.idx)
+
+    @property
+    def width(self):
+        return (self.mask >> self.shift).bit_length() if self.mask else 32
+
+    @property
+    def parent(self):
+        parentIdx = self.table.parent[self.idx]
+        return Node(self.table, parentIdx) if parentIdx >= 0 else None
+
+    @property
+    def level(self):
+        level = 0
+        parentIdx = self.table.parent[self.idx]
+        while parentIdx >= 0:
+            level += 1
+            parentIdx = self.table.parent[parentIdx]
+        return level
+
+    @property
+    def children(self):
+        return [Node(self.table, idx) for idx in self.table.getChildren(self.idx)]
+
+    @property
+    def mode(self):
+        return self.table.extra.get(self.idx, NO_EXTRA)[0]
+
+    @property
+    def size(self):
+        return self.table.extra.get(self.idx, NO_EXTRA)[1]
 
-    def addChild(self, child):
-        self.children.append(child)
+    @property
+    def warn_min_value(self):
+        return self.table.extra.get(self.idx, NO_EXTRA)[2]
+
+    @property
+    def error_min_value(self):
+        return self.table.extra.get(self.idx, NO_EXTRA)[3]
 
     def getVhdlName(self):
         return self.name.replace(TOP_NODE_NAME + '.', '').replace('.', '_')
@@ -35,6 +130,772 @@ class Node:
         print 'Module:',self.isModule
         print 'Parent:',self.parent.name
 
+NO_EXTRA = (None, None, None, None)
+
+class Generator(object):
+    """A generate="true" block of the address table that is expanded on demand (see RegTable). Instance i is
+    the XML element with the index variable set to i, at baseAddress + i * step"""
+
+    def __init__(self, element, baseAddress, vars, size, step, position):
+        self.element = element
+        self.baseAddress = baseAddress
+        self.vars = vars
+        self.idxVar = element.get('generate_idx_var')
+        self.size = size
+        self.step = step
+        self.position = position # number of siblings that come before the block in the address table
+        self.instances = {} # index -> node index of the expanded instances
+        self.instanceNames = None
+
+    # index of the instance with the given name, None if it's not one of the instances of this block
+    def getInstance(self, name):
+        if self.instanceNames is None:
+            self.instanceNames = {}
+            vars = dict(self.vars)
+            for i in range(self.size):
+                vars[self.idxVar] = i
+                self.instanceNames[substituteVars(self.element.get('id'), vars)] = i
+        return self.instanceNames.get(name)
+
+    # index of a not yet expanded instance having a node at the given address, None if there is none
+    def getInstanceAt(self, address, offsetsCache):
+        offsets = getAddressOffsets(self.element, offsetsCache)
+        for i in range(self.size):
+            if i not in self.instances and address - self.baseAddress - self.step * i in offsets:
+                return i
+        return None
+
+# addresses of all the nodes of an instance of an address table element, relative to the instance base address
+# (the instances of a generate="true" block don't necessarily fit in its address step, e.g. the OH registers)
+def getAddressOffsets(element, offsetsCache):
+    offsets = offsetsCache.get(element)
+    if offsets is None:
+        address = parseInt(element.get('address')) or 0
+        offsets = set([address])
+        for child in element:
+            childOffsets = getAddressOffsets(child, offsetsCache)
+            if child.get('generate') == 'true':
+                step = parseInt(child.get('generate_address_step'))
+                for i in range(parseInt(child.get('generate_size'))):
+                    offsets.update(address + step * i + offset for offset in childOffsets)
+            else:
+                offsets.update(address + offset for offset in childOffsets)
+        offsetsCache[element] = offsets
+    return offsets
+
+class RegTable(object):
+    """The register tree stored as parallel arrays indexed by node number, instead of one object per node.
+    A parent always comes before its children. Each node has an address, mask, shift, flags (permission, module,
+    whether it has a mask), parent index, index of its name in an interned table of name components (the full
+    name is rebuilt from the parents'), and first child / next sibling links. The few nodes with a mode, size or
+    monitoring thresholds keep them in the extra dict. Indexing or iterating the table gives Node views.
+
+    generate="true" blocks are expanded lazily: parsing only records them as Generators of their parent node and
+    an instance is only added to the table when a name or an address under it is looked up. Anything that needs
+    the children of a node expands its blocks completely, len(), indexing and iterating expand the whole table.
+    Indexing and iterating follow the address table order, which the node indexes don't (see getOrder)"""
+
+    COLUMNS = (('address', 'i'), ('mask', 'I'), ('shift', 'B'), ('flags', 'B'), ('parent', 'i'), ('nameIdx', 'I'),
+               ('firstChild', 'i'), ('lastChild', 'i'), ('nextSibling', 'i'))
+    NAME_KEY_STRIDE = 1 << 20 # child lookup keys are (parent index + 1) * NAME_KEY_STRIDE + name index
+
+    def __init__(self):
+        self.cache = None
+        self.clear()
+
+    def clear(self):
+        for column, typecode in self.COLUMNS:
+            setattr(self, column, array(typecode))
+        self.names = []
+        self.nameIds = {}
+        self.extra = {}
+        self.childIds = {}
+        self.byAddress = None
+        self.order = None
+        self.addressesDone = set() # addresses with all the instances having a node there expanded, see findAddress
+        self.firstRoot = -1
+        self.lastRoot = -1
+        self.generators = {} # parent node index -> list of Generators of the blocks not completely expanded yet
+        self.numExpanded = 0
+        self.offsetsCache = {} # see getAddressOffsets
+
+    def __len__(self):
+        self.expandAll()
+        return len(self.parent)
+
+    # indexing and iterating go through the nodes in the address table order, see getOrder
+    def __getitem__(self, position):
+        order = self.getOrder()
+        if isinstance(position, slice):
+            return [Node(self, idx) for idx in order[position]]
+        return Node(self, order[position])
+
+    def __iter__(self):
+        for idx in self.getOrder():
+            yield Node(self, idx)
+
+    # the node indexes of the fully expanded table in the address table (depth first) order: the generated instances
+    # are appended to the arrays when they are expanded, so the node index order is not that order
+    def getOrder(self):
+        self.expandAll()
+        if self.order is None or len(self.order) != len(self.parent):
+            self.order = array('i')
+            stack = list(reversed(self.getChildList(-1)))
+            while stack:
+                idx = stack.pop()
+                self.order.append(idx)
+                stack.extend(reversed(self.getChildList(idx)))
+        return self.order
+
+    def add(self, name, address, mask, permission, isModule, parentIdx, extra=NO_EXTRA):
+        idx = len(self.parent)
+        nameIdx = self.nameIds.get(name)
+        if nameIdx is None:
+            nameIdx = self.nameIds[name] = len(self.names)
+            self.names.append(name)
+        flags = 0
+        if permission is not None:
+            if 'r' in permission: flags |= PERM_R
+            if 'w' in permission: flags |= PERM_W
+        if isModule: flags |= IS_MODULE
+        if mask is not None: flags |= HAS_MASK
+        self.address.append(address)
+        self.mask.append(mask or 0)
+        self.shift.append((mask & -mask).bit_length() - 1 if mask else 0)
+        self.flags.append(flags)
+        self.parent.append(parentIdx)
+        self.nameIdx.append(nameIdx)
+        self.firstChild.append(-1)
+        self.lastChild.append(-1)
+        self.nextSibling.append(-1)
+        if extra != NO_EXTRA:
+            self.extra[idx] = extra
+        self.childIds[(parentIdx + 1) * self.NAME_KEY_STRIDE + nameIdx] = idx
+        if parentIdx < 0:
+            if self.lastRoot < 0: self.firstRoot = idx
+            else: self.nextSibling[self.lastRoot] = idx
+            self.lastRoot = idx
+        else:
+            if self.lastChild[parentIdx] < 0: self.firstChild[parentIdx] = idx
+            else: self.nextSibling[self.lastChild[parentIdx]] = idx
+            self.lastChild[parentIdx] = idx
+        if self.byAddress is not None:
+            real_address = (address<<2)+AXI_IPB_BASE_ADDRESS
+            first = self.byAddress.get(real_address)
+            if first is None or self.precedes(idx, first):
+                self.byAddress[real_address] = idx
+        return idx
+
+    def addGenerator(self, parentIdx, element, baseAddress, vars, size, step):
+        position = len(self.getChildList(parentIdx))
+        self.generators.setdefault(parentIdx, []).append(Generator(element, baseAddress, dict(vars), size, step, position))
+
+    # index of the node with the given full name, -1 if there's none
+    def find(self, name):
+        nameIds, childIds, stride = self.nameIds, self.childIds, self.NAME_KEY_STRIDE
+        idx = -1
+        for component in name.split('.'):
+            nameIdx = nameIds.get(component)
+            child = childIds.get((idx + 1) * stride + nameIdx, -1) if nameIdx is not None else -1
+            if child < 0 and idx in self.generators:
+                child = self.expandNamed(idx, component)
+            if child < 0:
+                return -1
+            idx = child
+        return idx
+
+    # index of the first node at the given AXI address, -1 if there's none
+    def findAddress(self, real_address):
+        if self.byAddress is None:
+            # several nodes share an address (modules, masked fields), keep the first one in the address table order like
+            # the old linear scan did. The generated instances are appended to the table when expanded, so the node index
+            # order is not the address table order: walk the tree depth first instead (and see add for later expansions)
+            self.byAddress = {}
+            stack = list(reversed(self.getOrderedChildren(-1)))
+            while stack:
+                idx = stack.pop()
+                self.byAddress.setdefault((self.address[idx]<<2)+AXI_IPB_BASE_ADDRESS, idx)
+                stack.extend(reversed(self.getOrderedChildren(idx)))
+        if real_address in self.addressesDone or not self.generators:
+            return self.byAddress.get(real_address, -1)
+        address = (real_address - AXI_IPB_BASE_ADDRESS) >> 2
+        while True:
+            # expand every generated instance with a node at that address (maybe only in one of its own generate blocks),
+            # one of them may come before the node already found
+            for parentIdx, generators in self.generators.items():
+                expanded = False
+                for generator in generators:
+                    i = generator.getInstanceAt(address, self.offsetsCache)
+                    if i is not None:
+                        self.expandInstance(parentIdx, generator, i)
+                        expanded = True
+                        break
+                if expanded:
+                    break
+            else:
+                break
+        self.addressesDone.add(real_address)
+        return self.byAddress.get(real_address, -1)
+
+    def getName(self, idx):
+        components = []
+        while idx >= 0:
+            components.append(self.names[self.nameIdx[idx]])
+            idx = self.parent[idx]
+        return '.'.join(reversed(components))
+
+    # full names of all the nodes, in the address table order (see getOrder)
+    def getNames(self):
+        order = self.getOrder()
+        names = []
+        for parentIdx, nameIdx in zip(self.parent, self.nameIdx):
+            names.append(self.names[nameIdx] if parentIdx < 0 else names[parentIdx] + '.' + self.names[nameIdx])
+        return [names[idx] for idx in order]
+
+    # indexes of the children of a node, or of the root nodes if idx is -1
+    def getChildren(self, idx):
+        if idx in self.generators:
+            self.expandChildren(idx)
+        return self.getChildList(idx)
+
+    def getChildList(self, idx):
+        child = self.firstRoot if idx < 0 else self.firstChild[idx]
+        children = []
+        while child >= 0:
+            children.append(child)
+            child = self.nextSibling[child]
+        return children
+
+    # children of a node in the address table order, with the instances expanded so far of its generate blocks
+    # in their place (getChildList has them in expansion order until expandChildren puts them in order)
+    def getOrderedChildren(self, idx):
+        generators = self.generators.get(idx)
+        if generators is None:
+            return self.getChildList(idx)
+        generated = set(child for generator in generators for child in generator.instances.itervalues())
+        plain = [child for child in self.getChildList(idx) if child not in generated]
+        children = []
+        done = 0
+        for generator in generators:
+            children.extend(plain[done:generator.position])
+            done = generator.position
+            children.extend(generator.instances[i] for i in sorted(generator.instances))
+        children.extend(plain[done:])
+        return children
+
+    # whether node a comes before node b in the address table (depth first) order
+    def precedes(self, a, b):
+        pathA = [a]
+        while self.parent[pathA[-1]] >= 0:
+            pathA.append(self.parent[pathA[-1]])
+        pathB = [b]
+        while self.parent[pathB[-1]] >= 0:
+            pathB.append(self.parent[pathB[-1]])
+        pathA.reverse()
+        pathB.reverse()
+        depth = 0
+        while depth < len(pathA) and depth < len(pathB) and pathA[depth] == pathB[depth]:
+            depth += 1
+        if depth == len(pathA) or depth == len(pathB): # one is an ancestor of the other
+            return len(pathA) < len(pathB)
+        siblings = self.getOrderedChildren(pathA[depth - 1] if depth > 0 else -1)
+        return siblings.index(pathA[depth]) < siblings.index(pathB[depth])
+
+    def setChildList(self, idx, children):
+        for prev, child in zip(children, children[1:] + [-1]):
+            self.nextSibling[prev] = child
+        first, last = (children[0], children[-1]) if children else (-1, -1)
+        if idx < 0:
+            self.firstRoot, self.lastRoot = first, last
+        else:
+            self.firstChild[idx], self.lastChild[idx] = first, last
+
+    def expandInstance(self, parentIdx, generator, i):
+        vars = dict(generator.vars)
+        vars[generator.idxVar] = i
+        generator.instances[i] = len(self.parent)
+        self.numExpanded += 1
+        makeTree(generator.element, generator.baseAddress + generator.step * i, self, parentIdx, vars, True)
+
+    # expands the instance of one of the blocks of a node with the given name, returns its index (-1 if none matches)
+    def expandNamed(self, parentIdx, name):
+        for generator in self.generators[parentIdx]:
+            i = generator.getInstance(name)
+            if i is not None:
+                if i not in generator.instances:
+                    self.expandInstance(parentIdx, generator, i)
+                return generator.instances[i]
+        return -1
+
+    # expands all the blocks of a node and puts its children in the address table order again
+    def expandChildren(self, parentIdx):
+        for generator in self.generators[parentIdx]:
+            for i in range(generator.size):
+                if i not in generator.instances:
+                    self.expandInstance(parentIdx, generator, i)
+        children = self.getOrderedChildren(parentIdx)
+        del self.generators[parentIdx]
+        self.setChildList(parentIdx, children)
+
+    def expandAll(self):
+        if not self.generators:
+            return
+        # the fully expanded table is cached, it's only valid if nothing has been expanded yet (the node indexes match)
+        fromScratch = self.numExpanded == 0 and self.cache is not None
+        if fromScratch and loadCache(self, *self.cache):
+            return
+        self.byAddress = None # rebuilt in one go on the next lookup, cheaper than ordering every added node
+        while self.generators:
+            for parentIdx in sorted(self.generators):
+                self.expandChildren(parentIdx)
+        if fromScratch:
+            saveCache(self, *self.cache)
+
+    # the table as plain python values for marshalling, see fromData
+    def toData(self):
+        return ([(column, getattr(self, column).tostring()) for column, typecode in self.COLUMNS],
+                self.names, self.extra, self.firstRoot, self.lastRoot)
+
+    def fromData(self, data):
+        self.clear()
+        columns, self.names, self.extra, self.firstRoot, self.lastRoot = data
+        for column, values in columns:
+            getattr(self, column).fromstring(values)
+        self.nameIds = dict((name, nameIdx) for nameIdx, name in enumerate(self.names))
+        stride = self.NAME_KEY_STRIDE
+        self.childIds = dict(zip([(parentIdx + 1) * stride + nameIdx for parentIdx, nameIdx in zip(self.parent, self.nameIdx)],
+                                 xrange(len(self.parent))))
+
+# the register tree, filled by parseXML
+nodes = RegTable()
+
+class RegError(Exception):
+    def __init__(self, code):
+        Exception.__init__(self, parseError(code))
+        self.code = code
+
+class Backend:
+    """Base class of the register access backends. A backend defines read(address), returning the 32-bit word at an
+    address, and write(address, value), raising RegError when the access fails. The batch accesses below are built on
+    these two, a backend may override them to do a whole batch of accesses in a single transaction"""
+
+    def readWords(self, addresses):
+        return [self.read(address) for address in addresses]
+
+    # words is a list of (address, value) pairs, written in that order
+    def writeWords(self, words):
+        for address, value in words:
+            self.write(address, value)
+
+    # reads count consecutive words starting at address, returns an array('I')
+    def readBlock(self, address, count):
+        return array('I', self.readWords(range(address, address + 4 * count, 4)))
+
+    # reads count words from the same address (a FIFO), returns an array('I')
+    def readFifo(self, address, count):
+        return array('I', self.readWords([address] * count))
+
+class MpeekBackend(Backend):
+    """Accesses registers by running the mpeek/mpoke utilities, one process per 32-bit access (batches share one shell)"""
+
+    MAX_BATCH = 256 # keeps the shell command line reasonably short
+
+    def read(self, address):
+        try: output = subprocess.check_output('mpeek '+str(address), stderr=subprocess.STDOUT , shell=True)
+        except subprocess.CalledProcessError as e: raise RegError(e.returncode)
+        return parseInt(''.join(s for s in output if s.isalnum()))
+
+    def write(self, address, value):
+        try: subprocess.check_output('mpoke '+str(address)+' '+str(value), stderr=subprocess.STDOUT , shell=True)
+        except subprocess.CalledProcessError as e: raise RegError(e.returncode)
+
+    def readWords(self, addresses):
+        values = []
+        for i in range(0, len(addresses), self.MAX_BATCH):
+            command = ' && '.join('mpeek '+str(address) for address in addresses[i:i+self.MAX_BATCH])
+            try: output = subprocess.check_output(command, stderr=subprocess.STDOUT , shell=True)
+            except subprocess.CalledProcessError as e: raise RegError(e.returncode)
+            values.extend(parseInt(value) for value in output.split())
+        return values
+
+    def writeWords(self, words):
+        for i in range(0, len(words), self.MAX_BATCH):
+            command = ' && '.join('mpoke '+str(address)+' '+str(value) for address, value in words[i:i+self.MAX_BATCH])
+            try: subprocess.check_output(command, stderr=subprocess.STDOUT , shell=True)
+            except subprocess.CalledProcessError as e: raise RegError(e.returncode)
+
+class MmapBackend(Backend):
+    """Accesses registers in-process through a memory mapping of the AXI-IPbus window.
+    With filename='/dev/mem' this is the real hardware (the same way gemloader maps it), any other
+    filename is treated as a plain file standing in for the register space (created if needed).
+    Addresses outside of the window are passed to the fallback backend if one is given."""
+
+    def __init__(self, filename='/dev/mem', base=AXI_IPB_BASE_ADDRESS, size=AXI_IPB_WINDOW_SIZE, fallback=None):
+        self.filename = filename
+        self.base = base
+        self.size = size
+        self.fallback = fallback
+        if filename == '/dev/mem':
+            fd = os.open(filename, os.O_RDWR | os.O_SYNC)
+            offset = base
+        else:
+            fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0644)
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            offset = 0
+        try: self.mem = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE, offset=offset)
+        finally: os.close(fd)
+        # accessing the mapping through a c_uint32 array guarantees single 32-bit bus transactions
+        self.words = (ctypes.c_uint32 * (size >> 2)).from_buffer(self.mem)
+
+    def wordIndex(self, address):
+        offset = address - self.base
+        if offset < 0 or offset >= self.size:
+            return None
+        if offset & 0x3:
+            raise RegError(1)
+        return offset >> 2
+
+    def read(self, address):
+        idx = self.wordIndex(address)
+        if idx is None:
+            if self.fallback is None: raise RegError(2)
+            return self.fallback.read(address)
+        return self.words[idx]
+
+    def write(self, address, value):
+        idx = self.wordIndex(address)
+        if idx is None:
+            if self.fallback is None: raise RegError(2)
+            return self.fallback.write(address, value)
+        self.words[idx] = value & 0xffffffff
+
+    def readWords(self, addresses):
+        words = self.words
+        values = []
+        for address in addresses:
+            idx = self.wordIndex(address)
+            values.append(words[idx] if idx is not None else self.read(address))
+        return values
+
+    def readBlock(self, address, count):
+        idx = self.wordIndex(address)
+        if idx is None or idx + count > len(self.words):
+            return Backend.readBlock(self, address, count)
+        # one memmove into the array instead of a python int per word (the memory nodes read with readBlock don't
+        # need the single 32-bit transactions of the register accesses)
+        words = array('I', [0]) * count
+        if count:
+            ctypes.memmove(words.buffer_info()[0], ctypes.addressof(self.words) + 4 * idx, 4 * count)
+        return words
+
+    # every word is a separate 32-bit read of the same location (memmove can't repeat a read). The loop is driven by
+    # itertools without a python level loop or a temporary list, but each word still goes through the c_uint32 array
+    # as a python int, so a FIFO read costs about 50 ns per word (vs ~1 ns per word for readBlock)
+    def readFifo(self, address, count):
+        idx = self.wordIndex(address)
+        if idx is None:
+            return Backend.readFifo(self, address, count)
+        words = array('I')
+        words.extend(itertools.imap(self.words.__getitem__, itertools.repeat(idx, count)))
+        return words
+
+class IPbusBackend(Backend):
+    """Accesses registers remotely through an IPbus 2.0 server, e.g. the ipbus app running on the card (port 60002).
+    The target is given as a uHAL style URI: ipbustcp-2.0://host:port or ipbusudp-2.0://host:port.
+    Like a uHAL dispatch(), every batch of accesses (readWords, writeWords, readBlock, readFifo) is packed into as few
+    packets as possible, consecutive addresses share one transaction, and several packets are kept in flight"""
+
+    MAX_PACKET_WORDS = 350 # request or reply words per packet, keeps UDP packets within a 1500 byte MTU
+    MAX_TXN_WORDS = 255 # the word count of a transaction header is 8 bits wide
+    MAX_IN_FLIGHT = 16 # packets sent before waiting for the first reply
+    TIMEOUT = 5.0
+    PACKET_HEADER = 0x200000f0 # IPbus 2.0 control packet, packet id 0 (no reliability mechanism)
+    READ, WRITE, NI_READ, NI_WRITE, RMW_BITS = range(5)
+
+    def __init__(self, uri):
+        self.uri = uri
+        protocol, _, location = uri.partition('://')
+        if protocol not in ('ipbustcp-2.0', 'ipbusudp-2.0') or location == '':
+            raise ValueError('Unsupported IPbus URI '+uri+' (expected ipbustcp-2.0://host:port or ipbusudp-2.0://host:port)')
+        self.tcp = protocol == 'ipbustcp-2.0'
+        host, _, port = location.partition(':')
+        self.target = (host, int(port) if port else (60002 if self.tcp else 50001))
+        # one connection per thread so that requests issued by the asynchronous API don't mix up their replies
+        self.local = threading.local()
+
+    # The card's IPbus server takes uHAL style addresses (see generate_registers.py) with the module number in the
+    # top nibble and moves it back in place (Client::modifyAddress). For the OH module the OH number and the
+    # sub-module nibbles are swapped as well. Module 0 and addresses above 24 bits can't be expressed
+    def ipbusAddress(self, address):
+        offset = address - AXI_IPB_BASE_ADDRESS
+        if offset < 0 or offset >= AXI_IPB_WINDOW_SIZE or offset & 0x3:
+            raise RegError(1)
+        address = offset >> 2
+        module = address >> 20
+        if module == 0 or module > 0xf:
+            raise RegError(1)
+        if module == 0x4:
+            return 0x40000000 | (address & 0xf000) << 12 | (address & 0xf0000) << 4 | address & 0xfff
+        return module << 28 | address & 0xfffff
+
+    def read(self, address):
+        return self.dispatch([(self.READ, self.ipbusAddress(address), 1, ())])[0][0]
+
+    def write(self, address, value):
+        self.dispatch([(self.WRITE, self.ipbusAddress(address), 1, (value & 0xffffffff,))])
+
+    def readWords(self, addresses):
+        transactions = []
+        for address in addresses:
+            address = self.ipbusAddress(address)
+            if transactions and address == transactions[-1][1] + transactions[-1][2] and transactions[-1][2] < self.MAX_TXN_WORDS:
+                transactions[-1][2] += 1
+            else:
+                transactions.append([self.READ, address, 1, ()])
+        return [value for data in self.dispatch(transactions) for value in data]
+
+    def readBlock(self, address, count):
+        return self.readSplit(self.READ, address, count)
+
+    def readFifo(self, address, count):
+        return self.readSplit(self.NI_READ, address, count)
+
+    # one transaction per MAX_TXN_WORDS words, a block read continues where the previous transaction stopped
+    # while a non-incrementing (FIFO) read stays on the same address
+    def readSplit(self, typeId, address, count):
+        transactions = []
+        for start in range(0, count, self.MAX_TXN_WORDS):
+            ipbusAddress = self.ipbusAddress(address + 4 * start if typeId == self.READ else address)
+            transactions.append((typeId, ipbusAddress, min(count - start, self.MAX_TXN_WORDS), ()))
+        values = array('I')
+        for data in self.dispatch(transactions):
+            values.extend(data)
+        return values
+
+    def writeWords(self, words):
+        transactions = []
+        for address, value in words:
+            address = self.ipbusAddress(address)
+            if transactions and address == transactions[-1][1] + transactions[-1][2] and transactions[-1][2] < self.MAX_TXN_WORDS:
+                transactions[-1][2] += 1
+                transactions[-1][3].append(value & 0xffffffff)
+            else:
+                transactions.append([self.WRITE, address, 1, [value & 0xffffffff]])
+        self.dispatch(transactions)
+
+    def dispatch(self, transactions):
+        """Executes a list of (type, IPbus address, number of words, payload) transactions and returns
+        the list of words read back by each of them. Raises a RegError if any of them failed"""
+        packets = []
+        for txnId, (typeId, address, words, payload) in enumerate(transactions):
+            requestWords = 2 + len(payload)
+            replyWords = 1 + (words if typeId in (self.READ, self.NI_READ) else 1 if typeId == self.RMW_BITS else 0)
+            if not packets or len(packets[-1][0]) + requestWords > self.MAX_PACKET_WORDS or packets[-1][1] + replyWords > self.MAX_PACKET_WORDS:
+                packets.append([[self.PACKET_HEADER], 1])
+            packet = packets[-1]
+            packet[0].append(0x2000000f | (txnId & 0xfff) << 16 | words << 8 | typeId << 4)
+            packet[0].append(address)
+            packet[0].extend(payload)
+            packet[1] += replyWords
+
+        sock = self.getSocket()
+        results = []
+        try:
+            sent = 0
+            for i in range(len(packets)):
+                while sent < len(packets) and sent < i + self.MAX_IN_FLIGHT:
+                    self.send(sock, packets[sent][0])
+                    sent += 1
+                self.parseReply(self.receive(sock), results)
+        except socket.error as e:
+            # the stream can't be trusted anymore, reconnect on the next access
+            self.local.sock = None
+            sock.close()
+            raise RegError('IPbus transport error with '+self.uri+': '+str(e))
+
+        if len(results) != len(transactions):
+            raise RegError('IPbus reply from '+self.uri+' is missing transactions')
+        for result in results:
+            if isinstance(result, RegError):
+                raise result
+        return results
+
+    def parseReply(self, reply, results):
+        if not reply or reply[0] != self.PACKET_HEADER:
+            raise RegError('Unexpected IPbus packet header in the reply from '+self.uri)
+        pos = 1
+        while pos < len(reply):
+            header = reply[pos]
+            typeId = (header >> 4) & 0xf
+            info = header & 0xf
+            pos += 1
+            if info != 0:
+                # 4-7 are bus errors and timeouts of the read and write, anything else means a malformed request
+                results.append(RegError(2) if info >= 4 else RegError('IPbus info code '+str(info)))
+                continue
+            if typeId in (self.READ, self.NI_READ):
+                words = (header >> 8) & 0xff
+            elif typeId == self.RMW_BITS:
+                words = 1
+            else:
+                words = 0
+            results.append(reply[pos:pos + words])
+            pos += words
+
+    def getSocket(self):
+        sock = getattr(self.local, 'sock', None)
+        if sock is None:
+            try:
+                if self.tcp:
+                    sock = socket.create_connection(self.target, self.TIMEOUT)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                else:
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                    sock.settimeout(self.TIMEOUT)
+                    sock.connect(self.target)
+            except socket.error as e:
+                raise RegError('Could not connect to '+self.uri+': '+str(e))
+            self.local.sock = sock
+        return sock
+
+    # TCP wraps every packet in a frame prefixed with its length in bytes
+    def send(self, sock, packet):
+        data = struct.pack('>%dI' % len(packet), *packet)
+        if self.tcp:
+            sock.sendall(struct.pack('>I', len(data)) + data)
+        else:
+            sock.send(data)
+
+    def receive(self, sock):
+        if self.tcp:
+            length = struct.unpack('>I', self.receiveBytes(sock, 4))[0]
+            data = self.receiveBytes(sock, length)
+        else:
+            data = sock.recv(65536)
+        return struct.unpack('>%dI' % (len(data) >> 2), data[:len(data) & ~0x3])
+
+    def receiveBytes(self, sock, length):
+        data = ''
+        while len(data) < length:
+            chunk = sock.recv(length - len(data))
+            if not chunk:
+                raise socket.error('connection closed by the server')
+            data += chunk
+        return data
+
+class StatsBackend(Backend):
+    """Wraps another backend and records every access in the statistics (see enableStats)"""
+
+    CALLS = ('read', 'write', 'readWords', 'writeWords', 'readBlock', 'readFifo')
+
+    def __init__(self, backend, stats):
+        self.backend = backend
+        self.stats = stats
+        self.entries = dict((call, stats.getEntry(backend.__class__.__name__, call)) for call in self.CALLS)
+
+    def read(self, address):
+        start = time.time()
+        try: return self.backend.read(address)
+        finally: self.stats.record(self.entries['read'], time.time() - start, self.stats.reads, (address,))
+
+    def write(self, address, value):
+        start = time.time()
+        try: self.backend.write(address, value)
+        finally: self.stats.record(self.entries['write'], time.time() - start, self.stats.writes, (address,))
+
+    def readWords(self, addresses):
+        start = time.time()
+        try: return self.backend.readWords(addresses)
+        finally: self.stats.record(self.entries['readWords'], time.time() - start, self.stats.reads, addresses)
+
+    def writeWords(self, words):
+        start = time.time()
+        try: self.backend.writeWords(words)
+        finally: self.stats.record(self.entries['writeWords'], time.time() - start, self.stats.writes, [address for address, value in words])
+
+    def readBlock(self, address, count):
+        start = time.time()
+        try: return self.backend.readBlock(address, count)
+        finally: self.stats.record(self.entries['readBlock'], time.time() - start, self.stats.reads, range(address, address + 4 * count, 4))
+
+    def readFifo(self, address, count):
+        start = time.time()
+        try: return self.backend.readFifo(address, count)
+        finally: self.stats.record(self.entries['readFifo'], time.time() - start, self.stats.reads, [address] * count)
+
+    # anything else (e.g. the fallback of MmapBackend) is the wrapped backend's
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+class RegStats(object):
+    """Register access statistics: number of reads and writes of every register word, and per backend and kind of call
+    the number of calls, of words transferred, the total time and a latency histogram with power of 2 bins
+    (bin N counts the calls that took [2^(N-1), 2^N) us, bin 0 those under 1 us)"""
+
+    HISTOGRAM_BINS = 32
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.reads = collections.defaultdict(int)
+        self.writes = collections.defaultdict(int)
+        self.calls = collections.OrderedDict() # (backend, call) -> [calls, words, total time, histogram]
+        self.sections = collections.OrderedDict() # name -> [times entered, elapsed time, time in the backend]
+
+    def getEntry(self, backendName, call):
+        with self.lock:
+            return self.calls.setdefault((backendName, call), [0, 0, 0.0, [0] * self.HISTOGRAM_BINS])
+
+    # called for every backend access, keep it cheap
+    def record(self, entry, elapsed, counts, addresses):
+        bin = int(elapsed * 1e6).bit_length()
+        with self.lock:
+            entry[0] += 1
+            entry[1] += len(addresses)
+            entry[2] += elapsed
+            entry[3][bin if bin < self.HISTOGRAM_BINS else -1] += 1
+            for address in addresses:
+                counts[address] += 1
+
+    def backendTime(self):
+        with self.lock:
+            return sum(entry[2] for entry in self.calls.itervalues())
+
+def makeBackend(name=None):
+    if name == 'mpeek':
+        return MpeekBackend()
+    if name == 'mmap':
+        return MmapBackend('/dev/mem', fallback=MpeekBackend())
+    if name is not None and name.startswith('ipbus'):
+        return IPbusBackend(name)
+    if name is not None:
+        return MmapBackend(name)
+    # /dev/mem is only mapped automatically on the card itself, never on a PC that happens to run as root
+    if platform.machine().startswith('arm') and os.access('/dev/mem', os.R_OK | os.W_OK):
+        try: return MmapBackend('/dev/mem', fallback=MpeekBackend())
+        except (OSError, IOError, mmap.error) as e:
+            if DEBUG: print 'Could not map /dev/mem ('+str(e)+'), falling back to mpeek/mpoke'
+    return MpeekBackend()
+
+def getBackend():
+    global backend
+    if backend is None:
+        backend = makeBackend(BACKEND)
+        if stats is not None:
+            backend = StatsBackend(backend, stats)
+    return backend
+
+def setBackend(newBackend):
+    """Selects the register access backend, either a backend object or a name understood by makeBackend"""
+    global backend
+    if newBackend is None or isinstance(newBackend, str):
+        newBackend = makeBackend(newBackend)
+    if stats is not None and not isinstance(newBackend, StatsBackend):
+        newBackend = StatsBackend(newBackend, stats)
+    backend = newBackend
+    return backend
+
 def main():
     parseXML()
     print 'Example:'
@@ -47,15 +908,66 @@ def main():
     print len(kids), kids.name
 
 def parseXML(filename = None, num_of_oh = None):
+    global nameIndex, tableVersion
     if filename == None:
         filename = ADDRESS_TABLE_TOP
+    tableVersion += 1
+    nodes.clear()
+    nodes.cache = None
+    nameIndex = None
     print 'Parsing',filename,'...'
     tree = xml.parse(filename)
     root = tree.getroot()[0]
     vars = {}
-    makeTree(root,'',0x0,nodes,None,vars,False,num_of_oh)
+    # generate="true" blocks are only recorded here, see RegTable
+    makeTree(root,0x0,nodes,-1,vars,False,num_of_oh)
+    if USE_CACHE:
+        nodes.cache = (filename, getCacheKey(filename, num_of_oh))
 
-def makeTree(node,baseName,baseAddress,nodes,parentNode,vars,isGenerated,num_of_oh=None):
+def getCacheKey(filename, num_of_oh):
+    f = open(filename, 'rb')
+    try: xmlHash = hashlib.md5(f.read()).hexdigest()
+    finally: f.close()
+    return (CACHE_VERSION, sys.byteorder, xmlHash, num_of_oh)
+
+def getCacheFiles(filename):
+    name = hashlib.md5(os.path.abspath(filename)).hexdigest() + '.cache'
+    userCache = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return [os.path.join(userCache, 'rw_reg', name), os.path.join(tempfile.gettempdir(), 'rw_reg_' + name)]
+
+# The cache holds the fully expanded register table, as raw array contents (see RegTable.toData)
+def loadCache(table, filename, cacheKey):
+    for cacheFile in getCacheFiles(filename):
+        try:
+            f = open(cacheFile, 'rb')
+            try: key, data = marshal.load(f)
+            finally: f.close()
+        except Exception:
+            continue
+        if key != cacheKey:
+            continue
+        if DEBUG: print 'Loading the expanded',filename,'from',cacheFile,'...'
+        table.fromData(data)
+        return True
+    return False
+
+def saveCache(table, filename, cacheKey):
+    data = table.toData()
+    for cacheFile in getCacheFiles(filename):
+        tmpFile = cacheFile + '.' + str(os.getpid())
+        try:
+            if not os.path.isdir(os.path.dirname(cacheFile)):
+                os.makedirs(os.path.dirname(cacheFile))
+            f = open(tmpFile, 'wb')
+            try: marshal.dump((cacheKey, data), f, 2)
+            finally: f.close()
+            os.rename(tmpFile, cacheFile)
+            return
+        except (IOError, OSError) as e:
+            if os.path.exists(tmpFile): os.remove(tmpFile)
+            if DEBUG: print 'Could not write address table cache',cacheFile,'('+str(e)+')'
+
+def makeTree(node,baseAddress,nodes,parentIdx,vars,isGenerated,num_of_oh=None):
     
     if (isGenerated == None or isGenerated == False) and node.get('generate') is not None and node.get('generate') == 'true':
         if (node.get('generate_idx_var') == 'OH_IDX' and num_of_oh is not None):
@@ -64,39 +976,18 @@ def makeTree(node,baseName,baseAddress,nodes,parentNode,vars,isGenerated,num_of_
             generateSize = parseInt(node.get('generate_size'))
         # generateSize = parseInt(node.get('generate_size'))
         generateAddressStep = parseInt(node.get('generate_address_step'))
-        generateIdxVar = node.get('generate_idx_var')
-        for i in range(0, generateSize):
-            vars[generateIdxVar] = i
-            #print('generate base_addr = ' + hex(baseAddress + generateAddressStep * i) + ' for node ' + node.get('id'))
-            makeTree(node, baseName, baseAddress + generateAddressStep * i, nodes, parentNode, vars, True)
+        # the instances are added by the table when needed, with makeTree(node, baseAddress + generateAddressStep * i, ...)
+        nodes.addGenerator(parentIdx, node, baseAddress, vars, generateSize, generateAddressStep)
         return
-    newNode = Node()
-    name = baseName
-    if baseName != '': name += '.'
-    name += node.get('id')
-    name = substituteVars(name, vars)
-    newNode.name = name
-    #print len(nodes), name
-    #print newNode.name
+    name = substituteVars(node.get('id'), vars)
     address = baseAddress
     if node.get('address') is not None:
         address = baseAddress + parseInt(node.get('address'))
-    newNode.address = address
-    newNode.real_address = (address<<2)+0x64000000
-    newNode.permission = node.get('permission')
-    newNode.mask = parseInt(node.get('mask'))
-    newNode.isModule = node.get('fw_is_module') is not None and node.get('fw_is_module') == 'true'
-    if node.get('mode') is not None:
-        newNode.mode = node.get('mode')
-    if node.get('size') is not None:
-        newNode.size = node.get('size')
-    nodes.append(newNode)
-    if parentNode is not None:
-        parentNode.addChild(newNode)
-        newNode.parent = parentNode
-        newNode.level = parentNode.level+1
+    isModule = node.get('fw_is_module') is not None and node.get('fw_is_module') == 'true'
+    extra = (node.get('mode'), node.get('size'), node.get('sw_monitor_warn_min_threshold'), node.get('sw_monitor_error_min_threshold'))
+    idx = nodes.add(name, address, parseInt(node.get('mask')), node.get('permission'), isModule, parentIdx, extra)
     for child in node:
-        makeTree(child,name,address,nodes,newNode,vars,False,num_of_oh)
+        makeTree(child,address,nodes,idx,vars,False,num_of_oh)
 
 
 def getAllChildren(node,kids=[]):
@@ -108,91 +999,141 @@ def getAllChildren(node,kids=[]):
             getAllChildren(child,kids)
 
 def getNode(nodeName):
-    return next((node for node in nodes if node.name == nodeName),None)
+    idx = nodes.find(nodeName)
+    return Node(nodes, idx) if idx >= 0 else None
 
 def getNodeFromAddress(nodeAddress):
-    return next((node for node in nodes if node.real_address == nodeAddress),None)
+    idx = nodes.findAddress(nodeAddress)
+    return Node(nodes, idx) if idx >= 0 else None
+
+# all the nodes at an address: the first one (see getNodeFromAddress), its siblings at the same address and the nodes
+# below them that share it, e.g. a module, its control register and the fields of that register
+def getNodesFromAddress(nodeAddress):
+    node = getNodeFromAddress(nodeAddress)
+    if node is None:
+        return []
+    found = [node]
+    if node.parent is not None:
+        found.extend(sibling for sibling in node.parent.children if sibling.real_address == nodeAddress and sibling != node)
+    i = 0
+    while i < len(found):
+        found.extend(child for child in found[i].children if child.real_address == nodeAddress)
+        i += 1
+    return found
 
 def getNodesContaining(nodeString):
-    nodelist = [node for node in nodes if nodeString in node.name]
+    nodelist = findNodes(nodeString)
     if len(nodelist): return nodelist
     else: return None
 
 #returns *readable* registers
 def getRegsContaining(nodeString):
-    nodelist = [node for node in nodes if nodeString in node.name and node.permission is not None and 'r' in node.permission]
+    nodelist = [node for node in findNodes(nodeString) if node.permission is not None and 'r' in node.permission]
     if len(nodelist): return nodelist
     else: return None
 
+# Substring search over all node names: the names are joined (newline separated, so that a match never spans
+# two names) into a single string which is searched with str.find, and a match offset is mapped back to its
+# node by bisecting the name start offsets. Returns the matching nodes in tree order
+def findNodes(nodeString):
+    global nameIndex
+    if nodeString == '':
+        return list(nodes)
+    if nameIndex is None or nameIndex[2] != len(nodes):
+        names = nodes.getNames()
+        starts = array('I')
+        offset = 0
+        for name in names:
+            starts.append(offset)
+            offset += len(name) + 1
+        nameIndex = ('\n'.join(names), starts, len(nodes))
+    text, starts, numNodes = nameIndex
+    nodelist = []
+    pos = text.find(nodeString)
+    while pos >= 0:
+        idx = bisect.bisect_right(starts, pos) - 1
+        nodelist.append(nodes[idx])
+        if idx + 1 >= numNodes:
+            break
+        pos = text.find(nodeString, starts[idx + 1])
+    return nodelist
+
 
 def readAddress(address):
-    try: 
-        output = subprocess.check_output('mpeek '+str(address), stderr=subprocess.STDOUT , shell=True)
-        value = ''.join(s for s in output if s.isalnum())
-    except subprocess.CalledProcessError as e: value = parseError(int(str(e)[-1:]))
-    return '{0:#010x}'.format(parseInt(str(value)))
+    try: value = getBackend().read(address)
+    except RegError as e: return str(e)
+    return '{0:#010x}'.format(value)
 
 def readRawAddress(raw_address):
     try: 
-        address = (parseInt(raw_address) << 2)+0x64000000
+        address = (parseInt(raw_address) << 2)+AXI_IPB_BASE_ADDRESS
         return readAddress(address)
     except:
         return 'Error reading address. (rw_reg)'
 
 def mpeek(address):
-    try: 
-        output = subprocess.check_output('mpeek '+str(address), stderr=subprocess.STDOUT , shell=True)
-        value = ''.join(s for s in output if s.isalnum())
-    except subprocess.CalledProcessError as e: value = parseError(int(str(e)[-1:]))
-    return value
+    try: value = getBackend().read(parseInt(address))
+    except ValueError: return parseError(1)
+    except RegError as e: return str(e)
+    return '{0:#010x}'.format(value)
 
 def mpoke(address,value):
-    try: output = subprocess.check_output('mpoke '+str(address)+' '+str(value), stderr=subprocess.STDOUT , shell=True)
-    except subprocess.CalledProcessError as e: return parseError(int(str(e)[-1:]))
+    try: getBackend().write(parseInt(address), parseInt(value))
+    except ValueError: return parseError(1)
+    except RegError as e: return str(e)
     return 'Done.'
 
+# raw 32-bit access without any masking, for scripts that cache real_address values
+def rReg(address):
+    flushWrites(address)
+    value = getBackend().read(address)
+    if shadowRegs is not None and address in shadowRegs:
+        shadowRegs[address] = value
+    return value
+
+def wReg(address, value):
+    flushWrites()
+    getBackend().write(address, value)
+    if shadowRegs is not None:
+        if address in shadowRegs:
+            shadowRegs[address] = value & 0xffffffff
+        else:
+            for reg in getNodesFromAddress(address):
+                if reg.permission == 'w':
+                    invalidateShadowOnReset(reg)
+
 
 def readReg(reg):
-    address = reg.real_address
     if 'r' not in reg.permission:
         return 'No read permission!'
-    # mpeek
-    try: 
-        output = subprocess.check_output('mpeek '+str(address), stderr=subprocess.STDOUT , shell=True)
-        value = ''.join(s for s in output if s.isalnum())
-    except subprocess.CalledProcessError as e: return parseError(int(str(e)[-1:]))
-    # Apply Mask
-    if reg.mask is not None:
-        shift_amount=0
-        for bit in reversed('{0:b}'.format(reg.mask)):
-            if bit=='0': shift_amount+=1
-            else: break
-        final_value = (parseInt(str(reg.mask))&parseInt(value)) >> shift_amount
-    else: final_value = value
-    final_int =  parseInt(str(final_value))
-    return '{0:#010x}'.format(final_int)
+    try: value = readRegInt(reg)
+    except RegError as e: return str(e)
+    return '{0:#010x}'.format(value)
 
 def displayReg(reg,option=None):
-    address = reg.real_address
     if 'r' not in reg.permission:
         return 'No read permission!'
-    # mpeek
-    try: 
-        output = subprocess.check_output('mpeek '+str(address), stderr=subprocess.STDOUT , shell=True)
-        value = ''.join(s for s in output if s.isalnum())
-    except subprocess.CalledProcessError as e: return hex(address).rstrip('L')+' '+reg.permission+'\t'+tabPad(reg.name,7)+parseError(int(str(e)[-1:]))
-    # Apply Mask
-    if reg.mask is not None:
-        shift_amount=0
-        for bit in reversed('{0:b}'.format(reg.mask)):
-            if bit=='0': shift_amount+=1
-            else: break
-        final_value = (parseInt(str(reg.mask))&parseInt(value)) >> shift_amount
-    else: final_value = value
-    final_int =  parseInt(str(final_value))
+    try: value = readRegInt(reg)
+    except RegError as e: value = e
+    return formatReg(reg, value, option)
 
-    if option=='hexbin': return hex(address).rstrip('L')+' '+reg.permission+'\t'+tabPad(reg.name,7)+'{0:#010x}'.format(final_int)+' = '+'{0:032b}'.format(final_int)
-    else: return hex(address).rstrip('L')+' '+reg.permission+'\t'+tabPad(reg.name,7)+'{0:#010x}'.format(final_int)
+def displayRegs(regs,option=None):
+    """Same as displayReg for a list of readable registers, but all the words are fetched with readBlocks"""
+    words = readBlocks([reg.real_address for reg in regs])
+    lines = []
+    for reg in regs:
+        value = words[reg.real_address]
+        if reg.mask is not None and not isinstance(value, RegError):
+            value = (value & reg.mask) >> reg.shift
+        lines.append(formatReg(reg, value, option))
+    return lines
+
+# value is either the register value or the RegError raised when reading it
+def formatReg(reg, value, option=None):
+    address = reg.real_address
+    if isinstance(value, RegError): return hex(address).rstrip('L')+' '+reg.permission+'\t'+tabPad(reg.name,7)+str(value)
+    if option=='hexbin': return hex(address).rstrip('L')+' '+reg.permission+'\t'+tabPad(reg.name,7)+'{0:#010x}'.format(value)+' = '+'{0:032b}'.format(value)
+    else: return hex(address).rstrip('L')+' '+reg.permission+'\t'+tabPad(reg.name,7)+'{0:#010x}'.format(value)
 
 def writeReg(reg, value):
     try: address = reg.real_address
@@ -201,42 +1142,497 @@ def writeReg(reg, value):
         return
     if 'w' not in reg.permission:
         return 'No write permission!'
+    try: final_value = writeRegInt(reg, value)
+    except RegError as e: return str(e)
+    if final_value is None: return '('+str(value)+')\tqueued for '+reg.name
+    return str('{0:#010x}'.format(final_value)).rstrip('L')+'('+str(value)+')\twritten to '+reg.name
+
+# integer versions of readReg and writeReg: no permission checks, no formatting, errors are raised as RegError
+def readRegInt(reg):
+    flushWrites(reg.real_address)
+    return readRegDirect(reg)
 
-    # Apply Mask if applicable
+# returns the full 32-bit word that was written, or None if the write was queued by write combining
+def writeRegInt(reg, value):
+    if pendingWrites is not None:
+        # write-only registers are usually pulses/commands: never merge them, keep them in order with the rest
+        if 'r' in reg.permission:
+            queueWrite(pendingWrites, reg, value)
+            return None
+        flushWrites()
+    return writeRegDirect(reg, value)
+
+# the register accesses themselves, not aware of write combining (the asynchronous API uses them directly)
+def readRegDirect(reg):
+    value = getBackend().read(reg.real_address)
+    if shadowRegs is not None and 'w' in reg.permission:
+        shadowRegs[reg.real_address] = value
     if reg.mask is not None:
-        shift_amount=0
-        for bit in reversed('{0:b}'.format(reg.mask)):
-            if bit=='0': shift_amount+=1
-            else: break
-        shifted_value = value << shift_amount
-        if 'r' not in reg.permission: final_value = shifted_value
-        else: 
-            initial_value = readReg(reg)
-            try: initial_value = parseInt(initial_value) 
-            except: return 'Error reading initial value: '+str(initial_value)
-            final_value = (shifted_value & reg.mask) | (initial_value & ~reg.mask)
-    else: final_value = value
-    
-    # mpoke
-    try: 
-        output = subprocess.check_output('mpoke '+str(address)+' '+str(final_value), stderr=subprocess.STDOUT , shell=True)
-        return str('{0:#010x}'.format(final_value)).rstrip('L')+'('+str(value)+')\twritten to '+reg.name
-    except subprocess.CalledProcessError as e: return parseError(int(str(e)[-1:]))
-    
+        value = (value & reg.mask) >> reg.shift
+    return value
+
+def writeRegDirect(reg, value):
+    if reg.mask is None:
+        final_value = value & 0xffffffff
+    else:
+        final_value = (value << reg.shift) & reg.mask
+        if 'r' in reg.permission:
+            current = shadowRegs.get(reg.real_address) if shadowRegs is not None else None
+            if current is None:
+                current = getBackend().read(reg.real_address)
+            final_value |= current & ~reg.mask
+    getBackend().write(reg.real_address, final_value)
+    if shadowRegs is not None:
+        if 'r' in reg.permission:
+            shadowRegs[reg.real_address] = final_value
+        else:
+            invalidateShadowOnReset(reg)
+    return final_value
+
+class RegHandle(object):
+    """A register bound for fast repeated access, for the hot loops of the scripts. It can be created from a Node or
+    from a register name, also before parseXML (e.g. as a module constant): the name is resolved on first use.
+    The address, mask, shift and permissions are resolved once, read() and write() then only do integer arithmetic
+    around the backend access. They behave like readRegInt / writeRegInt (write combining and the shadow are taken
+    into account), except that the permission is checked (ValueError).
+    With plainWrite=True a masked register is written without reading its 32-bit word back first, the other bits of
+    the word are written as 0: only for registers that are alone in their word, where the script owns the whole word"""
+
+    __slots__ = ('name', 'node', 'version', 'real_address', 'mask', 'shift', 'readable', 'writable', 'plainWrite', 'rmw')
+
+    def __init__(self, reg, plainWrite=False):
+        self.name = reg if isinstance(reg, str) else reg.name
+        self.plainWrite = plainWrite
+        self.version = None
+
+    def bind(self):
+        node = getNode(self.name)
+        if node is None:
+            raise ValueError('No such register: '+self.name)
+        self.node = node
+        self.real_address = node.real_address
+        self.mask = node.mask if node.mask is not None else 0xffffffff
+        self.shift = node.shift
+        self.readable = node.permission is not None and 'r' in node.permission
+        self.writable = node.permission is not None and 'w' in node.permission
+        self.rmw = self.readable and self.mask != 0xffffffff and not self.plainWrite
+        self.version = tableVersion
+
+    def read(self):
+        if self.version != tableVersion:
+            self.bind()
+        if not self.readable:
+            raise ValueError('No read permission: '+self.name)
+        if pendingWrites or shadowRegs is not None:
+            return readRegInt(self.node)
+        return (getBackend().read(self.real_address) & self.mask) >> self.shift
+
+    # returns the full 32-bit word that was written, or None if the write was queued by write combining
+    def write(self, value):
+        if self.version != tableVersion:
+            self.bind()
+        if not self.writable:
+            raise ValueError('No write permission: '+self.name)
+        if self.rmw or pendingWrites is not None or shadowRegs is not None:
+            return writeRegInt(self.node, value)
+        word = (value << self.shift) & self.mask
+        getBackend().write(self.real_address, word)
+        return word
+
+    def __repr__(self):
+        return 'RegHandle(%r)' % self.name
 
+MAX_BLOCK_READ = 256
+
+def readBlocks(addresses):
+    """Reads a set of addresses with as few backend transfers as possible: the addresses are sorted, duplicates
+    (masked registers sharing a word) dropped and every run of consecutive words is fetched with one block read.
+    Returns a dict of address -> word, failed words map to the RegError raised when reading them"""
+    if pendingWrites:
+        flushWrites()
+    backend = getBackend()
+    addresses = sorted(set(addresses))
+    words = {}
+    start = 0
+    while start < len(addresses):
+        end = start + 1
+        while end < len(addresses) and addresses[end] == addresses[end-1] + 4 and end - start < MAX_BLOCK_READ:
+            end += 1
+        span = addresses[start:end]
+        try: values = backend.readBlock(span[0], len(span))
+        except RegError:
+            # retry word by word to tell which registers are at fault
+            values = []
+            for address in span:
+                try: values.append(backend.read(address))
+                except RegError as e: values.append(e)
+        words.update(zip(span, values))
+        start = end
+    return words
+
+# node modes (the uHAL mode attribute) read word by word from the same address by readBlock
+FIFO_MODES = ('non-incremental', 'port')
+
+def readBlock(reg, count=None):
+    """Reads count words (by default the size of the node) of a mode="block" node, a memory occupying consecutive
+    addresses, or of a mode="non-incremental" node, a FIFO read from the same address, in one backend call.
+    Returns the raw words in an array('I') (numpy.frombuffer(words, numpy.uint32) gives a numpy view of it)"""
+    if reg.permission is None or 'r' not in reg.permission:
+        raise ValueError('No read permission: '+reg.name)
+    if count is None:
+        if reg.size is None:
+            raise ValueError('No size given for '+reg.name)
+        count = parseInt(reg.size)
+    elif reg.mode == 'block' and reg.size is not None and count > parseInt(reg.size):
+        raise ValueError('Reading %d words beyond the end of %s (size %s)' % (count, reg.name, reg.size))
+    flushWrites()
+    if reg.mode in FIFO_MODES:
+        return getBackend().readFifo(reg.real_address, count)
+    return getBackend().readBlock(reg.real_address, count)
+
+def readFifo(reg, count):
+    """Reads count words from the address of a register, whatever its mode, e.g. to drain a FIFO
+    that is not declared as such. Returns an array('I')"""
+    if reg.permission is None or 'r' not in reg.permission:
+        raise ValueError('No read permission: '+reg.name)
+    flushWrites()
+    return getBackend().readFifo(reg.real_address, count)
+
+def readRegs(regs):
+    """Reads a list of registers in a single backend transaction, every 32-bit word is read only once
+    even if several masked registers live in it. Returns the list of register values (integers)"""
+    for reg in regs:
+        if 'r' not in reg.permission:
+            raise ValueError('No read permission: '+reg.name)
+    if pendingWrites:
+        flushWrites()
+    return readRegsDirect(regs)
+
+def readRegsDirect(regs):
+    addresses = list(collections.OrderedDict.fromkeys(reg.real_address for reg in regs))
+    words = dict(zip(addresses, getBackend().readWords(addresses)))
+    values = []
+    for reg in regs:
+        value = words[reg.real_address]
+        if shadowRegs is not None and 'w' in reg.permission:
+            shadowRegs[reg.real_address] = value
+        if reg.mask is not None:
+            value = (value & reg.mask) >> reg.shift
+        values.append(value)
+    return values
+
+def writeRegs(regValues):
+    """Writes a dict or a list of (register, value) pairs in a single backend transaction. Masked registers
+    sharing a 32-bit word are merged, so each word is read at most once (for the read-modify-write, again in
+    one transaction) and written once, in the order of the first write to it. Note that this also means that
+    a write-pulse register given twice is only pulsed once"""
+    if isinstance(regValues, dict):
+        regValues = regValues.items()
+    flushWrites()
+    pending = collections.OrderedDict()
+    for reg, value in regValues:
+        if 'w' not in reg.permission:
+            raise ValueError('No write permission: '+reg.name)
+        queueWrite(pending, reg, value)
+    commitWrites(pending)
+
+# pending maps an address to [value bits, mask of the bits set so far, whether the word is readable, the write-only
+# registers written] (the latter to tell the shadow about module resets)
+def queueWrite(pending, reg, value):
+    if reg.mask is None:
+        mask = 0xffffffff
+        bits = value & mask
+    else:
+        mask = reg.mask
+        bits = (value << reg.shift) & mask
+    entry = pending.get(reg.real_address)
+    if entry is None:
+        entry = pending[reg.real_address] = [bits, mask, 'r' in reg.permission, []]
+    else:
+        entry[0] = (entry[0] & ~mask) | bits
+        entry[1] |= mask
+        entry[2] = entry[2] or 'r' in reg.permission
+    if 'r' not in reg.permission:
+        entry[3].append(reg)
+
+def commitWrites(pending):
+    rmwAddresses = [address for address, (bits, mask, readable, resets) in pending.iteritems() if readable and mask != 0xffffffff]
+    current = {}
+    if shadowRegs is not None:
+        current = dict((address, shadowRegs[address]) for address in rmwAddresses if address in shadowRegs)
+        rmwAddresses = [address for address in rmwAddresses if address not in current]
+    if rmwAddresses:
+        current.update(zip(rmwAddresses, getBackend().readWords(rmwAddresses)))
+    words = []
+    for address, (bits, mask, readable, resets) in pending.iteritems():
+        if address in current:
+            bits |= current[address] & ~mask
+        words.append((address, bits & 0xffffffff))
+    getBackend().writeWords(words)
+    if shadowRegs is not None:
+        for (address, (bits, mask, readable, resets)), (address, word) in zip(pending.iteritems(), words):
+            if readable:
+                shadowRegs[address] = word
+            for reg in resets:
+                invalidateShadowOnReset(reg)
+    return words
+
+@contextlib.contextmanager
+def writeCombining():
+    """Write combining mode: within the with block, writeReg/writeRegInt calls to readable registers are
+    accumulated per 32-bit word and committed together at the end of the block (or at flushWrites()),
+    so that configuring N fields of one word costs one read and one write instead of N of each.
+    Reading a register with a queued write, raw accesses and writes to write-only registers flush first"""
+    global pendingWrites
+    if pendingWrites is not None: # nested block, the outermost one commits
+        yield
+        return
+    pendingWrites = collections.OrderedDict()
+    try:
+        yield
+    finally:
+        pending = pendingWrites
+        pendingWrites = None
+        if pending:
+            commitWrites(pending)
+
+# commits the queued writes (only if one of them targets the given address, when an address is given)
+def flushWrites(address=None):
+    if not pendingWrites:
+        return
+    if address is not None and address not in pendingWrites:
+        return
+    commitWrites(pendingWrites)
+    pendingWrites.clear()
+
+def getAsyncPool():
+    global asyncPool
+    if asyncPool is None:
+        getBackend() # make sure the backend is set up by this thread and not raced for by the workers
+        asyncPool = ThreadPool(ASYNC_MAX_IN_FLIGHT)
+    return asyncPool
+
+# Asynchronous register access: these functions return immediately with an AsyncResult (see
+# multiprocessing.pool) and the access is done by one of ASYNC_MAX_IN_FLIGHT worker threads, so several
+# requests can be in flight on a backend with a long round trip (e.g. a remote link). result.get() returns
+# the value (or raises the RegError), gather() collects a list of results. Queued write-combining writes are
+# flushed on submission; the asynchronous accesses themselves are never combined and, being concurrent,
+# are not ordered with respect to each other -- get() the results that have to complete first
+def readRegAsync(reg):
+    if 'r' not in reg.permission:
+        raise ValueError('No read permission: '+reg.name)
+    flushWrites(reg.real_address)
+    return getAsyncPool().apply_async(readRegDirect, (reg,))
+
+def writeRegAsync(reg, value):
+    if 'w' not in reg.permission:
+        raise ValueError('No write permission: '+reg.name)
+    flushWrites()
+    return getAsyncPool().apply_async(writeRegDirect, (reg, value))
+
+# a whole readRegs batch as one asynchronous request
+def readRegsAsync(regs):
+    for reg in regs:
+        if 'r' not in reg.permission:
+            raise ValueError('No read permission: '+reg.name)
+    flushWrites()
+    return getAsyncPool().apply_async(readRegsDirect, (list(regs),))
+
+def gather(results, timeout=None):
+    return [result.get(timeout) for result in results]
+
+# OH fan-out: the same register of every OH selected by a mask (bit N = OH N, a list of OH indexes is accepted
+# as well) accessed in one transaction. The results are returned in an OrderedDict OH index -> value, sorted by OH index
+def ohListFromMask(ohMask):
+    if isinstance(ohMask, (int, long)):
+        return [oh for oh in range(MAX_OH) if ohMask & (1 << oh)]
+    return sorted(ohMask)
+
+def getOhRegs(ohs, name):
+    regs = []
+    for oh in ohs:
+        reg = getNode(name % oh)
+        if reg is None:
+            raise ValueError('No such register: '+(name % oh))
+        regs.append(reg)
+    return regs
+
+def readOhRegs(ohMask, names):
+    """Reads the same register(s) of every OH of the mask in a single readRegs transaction. The register names
+    contain a %d that is replaced by the OH index, e.g. 'GEM_AMC.OH_LINKS.OH%d.GBT0_READY'. Returns an OrderedDict
+    OH index -> value, or OH index -> list of values if a list of names is given"""
+    ohs = ohListFromMask(ohMask)
+    if isinstance(names, str):
+        return collections.OrderedDict(zip(ohs, readRegs(getOhRegs(ohs, names))))
+    regs = [getOhRegs(ohs, name) for name in names]
+    values = readRegs([reg for regsOfName in regs for reg in regsOfName])
+    return collections.OrderedDict((oh, values[i::len(ohs)]) for i, oh in enumerate(ohs))
+
+def writeOhRegs(ohMask, name, value):
+    """Writes the same register of every OH of the mask (name with %d for the OH index, see readOhRegs) in a single
+    writeRegs transaction. The value is either written to all of them or given per OH in a dict OH index -> value"""
+    ohs = ohListFromMask(ohMask)
+    values = [value[oh] if isinstance(value, dict) else value for oh in ohs]
+    writeRegs(zip(getOhRegs(ohs, name), values))
+
+def enableShadow(enable=True):
+    """Turns the shadow register cache on or off. With the shadow on, the last value written to or read from
+    every rw register word is remembered and read-modify-writes use it instead of reading the hardware.
+    Only use it when the rw registers are changed by software alone; read-only (status, counter) registers
+    are never served from the shadow. See invalidateShadow"""
+    global shadowRegs
+    shadowRegs = {} if enable else None
+
+def invalidateShadow(node=None):
+    """Forgets the shadowed values of a node and all registers below it (e.g. a module after its reset),
+    or of everything if no node is given. The node can also be given by name"""
+    if shadowRegs is None:
+        return
+    if node is None:
+        shadowRegs.clear()
+        return
+    if isinstance(node, str):
+        name = node
+        node = getNode(name)
+        if node is None:
+            raise ValueError('No such register: '+name)
+    kids = [node]
+    getAllChildren(node, kids)
+    for reg in kids:
+        shadowRegs.pop(reg.real_address, None)
+
+# writing a reset register of a module resets its configuration registers too
+def invalidateShadowOnReset(reg):
+    if reg is None or 'RESET' not in reg.name.split('.')[-1]:
+        return
+    module = reg
+    while module.parent is not None and not module.isModule:
+        module = module.parent
+    invalidateShadow(module)
+
+def enableStats(output=None):
+    """Starts recording register access statistics: the accesses of every register word and the latency of the backend
+    calls, to tell the bus bound parts of a script from the CPU bound ones (see statsSection). The summary is printed
+    (or appended to the output file) at exit and whenever the process gets a SIGUSR1, or by calling printStats"""
+    global stats, backend
+    first = stats is None
+    stats = RegStats()
+    if isinstance(backend, StatsBackend):
+        backend = StatsBackend(backend.backend, stats)
+    elif backend is not None:
+        backend = StatsBackend(backend, stats)
+    if first:
+        atexit.register(printStats, output)
+        try: signal.signal(signal.SIGUSR1, lambda signum, frame: printStats(output))
+        except ValueError: pass # not the main thread, no signal then
+    return stats
+
+@contextlib.contextmanager
+def statsSection(name):
+    """Measures the wall time of the with block and the part of it spent in register accesses, reported per section
+    name in the statistics summary. Does nothing when the statistics are off"""
+    if stats is None:
+        yield
+        return
+    current = stats
+    start = time.time()
+    startBackend = current.backendTime()
+    try:
+        yield
+    finally:
+        elapsed = time.time() - start
+        inBackend = current.backendTime() - startBackend
+        with current.lock:
+            entry = current.sections.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] += inBackend
+
+def formatTime(seconds):
+    if seconds < 1e-3:
+        return '%.1f us' % (seconds * 1e6)
+    if seconds < 1:
+        return '%.1f ms' % (seconds * 1e3)
+    return '%.2f s' % seconds
+
+def percent(part, total):
+    return 100.0 * part / total if total > 0 else 0.0
+
+# the register (word) summary lists the most accessed words only
+STATS_TOP_REGS = 20
+
+def printStats(output=None):
+    if stats is None:
+        return
+    with stats.lock:
+        calls = [(key, entry[0], entry[1], entry[2], list(entry[3])) for key, entry in stats.calls.iteritems() if entry[0]]
+        reads = dict(stats.reads)
+        writes = dict(stats.writes)
+        sections = [(name, list(entry)) for name, entry in stats.sections.iteritems()]
+    elapsed = time.time() - stats.start
+    inBackend = sum(call[3] for call in calls)
+    lines = ['rw_reg statistics: %s elapsed, %s (%.1f%%) in register accesses' % (formatTime(elapsed), formatTime(inBackend), percent(inBackend, elapsed))]
+
+    for (backendName, call), count, words, total, histogram in calls:
+        lines.append('  %s.%s: %d calls, %d words, %s total, %s per call' % (backendName, call, count, words, formatTime(total), formatTime(total / count)))
+        bins = ['%s: %d' % ('<1us' if bin == 0 else '%d-%dus' % (1 << (bin - 1), 1 << bin), n) for bin, n in enumerate(histogram) if n]
+        lines.append('    latency: ' + ', '.join(bins))
+
+    addresses = set(reads) | set(writes)
+    modules = collections.defaultdict(lambda: [0, 0])
+    regs = []
+    for address in addresses:
+        node = getNodeFromAddress(address)
+        # the first node at an address is often the module starting there, name the word after its first register
+        reg = node
+        while reg is not None and reg.children:
+            reg = next((child for child in reg.children if child.address == reg.address), None)
+        name = (reg or node).name if node is not None else '0x%08x' % address
+        module = reg or node
+        while module is not None and module.parent is not None and not module.isModule:
+            module = module.parent
+        entry = modules[module.name if module is not None else '(not in the address table)']
+        entry[0] += reads.get(address, 0)
+        entry[1] += writes.get(address, 0)
+        regs.append((reads.get(address, 0) + writes.get(address, 0), name, reads.get(address, 0), writes.get(address, 0)))
+    if regs:
+        lines.append('  most accessed registers (reads, writes):')
+        for total, name, nReads, nWrites in sorted(regs, reverse=True)[:STATS_TOP_REGS]:
+            lines.append('    %10d %10d  %s' % (nReads, nWrites, name))
+        lines.append('  per module (reads, writes):')
+        for name, (nReads, nWrites) in sorted(modules.items(), key=lambda item: -sum(item[1])):
+            lines.append('    %10d %10d  %s' % (nReads, nWrites, name))
+
+    if sections:
+        lines.append('  sections (elapsed, in register accesses):')
+        for name, (count, sectionElapsed, sectionBackend) in sections:
+            lines.append('    %10s %10s (%5.1f%%)  %s x%d' % (formatTime(sectionElapsed), formatTime(sectionBackend), percent(sectionBackend, sectionElapsed), name, count))
+
+    text = '\n'.join(lines) + '\n'
+    if output is None or output == '1':
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    else:
+        f = open(output, 'a')
+        try: f.write(text)
+        finally: f.close()
 
 def isValid(address):
-    try: subprocess.check_output('mpeek '+str(address), stderr=subprocess.STDOUT , shell=True)
-    except subprocess.CalledProcessError as e: return False
+    try: getBackend().read(address)
+    except RegError: return False
     return True
 
 
 def completeReg(string):
-    possibleNodes = [] 
     completions = []
-    currentLevel = len([c for c in string if c=='.'])
-  
-    possibleNodes = [node for node in nodes if node.name.startswith(string) and node.level == currentLevel]
+    # the register tree is a trie over the dot separated name components: the candidates are the children of
+    # the node named by everything up to the last dot, filtered by the partially typed last component
+    if '.' in string:
+        parent = getNode(string.rsplit('.', 1)[0])
+        candidates = parent.children if parent is not None else []
+    else:
+        candidates = [Node(nodes, idx) for idx in nodes.getChildren(-1)]
+    possibleNodes = [node for node in candidates if node.name.startswith(string)]
     if len(possibleNodes)==1:
         if possibleNodes[0].children == []: return [possibleNodes[0].name]
         for n in possibleNodes[0].children:
@@ -248,6 +1644,8 @@ def completeReg(string):
 
 
 def parseError(e):
+    if isinstance(e, str):
+        return e
     if e==1:
         return "Failed to parse address"
     if e==2:
@@ -278,5 +1676,8 @@ def substituteVars(string, vars):
 def tabPad(s,maxlen):
     return s+"\t"*((8*maxlen-len(s)-1)/8+1) 
 
+if STATS is not None:
+    enableStats(STATS)
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+
+# Register access benchmark: measures how many register accesses per second rw_reg does for the usual access patterns
+# (single reads, masked read-modify-write writes, batched and block reads, getNode lookups), either against the
+# register emulator (in-process, the default) or against a real backend, and prints the results as JSON so that they
+# can be compared across firmware and software releases.
+#
+# The write tests only write the registers given with -rmw_reg and -write_reg (by default the board ID, which is put
+# back at the end, and the IC write data register, which does nothing until the IC write is executed). They only run
+# against the emulator unless -write is given, so that a benchmark of a real board does not write to it by accident.
+# The "wreg" test is the raw wReg loop of "sca.py <mask> test1", "write_readback" is what ipb_stress_test.sh does.
+#
+# Examples:
+#   ./rw_reg_bench.py -x address_table/gem_amc_top.xml
+#   ./rw_reg_bench.py -backend mmap -n 1000000 -o bench_`date +%Y%m%d`.json
+#   ./rw_reg_bench.py -backend mmap -write -tests rmw_write,wreg
+#   ./rw_reg_bench.py -backend ipbustcp-2.0://eagle34:60002 -tests read,batch_read
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import rw_reg
+from rw_reg import *
+
+TESTS = ['getnode', 'read', 'read_handle', 'rreg', 'rmw_write', 'write_handle', 'wreg', 'write_readback', 'batch_read', 'block_read', 'block_node']
+WRITE_TESTS = ['rmw_write', 'write_handle', 'wreg', 'write_readback']
+
+READ_REG = 'GEM_AMC.GEM_SYSTEM.BOARD_ID'
+RMW_REG = 'GEM_AMC.GEM_SYSTEM.BOARD_ID'
+WRITE_REG = 'GEM_AMC.SLOW_CONTROL.IC.WRITE_DATA'
+BATCH_MODULE = 'GEM_AMC.TTC'
+BLOCK_MODULE = 'GEM_AMC.GEM_SYSTEM'
+BLOCK_REG = 'GEM_AMC.CONFIG_BLASTER.RAM.GBT'
+GETNODE_MODULE = 'GEM_AMC.OH.OH0'
+VERSION_REGS = ['GEM_AMC.GEM_SYSTEM.RELEASE.MAJOR', 'GEM_AMC.GEM_SYSTEM.RELEASE.MINOR', 'GEM_AMC.GEM_SYSTEM.RELEASE.BUILD', 'GEM_AMC.GEM_SYSTEM.RELEASE.DATE']
+
+def getReg(name):
+    reg = getNode(name)
+    if reg is None:
+        raise ValueError('No such register: ' + name)
+    return reg
+
+def getRegs(moduleName, permission):
+    kids = []
+    getAllChildren(getReg(moduleName), kids)
+    return [reg for reg in kids if not reg.children and reg.permission is not None and permission in reg.permission]
+
+# runs function(i) for i in 0..n-1, returns the elapsed time
+def timeLoop(function, n):
+    start = time.time()
+    for i in xrange(n):
+        function(i)
+    return time.time() - start
+
+def result(ops, seconds, **extra):
+    ret = {'ops': ops, 'seconds': seconds, 'ops_per_second': ops / seconds if seconds > 0 else None,
+           'us_per_op': 1e6 * seconds / ops if ops else None}
+    ret.update(extra)
+    return ret
+
+def benchGetNode(args):
+    names = [reg.name for reg in getRegs(GETNODE_MODULE, '')]
+    if not names:
+        names = [getReg(args.read_reg).name]
+    seconds = timeLoop(lambda i: getNode(names[i % len(names)]), args.n)
+    return result(args.n, seconds, registers=len(names))
+
+def benchRead(args):
+    reg = getReg(args.read_reg)
+    return result(args.n, timeLoop(lambda i: readRegInt(reg), args.n), register=reg.name)
+
+def benchReadHandle(args):
+    handle = RegHandle(args.read_reg)
+    return result(args.n, timeLoop(lambda i: handle.read(), args.n), register=args.read_reg)
+
+def benchRReg(args):
+    address = getReg(args.read_reg).real_address
+    return result(args.n, timeLoop(lambda i: rReg(address), args.n), address='0x%08x' % address)
+
+def benchRmwWrite(args):
+    reg = getReg(args.rmw_reg)
+    saved = readRegInt(reg)
+    try: seconds = timeLoop(lambda i: writeRegInt(reg, i), args.n)
+    finally: writeRegInt(reg, saved)
+    return result(args.n, seconds, register=reg.name)
+
+def benchWriteHandle(args):
+    handle = RegHandle(args.rmw_reg)
+    saved = handle.read()
+    try: seconds = timeLoop(lambda i: handle.write(i), args.n)
+    finally: handle.write(saved)
+    return result(args.n, seconds, register=args.rmw_reg)
+
+def benchWReg(args):
+    address = getReg(args.write_reg).real_address
+    return result(args.n, timeLoop(lambda i: wReg(address, i), args.n), address='0x%08x' % address)
+
+# like ipb_stress_test.sh: write a random value and check it reads back, one op is a write and a read
+def benchWriteReadback(args):
+    reg = getReg(args.write_reg)
+    values = [random.randint(0, 0xffff) for i in range(1024)]
+    errors = [0]
+    def writeReadback(i):
+        value = values[i & 0x3ff]
+        writeRegInt(reg, value)
+        if readRegInt(reg) != value:
+            errors[0] += 1
+    return result(args.n, timeLoop(writeReadback, args.n), register=reg.name, errors=errors[0])
+
+# one op is a readRegs transaction of all the readable registers of a module
+def benchBatchRead(args):
+    regs = getRegs(args.batch_module, 'r')
+    n = max(args.n / max(len(regs), 1), 1)
+    seconds = timeLoop(lambda i: readRegs(regs), n)
+    return result(n, seconds, module=args.batch_module, registers=len(regs), registers_per_second=n * len(regs) / seconds if seconds > 0 else None)
+
+# one op is a readBlocks of all the readable words of a module (runs of consecutive words read with one block read)
+def benchBlockRead(args):
+    addresses = sorted(set(reg.real_address for reg in getRegs(args.block_module, 'r')))
+    n = max(args.n / max(len(addresses), 1), 1)
+    seconds = timeLoop(lambda i: readBlocks(addresses), n)
+    return result(n, seconds, module=args.block_module, words=len(addresses), words_per_second=n * len(addresses) / seconds if seconds > 0 else None)
+
+# one op is a readBlock of a whole mode="block" (or FIFO) node
+def benchBlockNode(args):
+    reg = getReg(args.block_reg)
+    words = len(readBlock(reg))
+    n = max(args.n / max(words, 1), 1)
+    seconds = timeLoop(lambda i: readBlock(reg), n)
+    return result(n, seconds, register=reg.name, words=words, words_per_second=n * words / seconds if seconds > 0 else None)
+
+BENCHMARKS = {
+    'getnode': benchGetNode,
+    'read': benchRead,
+    'read_handle': benchReadHandle,
+    'rreg': benchRReg,
+    'rmw_write': benchRmwWrite,
+    'write_handle': benchWriteHandle,
+    'wreg': benchWReg,
+    'write_readback': benchWriteReadback,
+    'batch_read': benchBatchRead,
+    'block_read': benchBlockRead,
+    'block_node': benchBlockNode,
+}
+
+def readFirmwareVersion():
+    version = {}
+    for name in VERSION_REGS:
+        reg = getNode(name)
+        if reg is None:
+            continue
+        try: version[name.split('.')[-1].lower()] = readRegInt(reg)
+        except RegError: pass
+    return version
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the register accesses done through rw_reg and prints the results as JSON.')
+    parser.add_argument('-x', metavar='address_table', default=rw_reg.ADDRESS_TABLE_TOP,
+                   help='Optional: address table XML file (default: %s)' % rw_reg.ADDRESS_TABLE_TOP)
+    parser.add_argument('-oh', metavar='num_optohybrids', type=int,
+                   help='Optional: number of optohybrids to generate the OH registers for (default: as given in the address table)')
+    parser.add_argument('-backend', default='emulator',
+                   help='Optional: "emulator" (in-process register emulator) or any backend understood by rw_reg: mmap, mpeek, an IPbus URI or a file to map (default: emulator)')
+    parser.add_argument('-n', type=int, default=100000,
+                   help='Optional: number of accesses per test (default: 100000)')
+    parser.add_argument('-tests',
+                   help='Optional: comma separated list of the tests to run (default: all of %s, without the write tests %s on a real backend unless -write is given)' % (','.join(TESTS), ','.join(WRITE_TESTS)))
+    parser.add_argument('-write', action='store_true',
+                   help='Optional: allow the write tests on a real backend (they always run against the emulator)')
+    parser.add_argument('-read_reg', default=READ_REG, help='Optional: register read by the read tests (default: %s)' % READ_REG)
+    parser.add_argument('-rmw_reg', default=RMW_REG, help='Optional: masked register written by the read-modify-write tests, restored at the end (default: %s)' % RMW_REG)
+    parser.add_argument('-write_reg', default=WRITE_REG, help='Optional: full word register written by the wreg and write_readback tests (default: %s)' % WRITE_REG)
+    parser.add_argument('-batch_module', default=BATCH_MODULE, help='Optional: module read by the batch_read test (default: %s)' % BATCH_MODULE)
+    parser.add_argument('-block_module', default=BLOCK_MODULE, help='Optional: module read by the block_read test (default: %s)' % BLOCK_MODULE)
+    parser.add_argument('-block_reg', default=BLOCK_REG, help='Optional: block or FIFO node read by the block_node test (default: %s)' % BLOCK_REG)
+    parser.add_argument('-o', metavar='file', help='Optional: write the JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    writeAllowed = args.write or args.backend == 'emulator'
+    if args.tests is None:
+        tests = [test for test in TESTS if writeAllowed or test not in WRITE_TESTS]
+    else:
+        tests = args.tests.split(',')
+    for test in tests:
+        if test not in BENCHMARKS:
+            print 'Unknown test %s, the tests are: %s' % (test, ', '.join(TESTS))
+            return 1
+        if test in WRITE_TESTS and not writeAllowed:
+            print 'The %s test writes to the %s backend, add -write to run it anyway' % (test, args.backend)
+            return 1
+    if not os.path.exists(args.x):
+        print 'Address table file %s does not exist' % args.x
+        return 1
+
+    # rw_reg prints its progress, keep stdout for the JSON
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+
+    start = time.time()
+    rw_reg.parseXML(args.x, args.oh)
+    parseTime = time.time() - start
+    if args.backend == 'emulator':
+        import rw_reg_emulator
+        setBackend(rw_reg_emulator.EmulatedBackend(rw_reg.nodes))
+    else:
+        setBackend(args.backend)
+
+    results = {}
+    for test in tests:
+        sys.stderr.write('Running %s ...\n' % test)
+        try: results[test] = BENCHMARKS[test](args)
+        except (RegError, ValueError) as e:
+            results[test] = {'error': str(e)}
+
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': platform.node(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'backend': args.backend,
+        'backend_class': getBackend().__class__.__name__,
+        'address_table': os.path.abspath(args.x),
+        'firmware': readFirmwareVersion(),
+        'parse_seconds': parseTime,
+        'n': args.n,
+        'results': results,
+    }
+    sys.stdout = stdout
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.o:
+        f = open(args.o, 'w')
+        try: f.write(output + '\n')
+        finally: f.close()
+    else:
+        print output
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
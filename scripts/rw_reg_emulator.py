@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+
+# Register memory emulator for running rw_reg and the tools built on it (sca.py, gbt.py, the scans, the ctp7 bash
+# scripts) without a CTP7. It parses the address table and keeps a word of backing memory for every register address,
+# then answers IPbus 2.0 requests over TCP and UDP (like the ipbus app on the card) and mpeek/mpoke requests over a
+# simple line based TCP protocol.
+#
+# Examples:
+#   ./rw_reg_emulator.py -x address_table/gem_amc_top.xml -oh 4
+#   RW_REG_BACKEND=ipbustcp-2.0://localhost:60002 ./sca.py ...
+#
+# When this script is started through a link called mpeek or mpoke it acts as a drop-in replacement of these
+# utilities talking to the emulator given by RW_REG_EMULATOR (host:port, localhost:60003 by default), e.g.:
+#   ln -s rw_reg_emulator.py ~/bin/mpeek; ln -s rw_reg_emulator.py ~/bin/mpoke
+#   RW_REG_BACKEND=mpeek ./sca.py ...
+
+import argparse
+import collections
+import os
+import sys
+import socket
+import struct
+import threading
+import SocketServer
+import rw_reg
+
+IPBUS_TCP_PORT = 60002
+IPBUS_UDP_PORT = 50001
+MPEEK_PORT = 60003
+EMULATOR = os.environ.get('RW_REG_EMULATOR', 'localhost:%d' % MPEEK_PORT)
+
+class EmulatedBackend(rw_reg.Backend):
+    """Backing memory for every register word of the address table, usable as an rw_reg backend.
+    Only the bits of writable registers can be written, bits of write-only registers read back as 0
+    (they are pulses or strobes in the firmware) and addresses without any register give a bus error.
+    mode="block" nodes get a word for each of their size addresses, mode="non-incremental" nodes are FIFOs:
+    reads pop the words given to push (0 once empty) and writes append to them"""
+
+    def __init__(self, nodes):
+        self.words = {}
+        self.readMasks = {}
+        self.writeMasks = {}
+        self.fifos = {}
+        for node in nodes:
+            if node.isModule or not node.permission:
+                continue
+            mask = node.mask if node.mask else 0xffffffff
+            if node.mode in rw_reg.FIFO_MODES:
+                self.fifos[node.real_address] = collections.deque()
+            size = rw_reg.parseInt(node.size) if node.mode == 'block' and node.size is not None else 1
+            for address in range(node.real_address, node.real_address + 4 * size, 4):
+                self.words[address] = 0
+                if 'r' in node.permission:
+                    self.readMasks[address] = self.readMasks.get(address, 0) | mask
+                if 'w' in node.permission:
+                    self.writeMasks[address] = self.writeMasks.get(address, 0) | mask
+        self.lock = threading.Lock()
+
+    def read(self, address):
+        with self.lock:
+            return self.readLocked(address)
+
+    def write(self, address, value):
+        with self.lock:
+            self.writeLocked(address, value)
+
+    def readWords(self, addresses):
+        with self.lock:
+            return [self.readLocked(address) for address in addresses]
+
+    def writeWords(self, words):
+        with self.lock:
+            for address, value in words:
+                self.writeLocked(address, value)
+
+    # sets the value of the readable bits of a register word regardless of its permission, e.g. to emulate
+    # a status register changing. Bits that are writable keep what was written to them last
+    def force(self, address, value):
+        with self.lock:
+            if address not in self.words:
+                raise rw_reg.RegError(2)
+            mask = self.readMasks.get(address, 0) & ~self.writeMasks.get(address, 0)
+            self.words[address] = (self.words[address] & ~mask) | (value & mask)
+
+    # appends words to a FIFO, e.g. to emulate the firmware filling it
+    def push(self, address, values):
+        with self.lock:
+            if address not in self.fifos:
+                raise rw_reg.RegError(2)
+            self.fifos[address].extend(value & 0xffffffff for value in values)
+
+    # read-modify-write as done by the IPbus RMW transactions, returns the word before the modification
+    def modify(self, address, function):
+        with self.lock:
+            before = self.readLocked(address)
+            self.writeLocked(address, function(before) & 0xffffffff)
+            return before
+
+    def readLocked(self, address):
+        if address not in self.words:
+            raise rw_reg.RegError(2)
+        if address in self.fifos:
+            fifo = self.fifos[address]
+            return fifo.popleft() & self.readMasks.get(address, 0) if fifo else 0
+        return self.words[address] & self.readMasks.get(address, 0)
+
+    def writeLocked(self, address, value):
+        if address not in self.words:
+            raise rw_reg.RegError(2)
+        if address in self.fifos:
+            self.fifos[address].append(value & 0xffffffff)
+            return
+        mask = self.writeMasks.get(address, 0)
+        self.words[address] = (self.words[address] & ~mask) | (value & mask)
+
+# same address mapping as Client::modifyAddress of the ipbus app running on the card
+def modifyAddress(address):
+    module = address >> 28
+    if module == 0x4:
+        address = (address & 0xf00fffff) | (address << 4 & 0x0f000000) | (address >> 4 & 0x00f00000)
+        result = (address & 0xfff) | (address >> 20) << 12
+    elif module == 0x0:
+        result = (address & 0xfffff) | 0x91 << 16
+    else:
+        result = (address & 0xfffff) | module << 20
+    return rw_reg.AXI_IPB_BASE_ADDRESS + (result << 2)
+
+# processes one IPbus 2.0 packet, given as a byte string, and returns the reply packet (None if the packet is ignored)
+def processPacket(memory, data):
+    words = len(data) >> 2
+    if words == 0:
+        return None
+    order = '>'
+    header = struct.unpack('>I', data[:4])[0]
+    if (header & 0xff0000f0) != 0x200000f0:
+        order = '<'
+        header = struct.unpack('<I', data[:4])[0]
+        if (header & 0xff0000f0) != 0x200000f0:
+            return None # version or endian mismatch
+    if header & 0xf != 0x0:
+        return None # only control packets are supported
+
+    request = struct.unpack(order + '%dI' % words, data[:words << 2])
+    reply = [header]
+    pos = 1
+    while pos < len(request):
+        txnHeader = request[pos]
+        pos += 1
+        if txnHeader >> 28 != 2 or txnHeader & 0xf != 0xf:
+            return None # invalid transaction header, drop the packet
+        typeId = (txnHeader >> 4) & 0xf
+        count = (txnHeader >> 8) & 0xff
+        txnHeader &= ~0xf
+        bodyWords = {0: 1, 1: 1 + count, 2: 1, 3: 1 + count, 4: 3, 5: 2}.get(typeId)
+        if bodyWords is None or pos + bodyWords > len(request):
+            reply.append(txnHeader | 0x1) # bad header
+            break
+        address = modifyAddress(request[pos])
+        body = request[pos + 1:pos + bodyWords]
+        pos += bodyWords
+        try:
+            if typeId == 0:
+                values = memory.readWords(range(address, address + 4 * count, 4))
+            elif typeId == 1:
+                memory.writeWords(zip(range(address, address + 4 * count, 4), body))
+                values = []
+            elif typeId == 2:
+                values = memory.readWords([address] * count)
+            elif typeId == 3:
+                memory.writeWords([(address, value) for value in body])
+                values = []
+            elif typeId == 4:
+                values = [memory.modify(address, lambda value: (value & body[0]) | body[1])]
+            else:
+                values = [memory.modify(address, lambda value: value + body[0])]
+        except rw_reg.RegError:
+            reply.append(txnHeader | (0x5 if typeId in (1, 3) else 0x4)) # bus error
+            continue
+        reply.append(txnHeader)
+        reply.extend(values)
+    return struct.pack(order + '%dI' % len(reply), *reply)
+
+class IPbusTCPHandler(SocketServer.StreamRequestHandler):
+    # replies to the packets kept in flight by the client would otherwise wait for the delayed ACK of the previous one
+    disable_nagle_algorithm = True
+
+    # every packet is framed with its length in bytes (big endian), like the ipbus app on the card does it
+    def handle(self):
+        while True:
+            length = self.rfile.read(4)
+            if len(length) < 4:
+                return
+            data = self.rfile.read(struct.unpack('>I', length)[0])
+            reply = processPacket(self.server.memory, data) or ''
+            self.wfile.write(struct.pack('>I', len(reply)) + reply)
+            self.wfile.flush()
+
+class IPbusUDPHandler(SocketServer.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        reply = processPacket(self.server.memory, data)
+        if reply is not None:
+            sock.sendto(reply, self.client_address)
+
+class MpeekHandler(SocketServer.StreamRequestHandler):
+    # one request per line: "mpeek <address>" or "mpoke <address> <value>", answered with the
+    # mpeek/mpoke output line or "error <code>"
+    def handle(self):
+        for line in self.rfile:
+            args = line.split()
+            try:
+                if len(args) == 2 and args[0] == 'mpeek':
+                    reply = '0x%08x' % self.server.memory.read(rw_reg.parseInt(args[1]))
+                elif len(args) == 3 and args[0] == 'mpoke':
+                    self.server.memory.write(rw_reg.parseInt(args[1]), rw_reg.parseInt(args[2]))
+                    reply = ''
+                else:
+                    reply = 'error 1'
+            except ValueError:
+                reply = 'error 1'
+            except rw_reg.RegError as e:
+                reply = 'error %d' % e.code
+            self.wfile.write(reply + '\n')
+            self.wfile.flush()
+
+class ThreadingTCPServer(SocketServer.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def startServer(serverClass, handlerClass, port, memory):
+    server = serverClass(('', port), handlerClass)
+    server.memory = memory
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+# mpeek/mpoke replacement, returns the exit code
+def mpeekClient(command, args):
+    if len(args) != (1 if command == 'mpeek' else 2):
+        print 'Usage: mpeek <address> | mpoke <address> <value>'
+        return 1
+    host, _, port = EMULATOR.partition(':')
+    try:
+        sock = socket.create_connection((host, int(port) if port else MPEEK_PORT))
+        sock.sendall(' '.join([command] + args) + '\n')
+        reply = sock.makefile().readline().strip()
+        sock.close()
+    except socket.error as e:
+        print 'Could not reach the register emulator at %s: %s' % (EMULATOR, e)
+        return 1
+    if reply.startswith('error'):
+        code = int(reply.split()[1])
+        print rw_reg.parseError(code)
+        return code
+    if reply != '':
+        print reply
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Emulates the GEM_AMC register memory for running the register access tools without a CTP7.')
+    parser.add_argument('-x', metavar='address_table', default=rw_reg.ADDRESS_TABLE_TOP,
+                   help='Optional: address table XML file (default: %s)' % rw_reg.ADDRESS_TABLE_TOP)
+    parser.add_argument('-oh', metavar='num_optohybrids', type=int,
+                   help='Optional: number of optohybrids to generate the OH registers for (default: as given in the address table)')
+    parser.add_argument('-tcp', metavar='port', type=int, default=IPBUS_TCP_PORT,
+                   help='Optional: IPbus TCP port, 0 to disable (default: %d)' % IPBUS_TCP_PORT)
+    parser.add_argument('-udp', metavar='port', type=int, default=IPBUS_UDP_PORT,
+                   help='Optional: IPbus UDP port, 0 to disable (default: %d)' % IPBUS_UDP_PORT)
+    parser.add_argument('-mpeek', metavar='port', type=int, default=MPEEK_PORT,
+                   help='Optional: mpeek/mpoke port, 0 to disable (default: %d)' % MPEEK_PORT)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.x):
+        print 'Address table file %s does not exist' % args.x
+        return 1
+
+    rw_reg.parseXML(args.x, args.oh)
+    memory = EmulatedBackend(rw_reg.nodes)
+    print 'Emulating %d register words' % len(memory.words)
+
+    servers = []
+    if args.tcp:
+        servers.append(startServer(ThreadingTCPServer, IPbusTCPHandler, args.tcp, memory))
+        print 'IPbus: ipbustcp-2.0://localhost:%d' % args.tcp
+    if args.udp:
+        servers.append(startServer(SocketServer.ThreadingUDPServer, IPbusUDPHandler, args.udp, memory))
+        print 'IPbus: ipbusudp-2.0://localhost:%d' % args.udp
+    if args.mpeek:
+        servers.append(startServer(ThreadingTCPServer, MpeekHandler, args.mpeek, memory))
+        print 'mpeek/mpoke: RW_REG_EMULATOR=localhost:%d' % args.mpeek
+
+    try:
+        while True:
+            threading.Event().wait(3600)
+    except KeyboardInterrupt:
+        pass
+    for server in servers:
+        server.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    command = os.path.basename(sys.argv[0])
+    if command in ('mpeek', 'mpoke'):
+        sys.exit(mpeekClient(command, sys.argv[1:]))
+    sys.exit(main())
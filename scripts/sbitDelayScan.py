@@ -124,11 +124,9 @@ if __name__ == '__main__':
         writeReg(getNode("GEM_AMC.GEM_TESTS.VFAT_DAQ_MONITOR.CTRL.OH_SELECT"), 0)
         writeReg(getNode("GEM_AMC.GEM_TESTS.VFAT_DAQ_MONITOR.CTRL.VFAT_CHANNEL_GLOBAL_OR"), 0)
 
-        addrSbitMonReset = getNode("GEM_AMC.TRIGGER.SBIT_MONITOR.RESET").real_address
-        addrTtcStart = getNode("GEM_AMC.TTC.GENERATOR.CYCLIC_START").real_address        
-        addrCluster = [0]*8
-        for i in range(8):
-            addrCluster[i] = getNode("GEM_AMC.TRIGGER.SBIT_MONITOR.CLUSTER%i"%i).real_address
+        sbitMonReset = RegHandle("GEM_AMC.TRIGGER.SBIT_MONITOR.RESET")
+        ttcStart = RegHandle("GEM_AMC.TTC.GENERATOR.CYCLIC_START")
+        clusterRegs = [RegHandle("GEM_AMC.TRIGGER.SBIT_MONITOR.CLUSTER%i"%i) for i in range(8)]
 
         nGoodClustersPerTapPerBit = [0]*55
         for i in range(55): nGoodClustersPerTapPerBit[i] = [0]*8
@@ -173,11 +171,11 @@ if __name__ == '__main__':
                     #Configure DAQ monitor on CTP7
                     #Configure S-Bit monitor on CTP7
 
-                    wReg(addrSbitMonReset, 1)
+                    sbitMonReset.write(1)
                     #writeReg(getNode("GEM_AMC.TRIGGER.SBIT_MONITOR.RESET"), 1)
 
                     #print "Starting the Generator now"
-                    wReg(addrTtcStart, 1)
+                    ttcStart.write(1)
                     #writeReg(getNode("GEM_AMC.TTC.GENERATOR.CYCLIC_START"), 1)
                     time.sleep(0.0001)
 
@@ -186,7 +184,7 @@ if __name__ == '__main__':
 
                     for cluster in range(8):
                         #this_cluster = int(readReg(getNode("GEM_AMC.TRIGGER.SBIT_MONITOR.CLUSTER%i"%cluster)), 0)
-                        this_cluster = rReg(addrCluster[cluster])
+                        this_cluster = clusterRegs[cluster].read()
                         clusterVal +=  (this_cluster) << (cluster*16)
                         address = this_cluster & 0x7ff
                         cluster_valid = (address < 1536)
@@ -47,10 +47,11 @@ FPGA_ID = VIRTEX6_FPGA_ID
 #FIRMWARE_SIZE = ARTIX7_75T_FIRMWARE_SIZE
 #FPGA_ID = ARTIX7_75T_FPGA_ID
 
-ADDR_JTAG_LENGTH = None
-ADDR_JTAG_TMS = None
-ADDR_JTAG_TDO = None
-ADDR_JTAG_TDI = None
+# JTAG registers written for every shifted word, bound to their address on first use
+# (NUM_BITS is the only register of its word, no need to read the word back before writing it)
+JTAG_LENGTH = RegHandle('GEM_AMC.SLOW_CONTROL.SCA.JTAG.NUM_BITS', plainWrite=True)
+JTAG_TMS = RegHandle('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS')
+JTAG_TDO = RegHandle('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO')
 
 def main():
 
@@ -70,13 +71,10 @@ def main():
         return
     else:
         ohMask = parseInt(sys.argv[1])
-        for i in range(0,12):
-            if check_bit(ohMask, i):
-                ohList.append(i)
+        ohList = ohListFromMask(ohMask)
         instructions = sys.argv[2]
 
     parseXML()
-    initJtagRegAddrs()
 
     heading("Hola, I'm SCA controller tester :)")
 
@@ -218,13 +216,13 @@ def main():
         jtagCommand(False, Virtex6Instructions.SHUTDN, 10, None, 0, False)
 
         # send 400 empty clocks
-        wReg(ADDR_JTAG_LENGTH, 0x00)
+        JTAG_LENGTH.write(0x00)
         for i in range(0, 4):
-            wReg(ADDR_JTAG_TMS, 0x00000000)
+            JTAG_TMS.write(0x00000000)
         for i in range(0, 12):
-            wReg(ADDR_JTAG_TDO, 0x00000000)
-        wReg(ADDR_JTAG_LENGTH, 0x10)
-        wReg(ADDR_JTAG_TDO, 0x00000000)
+            JTAG_TDO.write(0x00000000)
+        JTAG_LENGTH.write(0x10)
+        JTAG_TDO.write(0x00000000)
 
         sleep(0.01)
 
@@ -234,10 +232,10 @@ def main():
         jtagCommand(False, Virtex6Instructions.ISC_ENABLE, 10, 0x00, 5, False)
 
         # 128 empty clocks
-        wReg(ADDR_JTAG_LENGTH, 0x00)
+        JTAG_LENGTH.write(0x00)
         for i in range(0, 4):
-            wReg(ADDR_JTAG_TMS, 0x00000000)
-            wReg(ADDR_JTAG_TDO, 0x00000000)
+            JTAG_TMS.write(0x00000000)
+            JTAG_TDO.write(0x00000000)
 
         sleep(0.0005)
 
@@ -255,19 +253,19 @@ def main():
 
         tms = 0b001
         tdo = 0b000
-        wReg(ADDR_JTAG_LENGTH, 3)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
-        wReg(ADDR_JTAG_TDO, tdo & 0xffffffff)
+        JTAG_LENGTH.write(3)
+        JTAG_TMS.write(tms & 0xffffffff)
+        JTAG_TDO.write(tdo & 0xffffffff)
 
         tms = 0b001011 << 31
-        wReg(ADDR_JTAG_LENGTH, 37)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_LENGTH.write(37)
+        JTAG_TMS.write(tms & 0xffffffff)
         tms = tms >> 32
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_TMS.write(tms & 0xffffffff)
 
         # send the first byte so that the LENGTH is updated
-        wReg(ADDR_JTAG_TDO, words[0])
-        wReg(ADDR_JTAG_TDO, 0x0)
+        JTAG_TDO.write(words[0])
+        JTAG_TDO.write(0x0)
 
         # enter optimized mode that executes JTAG_GO on every TDO shift and doesn't update the LENGTH with every JTAG_GO
         sleep(0.001)
@@ -277,8 +275,8 @@ def main():
 
         cnt = 0
         for i in range(1, numWords - 1):
-            wReg(ADDR_JTAG_TDO, words[i])
-            #wReg(ADDR_JTAG_TDO, 0x0) # not needed when EXEC_ON_EVERY_TDO is set to 0x1
+            JTAG_TDO.write(words[i])
+            #JTAG_TDO.write(0x0) # not needed when EXEC_ON_EVERY_TDO is set to 0x1
             #jtagCommand(False, None, 0, (bytes[i*4 + 2] << 24) + (bytes[i*4 + 3] << 16) + (bytes[i*4] << 8) + (bytes[i*4 + 1]), 32, False)
             cnt += 1
             if cnt >= 10000:
@@ -291,22 +289,22 @@ def main():
         writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.EXPERT.NO_SCA_LENGTH_UPDATE'), 0x0)
         writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.EXPERT.SHIFT_TDO_ASYNC'), 0x0)
         tms = 0b011 << 31 #go back to idle and don't enter DR shift again
-        wReg(ADDR_JTAG_LENGTH, 34)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_LENGTH.write(34)
+        JTAG_TMS.write(tms & 0xffffffff)
         tms = tms >> 32
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
-        wReg(ADDR_JTAG_TDO, words[i]) #send the last word
-        wReg(ADDR_JTAG_TDO, 0x0)
+        JTAG_TMS.write(tms & 0xffffffff)
+        JTAG_TDO.write(words[i]) #send the last word
+        JTAG_TDO.write(0x0)
 
 
         print("DONE sending data")
 
         jtagCommand(False, Virtex6Instructions.ISC_DISABLE, 10, None, 0, False)
         # 128 empty clocks
-        wReg(ADDR_JTAG_LENGTH, 0x00)
+        JTAG_LENGTH.write(0x00)
         for i in range(0, 4):
-            wReg(ADDR_JTAG_TMS, 0x00000000)
-            wReg(ADDR_JTAG_TDO, 0x00000000)
+            JTAG_TMS.write(0x00000000)
+            JTAG_TDO.write(0x00000000)
 
         sleep(0.0001)
 
@@ -314,10 +312,10 @@ def main():
         jtagCommand(False, Virtex6Instructions.JSTART, 10, None, 0, False)
 
         # 128 empty clocks
-        wReg(ADDR_JTAG_LENGTH, 0x00)
+        JTAG_LENGTH.write(0x00)
         for i in range(0, 4):
-            wReg(ADDR_JTAG_TMS, 0x00000000)
-            wReg(ADDR_JTAG_TDO, 0x00000000)
+            JTAG_TMS.write(0x00000000)
+            JTAG_TDO.write(0x00000000)
 
         sleep(0.0005)
 
@@ -341,7 +339,7 @@ def main():
             #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.MANUAL_CONTROL.SCA_CMD_DATA'), 0x0)
 
             #readReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDI'))
-            wReg(ADDR_JTAG_TMS, 0x00000000)
+            JTAG_TMS.write(0x00000000)
 
             #sleep(0.01)
             #print('execute')
@@ -485,35 +483,22 @@ def main():
             idx += 1
 
 
-def initJtagRegAddrs():
-    global ADDR_JTAG_LENGTH
-    global ADDR_JTAG_TMS
-    global ADDR_JTAG_TDO
-    global ADDR_JTAG_TDI
-    ADDR_JTAG_LENGTH = getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.NUM_BITS').real_address
-    ADDR_JTAG_TMS = getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS').real_address
-    ADDR_JTAG_TDO = getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO').real_address
-    #ADDR_JTAG_TDI = getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDI').real_address
-
 # freqDiv -- JTAG frequency expressed as a divider of 20MHz, so e.g. a value of 2 would give 10MHz, value of 10 would give 2MHz
 def enableJtag(ohMask, freqDiv=None):
     subheading('Disabling SCA ADC monitoring')                                                                                          
     writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.ADC_MONITORING.MONITORING_OFF'), 0xffffffff)
     sleep(0.01)                                                                                                                         
     subheading('Enable JTAG module with mask ' + hex(ohMask))
-    writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.ENABLE_MASK'), ohMask)
-    writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.SHIFT_MSB'), 0x0)
-    writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.EXPERT.EXEC_ON_EVERY_TDO'), 0x0)
-    writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.EXPERT.NO_SCA_LENGTH_UPDATE'), 0x0)
-    writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.EXPERT.SHIFT_TDO_ASYNC'), 0x0)
+    with writeCombining(): # the SHIFT_MSB and EXPERT bits share one word
+        writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.ENABLE_MASK'), ohMask)
+        writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.SHIFT_MSB'), 0x0)
+        writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.EXPERT.EXEC_ON_EVERY_TDO'), 0x0)
+        writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.EXPERT.NO_SCA_LENGTH_UPDATE'), 0x0)
+        writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.CTRL.EXPERT.SHIFT_TDO_ASYNC'), 0x0)
 
     if freqDiv is not None:
         subheading('Setting JTAG CLK frequency to ' + str(20 / (freqDiv)) + 'MHz (divider value = ' + hex((freqDiv - 1) << 24) + ')')
-        ohList = []
-        for i in range(0,12):
-            if check_bit(ohMask, i):
-                ohList.append(i)
-        sendScaCommand(ohList, 0x13, 0x90, 0x4, (freqDiv - 1) << 24, False)
+        sendScaCommand(ohListFromMask(ohMask), 0x13, 0x90, 0x4, (freqDiv - 1) << 24, False)
 
 
 def disableJtag():
@@ -577,7 +562,7 @@ def jtagCommand(restoreIdle, ir, irLen, dr, drLen, drReadOhList):
     debugCyan('Setting command length = ' + str(len))
     fw_len = len if len < 128 else 0 # in firmware 0 means 128 bits
     #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.NUM_BITS'), fw_len)
-    wReg(ADDR_JTAG_LENGTH, fw_len)
+    JTAG_LENGTH.write(fw_len)
 
     # ================= SENDING LENGTH COMMAND JUST FOR TEST!! ===================
     #debugCyan('Setting config registers: bit number = ' + hex(fw_len))                                               
@@ -588,46 +573,46 @@ def jtagCommand(restoreIdle, ir, irLen, dr, drLen, drReadOhList):
 
     debugCyan('Setting TMS 0 = ' + binary(tms & 0xffffffff, 32))
     #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS'), tms0)
-    wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+    JTAG_TMS.write(tms & 0xffffffff)
 
     debugCyan('Setting TDO 0 = ' + binary(tdo & 0xffffffff, 32))
     #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO'), tdo0)
-    wReg(ADDR_JTAG_TDO, tdo & 0xffffffff)
+    JTAG_TDO.write(tdo & 0xffffffff)
 
     if len > 32:
         tms = tms >> 32
         debugCyan('Setting TMS 1 = ' + binary(tms & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS'), tms1)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_TMS.write(tms & 0xffffffff)
 
         #raw_input("press any key to send the last TDO")
 
         tdo = tdo >> 32
         debugCyan('Setting TDO 1 = ' + binary(tdo & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO'), tdo1)
-        wReg(ADDR_JTAG_TDO, tdo & 0xffffffff)
+        JTAG_TDO.write(tdo & 0xffffffff)
 
     if len > 64:                                                               
         tms = tms >> 32                                                                                                                 
         debugCyan('Setting TMS 2 = ' + binary(tms & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS'), tms2)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_TMS.write(tms & 0xffffffff)
 
         tdo = tdo >> 32                                                                                           
         debugCyan('Setting TDO 2 = ' + binary(tdo & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO'), tdo2)
-        wReg(ADDR_JTAG_TDO, tdo & 0xffffffff)
+        JTAG_TDO.write(tdo & 0xffffffff)
 
     if len > 96:                                                                                                                                                          
         tms = tms >> 32                                                                                                                                                   
         debugCyan('Setting TMS 3 = ' + binary(tms & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TMS'), tms3)
-        wReg(ADDR_JTAG_TMS, tms & 0xffffffff)
+        JTAG_TMS.write(tms & 0xffffffff)
                                                                                                                                                                           
         tdo = tdo >> 32                                                                                                                                                   
         debugCyan('Setting TDO 3 = ' + binary(tdo & 0xffffffff, 32))
         #writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDO'), tdo3)
-        wReg(ADDR_JTAG_TDO, tdo & 0xffffffff)
+        JTAG_TDO.write(tdo & 0xffffffff)
 
     # ================= SENDING JTAG GO COMMAND JUST FOR TEST!! ===================                                
     #debugCyan('JTAG GO!')                                                                                                         
@@ -641,35 +626,20 @@ def jtagCommand(restoreIdle, ir, irLen, dr, drLen, drReadOhList):
     if drReadOhList == False:
         return readValues
 
-    for i in drReadOhList:
-        debugCyan('Read TDI 0')
-        tdi = parseInt(readReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDI_OH%d' % i)))
-        #tdi0_fast = parseInt(rReg(parseInt(ADDR_JTAG_TDI)))
-        #print('normal tdi read = ' + hex(tdi0) + ', fast C tdi read = ' + hex(tdi0_fast) + ', parsed = ' + '{0:#010x}'.format(tdi0_fast))
-        debug('tdi = ' + hex(tdi))
-
-        if len > 32:
-            debugCyan('Read TDI 1')
-            tdi1 = parseInt(readReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDI_OH%d' % i)))
-            tdi |= tdi1 << 32
-            debug('tdi1 = ' + hex(tdi1))
-            debug('tdi = ' + hex(tdi))
-
-        if len > 64:
-            debugCyan('Read TDI 2')
-            tdi2 = parseInt(readReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDI_OH%d' % i)))
-            tdi |= tdi2 << 64
-            debug('tdi2 = ' + hex(tdi2))
-            debug('tdi = ' + hex(tdi))
-
-        if len > 96:
-            debugCyan('Read TDI 3')
-            tdi3 = parseInt(readReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDI_OH%d' % i)))
-            tdi |= tdi3 << 96
-            debug('tdi3 = ' + hex(tdi3))
-            debug('tdi = ' + hex(tdi))
-
-        readValue = (tdi >> readIdx) & (0xffffffffffffffffffffffffffffffff >> (128  - drLen))
+    # every read of TDI_OH<n> gives the next 32 bits of that OH, so the OHs are read together one word at a time
+    tdi = dict((oh, 0) for oh in drReadOhList)
+    for word in range(4):
+        if word > 0 and len <= word * 32:
+            break
+        debugCyan('Read TDI %d' % word)
+        tdiWords = readOhRegs(drReadOhList, 'GEM_AMC.SLOW_CONTROL.SCA.JTAG.TDI_OH%d')
+        for oh, tdiWord in tdiWords.items():
+            tdi[oh] |= tdiWord << (word * 32)
+            debug('OH #%d tdi%d = ' % (oh, word) + hex(tdiWord))
+
+    for oh in drReadOhList:
+        debug('tdi = ' + hex(tdi[oh]))
+        readValue = (tdi[oh] >> readIdx) & (0xffffffffffffffffffffffffffffffff >> (128  - drLen))
         readValues.append(readValue)
         debug('Read pos = ' + str(readIdx))
         debug('Read = ' + hex(readValue))
@@ -689,8 +659,8 @@ def sendScaCommand(ohList, sca_channel, sca_command, data_length, data, doRead):
     writeReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.MANUAL_CONTROL.SCA_CMD.SCA_CMD_EXECUTE'), 0x1)
     reply = []
     if doRead:
-        for i in ohList:
-            reply.append(parseInt(readReg(getNode('GEM_AMC.SLOW_CONTROL.SCA.MANUAL_CONTROL.SCA_REPLY_OH%d.SCA_RPY_DATA' % i))))
+        # the replies of all the OHs in one transaction
+        reply = readOhRegs(ohList, 'GEM_AMC.SLOW_CONTROL.SCA.MANUAL_CONTROL.SCA_REPLY_OH%d.SCA_RPY_DATA').values()
     return reply
 
 def check_bit(byteval,idx):
@@ -126,10 +126,8 @@ if __name__ == '__main__':
 
         writeReg(getNode("GEM_AMC.TTC.GENERATOR.CYCLIC_START"), 1)
 
-        addrSbitMonReset = getNode("GEM_AMC.TRIGGER.SBIT_MONITOR.RESET").real_address
-        addrCluster = [0]*8
-        for i in range(8):
-            addrCluster[i] = getNode("GEM_AMC.TRIGGER.SBIT_MONITOR.CLUSTER%i"%i).real_address
+        sbitMonReset = RegHandle("GEM_AMC.TRIGGER.SBIT_MONITOR.RESET")
+        clusterRegs = [RegHandle("GEM_AMC.TRIGGER.SBIT_MONITOR.CLUSTER%i"%i) for i in range(8)]
 
         exit = False
         while(not exit):
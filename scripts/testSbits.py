@@ -69,66 +69,67 @@ if __name__ == '__main__':
         print "Configuring VFAT"
 
         #for i in range(128): writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.VFAT_CHANNELS.CHANNEL%i.CALPULSE_ENABLE"%(vfatN,i)), 0)
-        for i in range(128): writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.VFAT_CHANNELS.CHANNEL%i"%(vfatN,i)), 0x4000)  # mask all channels and disable the calpulse
-
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_PULSE_STRETCH"%vfatN),           7)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_SYNC_LEVEL_MODE"%vfatN),         0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_SELF_TRIGGER_MODE"%vfatN),       0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_DDR_TRIGGER_MODE"%vfatN),        0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_SPZS_SUMMARY_ONLY"%vfatN),       0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_SPZS_MAX_PARTITIONS"%vfatN),     0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_SPZS_ENABLE"%vfatN),             0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_SZP_ENABLE"%vfatN),              0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_SZD_ENABLE"%vfatN),              0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_TIME_TAG"%vfatN),                0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_EC_BYTES"%vfatN),                0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BC_BYTES"%vfatN),                0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_FP_FE"%vfatN),                   7)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_RES_PRE"%vfatN),                 1)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_CAP_PRE"%vfatN),                 0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_PT"%vfatN),                     15)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_EN_HYST"%vfatN),                 1)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_SEL_POL"%vfatN),                 1)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_FORCE_EN_ZCC"%vfatN),            0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_FORCE_TH"%vfatN),                0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_SEL_COMP_MODE"%vfatN),           1)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_VREF_ADC"%vfatN),                3)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_MON_GAIN"%vfatN),                0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_MONITOR_SELECT"%vfatN),          0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_IREF"%vfatN),                   32)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_THR_ZCC_DAC"%vfatN),            10)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_THR_ARM_DAC"%vfatN),            100)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_HYST"%vfatN),                    5)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_LATENCY"%vfatN),                45)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_CAL_SEL_POL"%vfatN),             1)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_CAL_PHI"%vfatN),                 0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_CAL_EXT"%vfatN),                 0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_CAL_DAC"%vfatN),               50)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_CAL_MODE"%vfatN),                1)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_CAL_FS"%vfatN),                  0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_CAL_DUR"%vfatN),               200)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_CFD_DAC_2"%vfatN),         40)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_CFD_DAC_1"%vfatN),         40)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_PRE_I_BSF"%vfatN),         13)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_PRE_I_BIT"%vfatN),        150)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_PRE_I_BLCC"%vfatN),        25)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_PRE_VREF"%vfatN),          86)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_SH_I_BFCAS"%vfatN),       250)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_SH_I_BDIFF"%vfatN),       150)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_SH_I_BFAMP"%vfatN),         0)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_SD_I_BDIFF"%vfatN),       255)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_SD_I_BSF"%vfatN),          15)
-        writeReg(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.CFG_BIAS_SD_I_BFCAS"%vfatN),       255)
+        writeRegs([(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.VFAT_CHANNELS.CHANNEL%i"%(vfatN,i)), 0x4000) for i in range(128)])  # mask all channels and disable the calpulse
+
+        vfatConfig = [
+            ("CFG_PULSE_STRETCH",         7),
+            ("CFG_SYNC_LEVEL_MODE",       0),
+            ("CFG_SELF_TRIGGER_MODE",     0),
+            ("CFG_DDR_TRIGGER_MODE",      0),
+            ("CFG_SPZS_SUMMARY_ONLY",     0),
+            ("CFG_SPZS_MAX_PARTITIONS",   0),
+            ("CFG_SPZS_ENABLE",           0),
+            ("CFG_SZP_ENABLE",            0),
+            ("CFG_SZD_ENABLE",            0),
+            ("CFG_TIME_TAG",              0),
+            ("CFG_EC_BYTES",              0),
+            ("CFG_BC_BYTES",              0),
+            ("CFG_FP_FE",                 7),
+            ("CFG_RES_PRE",               1),
+            ("CFG_CAP_PRE",               0),
+            ("CFG_PT",                   15),
+            ("CFG_EN_HYST",               1),
+            ("CFG_SEL_POL",               1),
+            ("CFG_FORCE_EN_ZCC",          0),
+            ("CFG_FORCE_TH",              0),
+            ("CFG_SEL_COMP_MODE",         1),
+            ("CFG_VREF_ADC",              3),
+            ("CFG_MON_GAIN",              0),
+            ("CFG_MONITOR_SELECT",        0),
+            ("CFG_IREF",                 32),
+            ("CFG_THR_ZCC_DAC",          10),
+            ("CFG_THR_ARM_DAC",         100),
+            ("CFG_HYST",                  5),
+            ("CFG_LATENCY",              45),
+            ("CFG_CAL_SEL_POL",           1),
+            ("CFG_CAL_PHI",               0),
+            ("CFG_CAL_EXT",               0),
+            ("CFG_CAL_DAC",              50),
+            ("CFG_CAL_MODE",              1),
+            ("CFG_CAL_FS",                0),
+            ("CFG_CAL_DUR",             200),
+            ("CFG_BIAS_CFD_DAC_2",       40),
+            ("CFG_BIAS_CFD_DAC_1",       40),
+            ("CFG_BIAS_PRE_I_BSF",       13),
+            ("CFG_BIAS_PRE_I_BIT",      150),
+            ("CFG_BIAS_PRE_I_BLCC",      25),
+            ("CFG_BIAS_PRE_VREF",        86),
+            ("CFG_BIAS_SH_I_BFCAS",     250),
+            ("CFG_BIAS_SH_I_BDIFF",     150),
+            ("CFG_BIAS_SH_I_BFAMP",       0),
+            ("CFG_BIAS_SD_I_BDIFF",     255),
+            ("CFG_BIAS_SD_I_BSF",        15),
+            ("CFG_BIAS_SD_I_BFCAS",     255)
+        ]
+        writeRegs([(getNode("GEM_AMC.OH.OH0.GEB.VFAT%i.%s"%(vfatN,reg)), value) for reg, value in vfatConfig])
 
         writeReg(getNode("GEM_AMC.GEM_TESTS.VFAT_DAQ_MONITOR.CTRL.ENABLE"),    1)
         writeReg(getNode("GEM_AMC.GEM_TESTS.VFAT_DAQ_MONITOR.CTRL.OH_SELECT"), 0)
         writeReg(getNode("GEM_AMC.GEM_TESTS.VFAT_DAQ_MONITOR.CTRL.VFAT_CHANNEL_GLOBAL_OR"), 0)
 
-        addrSbitMonReset = getNode("GEM_AMC.TRIGGER.SBIT_MONITOR.RESET").real_address
-        addrTtcStart = getNode("GEM_AMC.TTC.GENERATOR.CYCLIC_START").real_address        
-        addrCluster = [0]*8
-        for i in range(8):
-            addrCluster[i] = getNode("GEM_AMC.TRIGGER.SBIT_MONITOR.CLUSTER%i"%i).real_address
+        sbitMonReset = RegHandle("GEM_AMC.TRIGGER.SBIT_MONITOR.RESET")
+        ttcStart = RegHandle("GEM_AMC.TTC.GENERATOR.CYCLIC_START")
+        clusterRegs = [RegHandle("GEM_AMC.TRIGGER.SBIT_MONITOR.CLUSTER%i"%i) for i in range(8)]
 
         nDAQ = [0]*128
         nValidClusters = [0]*128
@@ -157,11 +158,11 @@ if __name__ == '__main__':
                 #Configure DAQ monitor on CTP7
                 #Configure S-Bit monitor on CTP7
                 
-                wReg(addrSbitMonReset, 1)
+                sbitMonReset.write(1)
                 #writeReg(getNode("GEM_AMC.TRIGGER.SBIT_MONITOR.RESET"), 1)
 
                 #print "Starting the Generator now"
-                wReg(addrTtcStart, 1)
+                ttcStart.write(1)
                 #writeReg(getNode("GEM_AMC.TTC.GENERATOR.CYCLIC_START"), 1)
                 time.sleep(0.0001)
 
@@ -170,7 +171,7 @@ if __name__ == '__main__':
 
                 for cluster in range(8): 
 			#this_cluster = int(readReg(getNode("GEM_AMC.TRIGGER.SBIT_MONITOR.CLUSTER%i"%cluster)), 0)
-                        this_cluster = rReg(addrCluster[cluster])
+                        this_cluster = clusterRegs[cluster].read()
 			clusterVal +=  (this_cluster) << (cluster*16)
 			address = this_cluster & 0x7ff
 			cluster_valid = (address < 1536)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+# Unit tests of rw_reg, run against the register memory emulator with a small address table:
+#   python -m unittest test_rw_reg (or pytest) from this directory
+
+import collections
+import os
+import shutil
+import tempfile
+import unittest
+import rw_reg
+from rw_reg_emulator import EmulatedBackend
+
+ADDRESS_TABLE = '''<node id="top">
+  <node id="GEM_AMC" address="0x0">
+    <node id="TTC" address="0x300000" fw_is_module="true">
+      <node id="CTRL" address="0x0">
+        <node id="MODULE_RESET" address="0x0" permission="w"/>
+        <node id="L1A_ENABLE" address="0x1" mask="0x00000001" permission="rw"/>
+        <node id="CALIBRATION_MODE" address="0x1" mask="0x00000002" permission="rw"/>
+      </node>
+      <node id="CONFIG" address="0x10">
+        <node id="CMD_BC0" address="0x0" mask="0x000000ff" permission="rw"/>
+      </node>
+    </node>
+    <node id="OH" address="0x400000">
+      <node id="OH0" address="0x0" fw_is_module="true">
+        <node id="MODULE_RESET" address="0x0" permission="w"/>
+        <node id="TRIG_ENABLE" address="0x1" mask="0x00000001" permission="rw"/>
+      </node>
+    </node>
+  </node>
+</node>
+'''
+
+# the address table in a temporary directory, parsed without the expanded table cache
+def parseTable(testCase, table):
+    testCase.dir = tempfile.mkdtemp()
+    filename = os.path.join(testCase.dir, 'address_table.xml')
+    f = open(filename, 'w')
+    try: f.write(table)
+    finally: f.close()
+    rw_reg.USE_CACHE = False
+    rw_reg.parseXML(filename)
+
+class ShadowTest(unittest.TestCase):
+
+    def setUp(self):
+        parseTable(self, ADDRESS_TABLE)
+        rw_reg.setBackend(EmulatedBackend(rw_reg.nodes))
+        rw_reg.enableShadow()
+        rw_reg.writeRegs([(rw_reg.getNode('GEM_AMC.TTC.CTRL.L1A_ENABLE'), 1),
+                          (rw_reg.getNode('GEM_AMC.TTC.CONFIG.CMD_BC0'), 0x14)])
+        self.assertEqual(len(rw_reg.shadowRegs), 2)
+
+    def tearDown(self):
+        rw_reg.enableShadow(False)
+        shutil.rmtree(self.dir)
+
+    def testResetThroughWriteRegs(self):
+        rw_reg.writeRegs([(rw_reg.getNode('GEM_AMC.TTC.CTRL.MODULE_RESET'), 1)])
+        self.assertEqual(rw_reg.shadowRegs, {})
+
+    def testResetThroughWriteOhRegs(self):
+        rw_reg.writeOhRegs([0], 'GEM_AMC.OH.OH%d.TRIG_ENABLE', 1)
+        self.assertEqual(len(rw_reg.shadowRegs), 3)
+        rw_reg.writeOhRegs([0], 'GEM_AMC.OH.OH%d.MODULE_RESET', 1)
+        self.assertEqual(len(rw_reg.shadowRegs), 2)
+
+    def testResetThroughWReg(self):
+        rw_reg.wReg(rw_reg.getNode('GEM_AMC.TTC.CTRL.MODULE_RESET').real_address, 1)
+        self.assertEqual(rw_reg.shadowRegs, {})
+
+    def testResetThroughWriteReg(self):
+        rw_reg.writeReg(rw_reg.getNode('GEM_AMC.TTC.CTRL.MODULE_RESET'), 1)
+        self.assertEqual(rw_reg.shadowRegs, {})
+
+    def testInvalidateUnknownName(self):
+        self.assertRaises(ValueError, rw_reg.invalidateShadow, 'GEM_AMC.TTC.NO_SUCH_REG')
+        self.assertEqual(len(rw_reg.shadowRegs), 2)
+
+# plain memory, every bit of every word can be written (unlike in the emulator, which only keeps the register bits)
+class MemoryBackend(rw_reg.Backend):
+
+    def __init__(self):
+        self.words = collections.defaultdict(int)
+
+    def read(self, address):
+        return self.words[address]
+
+    def write(self, address, value):
+        self.words[address] = value
+
+class RegHandleTest(unittest.TestCase):
+
+    def setUp(self):
+        parseTable(self, ADDRESS_TABLE)
+        self.backend = rw_reg.setBackend(MemoryBackend())
+        self.reg = rw_reg.getNode('GEM_AMC.TTC.CONFIG.CMD_BC0')
+        self.backend.words[self.reg.real_address] = 0x12345600
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testMaskedWritePreservesTheWord(self):
+        rw_reg.RegHandle(self.reg).write(0x78)
+        self.assertEqual(self.backend.words[self.reg.real_address], 0x12345678)
+
+    def testPlainWrite(self):
+        rw_reg.RegHandle(self.reg, plainWrite=True).write(0x78)
+        self.assertEqual(self.backend.words[self.reg.real_address], 0x78)
+
+# a generate block of full word registers followed by the fields of these words, like the VFAT3 configuration
+GENERATE_TABLE = '''<node id="top">
+  <node id="GEM_AMC" address="0x0">
+    <node id="OH" address="0x400000">
+      <node id="OH${OH_IDX}" address="0x0" generate="true" generate_size="2" generate_address_step="0x100"
+            generate_idx_var="OH_IDX">
+        <node id="CFG_${CFG_IDX}" address="0x0" permission="rw"
+              generate="true" generate_size="4" generate_address_step="0x1" generate_idx_var="CFG_IDX"/>
+        <node id="CFG_MODE" address="0x1" mask="0x00000003" permission="rw"/>
+        <node id="CFG_GAIN" address="0x1" mask="0x000000f0" permission="rw"/>
+      </node>
+    </node>
+    <node id="STATUS" address="0x1000" permission="r"/>
+  </node>
+</node>
+'''
+
+# the nodes of GENERATE_TABLE in the address table order, as the table was when the generate blocks were expanded at parsing
+GENERATE_TABLE_NAMES = ['GEM_AMC', 'GEM_AMC.OH'] + \
+    ['GEM_AMC.OH.OH%d%s' % (oh, name) for oh in range(2) for name in ['', '.CFG_0', '.CFG_1', '.CFG_2', '.CFG_3', '.CFG_MODE', '.CFG_GAIN']] + \
+    ['GEM_AMC.STATUS']
+
+class AddressOrderTest(unittest.TestCase):
+    """getNodeFromAddress gives the first node at the address in the address table order, whatever the order in
+    which the generate blocks were expanded"""
+
+    def setUp(self):
+        parseTable(self, GENERATE_TABLE)
+        self.address = rw_reg.AXI_IPB_BASE_ADDRESS + ((0x400000 + 0x100 + 0x1) << 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testLazy(self):
+        self.assertEqual(rw_reg.getNodeFromAddress(self.address).name, 'GEM_AMC.OH.OH1.CFG_1')
+
+    def testFieldExpandedFirst(self):
+        self.assertEqual(rw_reg.getNode('GEM_AMC.OH.OH1.CFG_GAIN').real_address, self.address)
+        self.assertEqual(rw_reg.getNodeFromAddress(self.address).name, 'GEM_AMC.OH.OH1.CFG_1')
+
+    def testExpandAll(self):
+        rw_reg.getNodeFromAddress(self.address)
+        rw_reg.nodes.expandAll()
+        self.assertEqual(rw_reg.getNodeFromAddress(self.address).name, 'GEM_AMC.OH.OH1.CFG_1')
+        self.assertEqual([node.name for node in rw_reg.getNodesFromAddress(self.address)],
+                         ['GEM_AMC.OH.OH1.CFG_1', 'GEM_AMC.OH.OH1.CFG_MODE', 'GEM_AMC.OH.OH1.CFG_GAIN'])
+
+class NodeOrderTest(unittest.TestCase):
+    """Iterating, indexing and searching the nodes follow the address table order, whatever the order in which the
+    generate blocks were expanded"""
+
+    def setUp(self):
+        parseTable(self, GENERATE_TABLE)
+        # expand the blocks out of order
+        rw_reg.getNode('GEM_AMC.OH.OH1.CFG_3')
+        rw_reg.getNode('GEM_AMC.OH.OH0.CFG_MODE')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testIterate(self):
+        self.assertEqual([node.name for node in rw_reg.nodes], GENERATE_TABLE_NAMES)
+
+    def testIndex(self):
+        self.assertEqual([rw_reg.nodes[i].name for i in range(len(rw_reg.nodes))], GENERATE_TABLE_NAMES)
+        self.assertEqual([node.name for node in rw_reg.nodes[3:6]], GENERATE_TABLE_NAMES[3:6])
+
+    def testFindNodes(self):
+        self.assertEqual([node.name for node in rw_reg.getNodesContaining('CFG_')],
+                         [name for name in GENERATE_TABLE_NAMES if 'CFG_' in name])
+
+if __name__ == '__main__':
+    unittest.main()